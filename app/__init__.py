@@ -3,9 +3,32 @@ import os
 from flask import Flask
 from config import config_map
 from pathlib import Path
-from .extensions import init_extensions, get_db, table_exists
-from .blueprints.ticks.storage import table_name, ensure_table
-from flask import jsonify
+from .extensions import init_extensions, get_db, table_exists, uses_reader, WriterBusy
+from .errors import register_error_handlers
+from .metrics import init_metrics, registry
+from .blueprints.ticks.storage import table_name
+from .blueprints.ticks.candles import (
+    INTERVALS, CLUSTER_MAP, CANDLE_COLUMNS, TICK_SIZE, TICK_SIZES, candles_table_name,
+    candles_query, footprint_table_name, materialize_candles, materialize_footprint,
+    materialize_intervals,
+)
+from .blueprints.ticks.batch import batch_query, parse_specs, streams_of
+from .blueprints.ticks.bars import (
+    BAR_COLUMNS, TooManyBarTables, bars_payload, bars_query, bars_table_name, materialize_bars,
+    parse_threshold,
+)
+from .blueprints.ticks.profile import volume_profile
+from .blueprints.ticks.jobs import QueueFull, SYMBOL_RE, ingest_jobs, parse_period
+from .blueprints.ticks.formats import (
+    negotiate_format, wants_stream, arrow_response, arrow_stream_response,
+    columns_response, ndjson_stream_response,
+)
+from .blueprints.ticks.routes import validate_market
+from .blueprints.ticks.cache import candle_cache, data_version
+from .blueprints.ticks.live import live_candles
+from .blueprints.ticks.monitoring import collect_ticks_metrics
+from flask import Response, jsonify, redirect, request, url_for
+import time
 
 def create_app():
     app = Flask(__name__, instance_relative_config=True)
@@ -23,114 +46,130 @@ def create_app():
     # 2. Set DuckDB path in config (important!)
     # ------------------------------------------------------------------
     app.config.setdefault("DUCKDB_PATH", str(Path(app.instance_path) / "app.duckdb"))
+    app.config.setdefault("ARCHIVE_PATH", str(Path(app.instance_path) / "archive"))
+    app.config.setdefault("SNAPSHOT_DIR", str(Path(app.instance_path) / "snapshots"))
 
     # ------------------------------------------------------------------
     # 3. Initialize extensions (your get_db() will create the file on first use)
     # ------------------------------------------------------------------
-    import requests
-    import zipfile
-    from io import BytesIO
     init_extensions(app)        # ← does nothing now, but future-proof
+    candle_cache.max_bytes = app.config["CANDLE_CACHE_BYTES"]
+    live_candles.intervals = tuple(app.config["LIVE_INTERVALS"])
+    TICK_SIZES.update(app.config["FOOTPRINT_TICK_SIZES"])
+    register_error_handlers(app)
+    init_metrics(app)
+    registry.collector(collect_ticks_metrics)
+    ingest_jobs.workers = app.config["INGEST_JOB_WORKERS"]
+    ingest_jobs.max_queued = app.config["INGEST_JOB_QUEUE"]
+    if app.config["PROCESS_ROLE"] != "api":
+        ingest_jobs.start(app)
 
     @app.route('/api/build-candles/<interval>')
+    @uses_reader
     def build_candles(interval: str):
         """
-        Build OHLCV candles from raw ticks with volume clusters.
+        Build OHLCV candles with volume clusters (1m from raw ticks, coarser
+        intervals rolled up from the next finer one).
         Supported intervals: 1m, 3m, 5m, 15m, 30m, 1h, 4h, 1d, etc.
+
+        Query params: market (default binance_spot), symbol (default ETHUSDT),
+        start / end / before as epoch milliseconds and limit (newest N candles).
+        format=json|columns|arrow|ndjson, or the matching Accept header;
+        ndjson always streams, arrow streams record batches with stream=1.
+
+        Non-streamed responses are cached until the stream's data changes and
+        carry an ETag; If-None-Match with it returns 304.
         """
-        db = get_db()
-        ticks_table = table_name("binance_spot", "ETHUSDT")
+        try:
+            market = validate_market(request.args.get("market", "binance_spot"))
+        except ValueError:
+            return jsonify(error="Invalid market. Use 'binance_spot' or 'binance_futures'"), 400
+        symbol = request.args.get("symbol", "ETHUSDT").upper()
+        start_ms = request.args.get("start", type=int)
+        end_ms = request.args.get("end", type=int)
+        before_ms = request.args.get("before", type=int)
+        limit = request.args.get("limit", type=int)
+        if limit is not None and limit <= 0:
+            return jsonify(error="limit must be positive"), 400
+        try:
+            fmt = negotiate_format()
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        ticks_table = table_name(market, symbol)
         
-        # Validate and convert interval to DuckDB syntax
-        interval_map = {
-            '1m': '1 minute',   '3m': '3 minutes',  '5m': '5 minutes',
-            '15m': '15 minutes','30m': '30 minutes','1h': '1 hour',
-            '4h': '4 hours',    '1d': '1 day',      '1w': '1 week'
-        }
-        if interval not in interval_map:
-            return f"Unsupported interval: {interval}. Use: {', '.join(interval_map.keys())}", 400
+        if interval not in INTERVALS:
+            return f"Unsupported interval: {interval}. Use: {', '.join(INTERVALS.keys())}", 400
+
+        # Same parameters over the same data version -> same bytes. The
+        # version is read before materializing, so ticks arriving meanwhile
+        # only make the entry stale-keyed, never wrong.
+        cache_key = None
+        if fmt != "ndjson" and not (fmt == "arrow" and wants_stream()):
+            cache_key = (market, symbol, interval, start_ms, end_ms, before_ms, limit, fmt,
+                         data_version(market, symbol))
+            etag = candle_cache.etag(cache_key)
+            if etag in request.if_none_match:
+                return candle_cache.not_modified(etag)
+            cached = candle_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        bucket_interval = interval_map[interval]
-        candles_table = f"{ticks_table}_candles_{interval}"
+        candles_table = candles_table_name(market, symbol, interval)
 
         # Ensure ticks table exists
         if not table_exists(ticks_table):
             return f"Ticks table {ticks_table} not found. Load data first.", 404
 
-        print(f"Building {interval} candles into table: {candles_table}")
-
-        # For ETHUSDT, typical tick size is 0.01
-        tick_size = 1
-
-        db.execute(f'''
-            CREATE OR REPLACE TABLE "{candles_table}" AS
-            WITH candle_intervals AS (
-                SELECT 
-                    time_bucket(interval '{bucket_interval}', time) as open_time,
-                    time_bucket(interval '{bucket_interval}', time) + interval '{bucket_interval}' as close_time
-                FROM "{ticks_table}"
-                GROUP BY open_time
-            ),
-            candle_ohlc AS (
-                SELECT
-                    time_bucket(interval '{bucket_interval}', time) as open_time,
-                    ARG_MIN(price, time) AS open,
-                    MAX(price) AS high,
-                    MIN(price) AS low,
-                    ARG_MAX(price, time) AS close,
-                    SUM(qty) AS volume,
-                    SUM(CASE WHEN is_buyer_maker THEN -qty ELSE qty END) AS delta,
-                    SUM(delta) OVER (ORDER BY open_time) AS cvd
-                FROM "{ticks_table}"
-                GROUP BY open_time
-            ),
-            clusters_data AS (
-                SELECT
-                    time_bucket(interval '{bucket_interval}', t.time) as open_time,
-                    ROUND(t.price / {tick_size}) * {tick_size} as cluster_price,
-                    SUM(t.qty) as volume,
-                    SUM(CASE WHEN NOT t.is_buyer_maker THEN t.qty ELSE 0 END) as ask,
-                    SUM(CASE WHEN t.is_buyer_maker THEN t.qty ELSE 0 END) as bid,
-                    SUM(CASE WHEN t.is_buyer_maker THEN -t.qty ELSE t.qty END) as delta
-                FROM "{ticks_table}" t
-                GROUP BY open_time, cluster_price
-            ),
-            clusters_aggregated AS (
-                SELECT
-                    open_time,
-                    LIST([cluster_price, volume, ask, bid, delta] ORDER BY cluster_price DESC) as clusters_array
-                FROM clusters_data
-                GROUP BY open_time
-            )
-            SELECT 
-                co.open_time,
-                co.open,
-                co.high,
-                co.low,
-                co.close,
-                co.volume,
-                co.delta,
-                co.cvd,
-                COALESCE(ca.clusters_array, []) as clusters
-            FROM candle_ohlc co
-            LEFT JOIN clusters_aggregated ca ON co.open_time = ca.open_time
-            ORDER BY co.open_time;
-        ''')
-
-        result = db.execute(f'''
-            SELECT 
-                open_time,
-                open,
-                high, 
-                low,
-                close,
-                volume,
-                delta,
-                clusters,
-                cvd
-            FROM "{candles_table}" 
-            ORDER BY open_time
-        ''').fetchall()
+        # Only buckets at or after the last stored candle are recomputed, and
+        # only if the requested range reaches that far
+        range_end = min((ms for ms in (end_ms, before_ms) if ms is not None), default=None)
+        if app.config["PROCESS_ROLE"] == "api":
+            # Snapshot readers serve what the ingest process materialized
+            if not table_exists(candles_table):
+                return f"Candles table {candles_table} not materialized yet.", 404
+        else:
+            # If a long write (backfill load, archiving) holds the writer, serve
+            # what is materialized already instead of stalling the request
+            try:
+                written = materialize_candles(market, symbol, interval, range_end,
+                                              wait=app.config["MATERIALIZE_WAIT_SECONDS"])
+                app.logger.info(f"Updated {written} {interval} candles in table: {candles_table}")
+            except WriterBusy:
+                if not table_exists(candles_table):
+                    # Nothing stored yet to fall back on
+                    written = materialize_candles(market, symbol, interval, range_end)
+                else:
+                    # Possibly behind the data version: don't cache it
+                    cache_key = None
+                app.logger.warning(f"Writer busy, serving stored {interval} candles from: {candles_table}")
+
+        meta = {
+            'success': True,
+            'market': market,
+            'symbol': symbol,
+            'interval': interval,
+            'cluster_map': CLUSTER_MAP,
+        }
+        sql, params = candles_query(market, symbol, interval, start_ms, end_ms, before_ms, limit)
+        if fmt == "ndjson":
+            return ndjson_stream_response(sql, params, CANDLE_COLUMNS, meta)
+        if fmt == "arrow" and wants_stream():
+            return arrow_stream_response(sql, params, meta)
+        if fmt == "arrow":
+            resp = arrow_response(sql, params, meta)
+        elif fmt == "columns":
+            resp = columns_response(sql, params, CANDLE_COLUMNS, "open_time",
+                                    "candles", meta, count_key="candles_count")
+        else:
+            resp = jsonify({**meta, **candles_payload(sql, params)})
+        if cache_key is not None:
+            candle_cache.put(cache_key, resp)
+        return resp
+
+    def candles_payload(sql: str, params: list) -> dict:
+        """Candles as a list of row dicts, for the default json format."""
+        result = get_db().execute(sql, params).fetchall()
 
         # Convert to list of dictionaries
         candles = []
@@ -155,72 +194,323 @@ def create_app():
                 'clusters': clusters_list
             })
 
-        # Cluster map describing the array indices
-        cluster_map = {
-            'price': 0,
-            'volume': 1,
-            'ask': 2,
-            'bid': 3,
-            'delta': 4
+        return {
+            'candles_count': len(candles),
+            'candles': candles
         }
 
+    @app.route('/api/batch-candles', methods=["GET", "POST"])
+    @uses_reader
+    def batch_candles():
+        """
+        Candles for several streams and intervals in one response.
+
+        POST a JSON body {"specs": [{"market", "symbol", "interval", "start",
+        "end", "before", "limit"}, ...]}; top-level market / start / end /
+        before / limit are defaults for every spec. GET takes
+        symbols=ETHUSDT,BTCUSDT&intervals=1m,1h plus the same defaults as
+        query params, meaning every symbol at every interval.
+
+        Every spec's candles come back in one columnar payload (format=columns,
+        the default) or one Arrow stream (format=arrow), with a `spec` column
+        holding the index into meta.specs; rows are ordered by spec, then
+        time. Specs without materialized candles are flagged `missing`.
+        """
+        fmt = request.args.get("format", "columns")
+        if fmt not in ("columns", "arrow"):
+            return jsonify(error="Unsupported format for batches. Use: columns, arrow"), 400
+        try:
+            if request.method == "POST":
+                body = request.get_json(silent=True)
+                if not isinstance(body, dict):
+                    return jsonify(error="Expected a JSON object with a specs list"), 400
+                raw_specs = body.get("specs") or []
+                defaults = {k: body[k] for k in ("market", "start", "end", "before", "limit") if k in body}
+            else:
+                symbols = [s for s in request.args.get("symbols", "ETHUSDT").split(",") if s]
+                intervals = [i for i in request.args.get("intervals", "").split(",") if i]
+                raw_specs = [{"symbol": s, "interval": i} for s in symbols for i in intervals]
+                defaults = {k: request.args[k] for k in ("market", "start", "end", "before", "limit")
+                            if k in request.args}
+            specs = parse_specs(raw_specs, defaults)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        streams = streams_of(specs)
+        cache_key = (
+            "batch", fmt, tuple(tuple(spec.values()) for spec in specs),
+            tuple(data_version(market, symbol) for market, symbol in streams),  # type: ignore
+        )
+        etag = candle_cache.etag(cache_key)
+        if etag in request.if_none_match:
+            return candle_cache.not_modified(etag)
+        cached = candle_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if app.config["PROCESS_ROLE"] != "api":
+            # One writer hold per stream for all of its intervals
+            for (market, symbol), (intervals, range_end) in streams.items():
+                if not table_exists(table_name(market, symbol)):  # type: ignore
+                    continue
+                try:
+                    materialize_intervals(market, symbol, intervals, range_end,  # type: ignore
+                                          wait=app.config["MATERIALIZE_WAIT_SECONDS"])
+                except WriterBusy:
+                    if not all(table_exists(candles_table_name(market, symbol, i)) for i in intervals):  # type: ignore
+                        materialize_intervals(market, symbol, intervals, range_end)  # type: ignore
+                    else:
+                        cache_key = None
+
+        sql, params, missing = batch_query(specs)
+        meta = {
+            'success': True,
+            'specs': [{**spec, 'missing': n in missing} for n, spec in enumerate(specs)],
+            'cluster_map': CLUSTER_MAP,
+        }
+        columns = {'spec': 'spec', **CANDLE_COLUMNS}
+        if sql is None:
+            resp = jsonify({**meta, 'candles_count': 0, 'candles': {name: [] for name in columns}})
+        elif fmt == "arrow":
+            resp = arrow_response(sql, params, meta)
+        else:
+            resp = columns_response(sql, params, columns, "spec, open_time",
+                                    "candles", meta, count_key="candles_count")
+        if cache_key is not None:
+            candle_cache.put(cache_key, resp)
+        return resp
+    
+    @app.route('/api/build-bars/<kind>')
+    @uses_reader
+    def build_bars(kind: str):
+        """
+        Non-time bars with the candle fields (OHLCV, delta, cvd, clusters)
+        plus close_time, first_id / last_id and trades. A bar closes once its
+        trades reach `threshold`: a number of trades (kind=tick), base volume
+        (volume), quote notional (dollar) or a high-low range (range).
+
+        Query params: threshold (required), market, symbol, start / end /
+        before (epoch ms, on the bar's open time), limit (newest N bars) and
+        format as for /api/build-candles. Cached with an ETag likewise.
+        """
+        try:
+            market = validate_market(request.args.get("market", "binance_spot"))
+        except ValueError:
+            return jsonify(error="Invalid market. Use 'binance_spot' or 'binance_futures'"), 400
+        symbol = request.args.get("symbol", "ETHUSDT").upper()
+        start_ms = request.args.get("start", type=int)
+        end_ms = request.args.get("end", type=int)
+        before_ms = request.args.get("before", type=int)
+        limit = request.args.get("limit", type=int)
+        if limit is not None and limit <= 0:
+            return jsonify(error="limit must be positive"), 400
+        try:
+            threshold = parse_threshold(kind, request.args.get("threshold"))
+            fmt = negotiate_format()
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        cache_key = None
+        if fmt != "ndjson" and not (fmt == "arrow" and wants_stream()):
+            cache_key = ("bars", market, symbol, kind, str(threshold), start_ms, end_ms,
+                         before_ms, limit, fmt, data_version(market, symbol))
+            etag = candle_cache.etag(cache_key)
+            if etag in request.if_none_match:
+                return candle_cache.not_modified(etag)
+            cached = candle_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        ticks_table = table_name(market, symbol)
+        if not table_exists(ticks_table):
+            return f"Ticks table {ticks_table} not found. Load data first.", 404
+
+        bars_table = bars_table_name(market, symbol, kind, threshold)
+        range_end = min((ms for ms in (end_ms, before_ms) if ms is not None), default=None)
+        if app.config["PROCESS_ROLE"] == "api":
+            if not table_exists(bars_table):
+                return f"Bars table {bars_table} not materialized yet.", 404
+        else:
+            try:
+                try:
+                    written = materialize_bars(market, symbol, kind, threshold, range_end,
+                                               wait=app.config["MATERIALIZE_WAIT_SECONDS"])
+                    app.logger.debug(f"Updated {written} {kind} bars in table: {bars_table}")
+                except WriterBusy:
+                    if not table_exists(bars_table):
+                        materialize_bars(market, symbol, kind, threshold, range_end)
+                    else:
+                        cache_key = None
+                        app.logger.info(f"Writer busy, serving stored {kind} bars from: {bars_table}")
+            except TooManyBarTables as e:
+                return jsonify(error=f"{e}; use a threshold that is materialized already"), 409
+
+        meta = {
+            'success': True,
+            'market': market,
+            'symbol': symbol,
+            'kind': kind,
+            'threshold': float(threshold),
+            'cluster_map': CLUSTER_MAP,
+        }
+        sql, params = bars_query(market, symbol, kind, threshold, start_ms, end_ms, before_ms, limit)
+        if fmt == "ndjson":
+            return ndjson_stream_response(sql, params, BAR_COLUMNS, meta)
+        if fmt == "arrow" and wants_stream():
+            return arrow_stream_response(sql, params, meta)
+        if fmt == "arrow":
+            resp = arrow_response(sql, params, meta)
+        elif fmt == "columns":
+            resp = columns_response(sql, params, BAR_COLUMNS, "bar", "bars", meta, count_key="bars_count")
+        else:
+            resp = jsonify({**meta, **bars_payload(sql, params)})
+        if cache_key is not None:
+            candle_cache.put(cache_key, resp)
+        return resp
+
+    @app.route('/api/volume-profile')
+    @uses_reader
+    def get_volume_profile():
+        """
+        Volume profile of a time range with point of control (poc) and 70%
+        value area, re-binned from the per-minute footprint table.
+
+        Query params: market (default binance_spot), symbol (default ETHUSDT),
+        start / end as epoch milliseconds (minute resolution, end exclusive)
+        and bin, the price step of the levels (default the candle cluster step).
+        """
+        try:
+            market = validate_market(request.args.get("market", "binance_spot"))
+        except ValueError:
+            return jsonify(error="Invalid market. Use 'binance_spot' or 'binance_futures'"), 400
+        symbol = request.args.get("symbol", "ETHUSDT").upper()
+        start_ms = request.args.get("start", type=int)
+        end_ms = request.args.get("end", type=int)
+        bin_size = request.args.get("bin", default=float(TICK_SIZE), type=float)
+        if bin_size is None or not bin_size > 0:
+            return jsonify(error="bin must be a positive number"), 400
+
+        if not table_exists(table_name(market, symbol)):
+            return f"Ticks table {table_name(market, symbol)} not found. Load data first.", 404
+        if app.config["PROCESS_ROLE"] != "api":
+            try:
+                materialize_footprint(market, symbol, wait=app.config["MATERIALIZE_WAIT_SECONDS"])
+            except WriterBusy:
+                if not table_exists(footprint_table_name(market, symbol)):
+                    materialize_footprint(market, symbol)
+        elif not table_exists(footprint_table_name(market, symbol)):
+            return f"Footprint of {market} {symbol} not materialized yet.", 404
+
         return jsonify({
             'success': True,
-            'interval': interval,
-            'candles_count': len(candles),
-            'cluster_map': cluster_map,
-            'candles': candles
+            'market': market,
+            'symbol': symbol,
+            'start': start_ms,
+            'end': end_ms,
+            'bin': bin_size,
+            **volume_profile(market, symbol, start_ms, end_ms, bin_size),
         })
-    
-     # a simple page that says hello
-    @app.route('/api/update-ticks-data')
-    def update_ticks ():
-        db = get_db()
-        table = table_name("binance_spot", "ETHUSDT")
-        ensure_table("binance_spot", "ETHUSDT")
-
-        def load_data():
-            url = "https://data.binance.vision/data/spot/monthly/aggTrades/ETHUSDT/ETHUSDT-aggTrades-2025-10.zip"
-            print("Strarting download...")
-            resp = requests.get(url, timeout=360)
-            print("Download complete.")
-            if resp.status_code != 200:
-                return "Failed to download data", 500        
-            print("Starting extraction and insertion...")
-            with zipfile.ZipFile(BytesIO(resp.content)) as z:
-                csv_file = z.namelist()[0]
-                with z.open(csv_file) as f:
-                    import duckdb
-                    df = duckdb.read_csv(f, header=False) # type: ignore
-                    records = [
-                        {"a": row[0], "p": row[1], "q": row[2], "T": row[5], "m": row[6]}
-                        for row in df.fetchall()
-                    ]
-
-                    db.execute(f'''
-                        INSERT INTO "{table}"
-                        SELECT
-                            rec.a AS id,
-                            CAST(rec.p AS DOUBLE) AS price,
-                            CAST(rec.q AS DOUBLE) AS qty,
-                            make_timestamp(rec.t) as time,
-                            rec.m AS is_buyer_maker
-                        FROM unnest(?) AS t(rec)
-                        ON CONFLICT (id) DO NOTHING
-                ''', [records])
-                print("Data insertion complete.")
-        
-        load_data()
-        data = db.table(table).fetchall()
 
-        return str(data)
+    @app.route('/api/live-candles/<interval>')
+    def live_candles_stream(interval: str):
+        """
+        Server-Sent Events with the forming candle of one stream, pushed at
+        most every LIVE_PUSH_SECONDS and only when it changed. Each event is
+        {market, symbol, interval, cluster_map, candle}; candle has the
+        build-candles fields plus `partial` (true for the candle the process
+        started in, which misses earlier trades).
+
+        Query params: market (default binance_spot), symbol (default ETHUSDT).
+
+        Served by the process reading the websockets: "all", or "ingest" on
+        LIVE_HTTP_PORT. "api" workers redirect to LIVE_CANDLES_URL.
+        """
+        try:
+            market = validate_market(request.args.get("market", "binance_spot"))
+        except ValueError:
+            return jsonify(error="Invalid market. Use 'binance_spot' or 'binance_futures'"), 400
+        symbol = request.args.get("symbol", "ETHUSDT").upper()
+        if interval not in live_candles.intervals:
+            return f"Interval {interval} is not aggregated live. Use: {', '.join(live_candles.intervals)}", 400
+        if app.config["PROCESS_ROLE"] == "api":
+            if app.config["LIVE_CANDLES_URL"]:
+                return redirect(app.config["LIVE_CANDLES_URL"].rstrip("/") + request.full_path, 307)
+            return "Live candles are served by the ingest process (LIVE_HTTP_PORT).", 409
+
+        cadence = app.config["LIVE_PUSH_SECONDS"]
+
+        def events():
+            sent = -1
+            idle = 0.0
+            while True:
+                version, payload = live_candles.encoded(market, symbol, interval)
+                if payload is not None and version != sent:
+                    sent = version
+                    idle = 0.0
+                    yield f"data: {payload}\n\n"
+                elif idle >= 15:
+                    # Keeps proxies from closing a quiet connection
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+                time.sleep(cadence)
+                idle += cadence
+
+        return Response(events(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.route('/api/update-ticks-data', methods=["GET", "POST"])
+    def update_ticks():
+        """
+        Queue loading one period of archives for a stream and return the job
+        at once (202); poll its status_url for progress.
+
+        Query params: market (default binance_spot), symbol (default
+        ETHUSDT), period as YYYY-MM (monthly archive) or YYYY-MM-DD (default
+        2025-10). A job for the same market, symbol and period that is queued
+        or running already is returned instead of a new one.
+        """
+        if app.config["PROCESS_ROLE"] == "api":
+            return "This worker serves a read-only snapshot; load data in the ingest process.", 409
+        try:
+            market = validate_market(request.args.get("market", "binance_spot"))
+        except ValueError:
+            return jsonify(error="Invalid market. Use 'binance_spot' or 'binance_futures'"), 400
+        symbol = request.args.get("symbol", "ETHUSDT").upper()
+        if not SYMBOL_RE.match(symbol):
+            return jsonify(error="Invalid symbol"), 400
+        period = request.args.get("period", "2025-10")
+        try:
+            parse_period(period)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        try:
+            job, created = ingest_jobs.submit(market, symbol, period)
+        except QueueFull:
+            return jsonify(error="Too many ingest jobs waiting, retry later"), 429
+        return jsonify(
+            job=job.to_dict(),
+            created=created,
+            status_url=url_for("job_status", job_id=job.id),
+        ), 202
+
+    @app.route('/api/jobs')
+    def list_jobs():
+        """Ingest jobs, newest first, with counts per state."""
+        return {"counts": ingest_jobs.stats(), "jobs": [job.to_dict() for job in ingest_jobs.jobs()]}
+
+    @app.route('/api/jobs/<job_id>')
+    def job_status(job_id: str):
+        """Progress of one ingest job: bytes, rows, rows/sec and ETA."""
+        job = ingest_jobs.get(job_id)
+        if job is None:
+            return jsonify(error="Unknown job"), 404
+        return job.to_dict()
 
     # ------------------------------------------------------------------
     # 4. Register blueprints (they will create tables when first accessed)
     # ------------------------------------------------------------------
-    # from .blueprints.ticks import create_ticks_blueprint
-    # app.register_blueprint(create_ticks_blueprint())
-
-
+    from .blueprints.ticks import create_ticks_blueprint
+    app.register_blueprint(create_ticks_blueprint())
 
     return app
\ No newline at end of file
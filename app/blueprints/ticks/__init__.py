@@ -9,10 +9,14 @@ def create_ticks_blueprint():
     # Register sub-blueprint with all routes
     bp.register_blueprint(ticks_bp)
 
-    # Auto-start background sync when the app loads this blueprint
+    # Auto-start background sync when the app loads this blueprint, unless
+    # ingestion runs in its own process (`python manage.py ingest`) or
+    # BACKGROUND_SYNC is off
     @bp.record_once
     def on_load(state):
         app = state.app
+        if app.config["PROCESS_ROLE"] != "all" or not app.config["BACKGROUND_SYNC"]:
+            return
         with app.app_context():
             start_background_sync()
 
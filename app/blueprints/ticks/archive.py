@@ -0,0 +1,160 @@
+# app/blueprints/ticks/archive.py
+import os
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+from flask import current_app
+from app.extensions import get_db, writer
+from .storage import Market, note_write, rewind_derived, table_name
+
+# Closed days are compacted into
+#   {ARCHIVE_PATH}/market={market}/symbol={symbol}/date={YYYY-MM-DD}/data.parquet
+# sorted by (time, id) and ZSTD-compressed; the DuckDB table keeps only the
+# last HOT_DAYS days.
+
+TICK_COLUMNS_SQL = "id, price, qty, time, is_buyer_maker"
+# What readers and the archive get from a hot table, whichever its layout
+# (see storage._column_types); a no-op cast for DOUBLE columns
+TICK_READ_SQL = "id, CAST(price AS DOUBLE) AS price, CAST(qty AS DOUBLE) AS qty, time, is_buyer_maker"
+
+
+def archive_root() -> Path:
+    return Path(current_app.config["ARCHIVE_PATH"])
+
+
+def stream_dir(market: Market, symbol: str) -> Path:
+    return archive_root() / f"market={market}" / f"symbol={symbol.upper()}"
+
+
+def partition_file(market: Market, symbol: str, day: date) -> Path:
+    return stream_dir(market, symbol) / f"date={day.isoformat()}" / "data.parquet"
+
+
+def has_archive(market: Market, symbol: str) -> bool:
+    return any(stream_dir(market, symbol).glob("date=*/data.parquet"))
+
+
+def archived_days(market: Market, symbol: str) -> list[date]:
+    return sorted(
+        date.fromisoformat(path.parent.name.split("=", 1)[1])
+        for path in stream_dir(market, symbol).glob("date=*/data.parquet")
+    )
+
+
+def _sql_path(path: Path) -> str:
+    return str(path).replace("'", "''")
+
+
+def ticks_source(market: Market, symbol: str,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None) -> str:
+    """
+    FROM-clause expression covering a stream's hot table and its Parquet
+    archive. `start` / `end` (inclusive, naive UTC) prune archive partitions
+    by date; callers still filter on `time` themselves.
+    """
+    table = table_name(market, symbol)
+    days = archived_days(market, symbol)
+    if not days:
+        return f'(SELECT {TICK_READ_SQL} FROM "{table}")'
+
+    # Every hot row is read. Hot rows on an archived day are late arrivals
+    # (repair, backfill) the next compaction merges in, or rows already
+    # copied into their partition and about to be deleted (or still present
+    # in a snapshot taken before the delete): archived rows with the id of
+    # one of them are skipped. Only those few rows, older than the day after
+    # the newest partition, are joined against.
+    hot_from = days[-1] + timedelta(days=1)
+    prune: list[str] = []
+    if start is not None:
+        prune.append(f"date >= DATE '{start.date().isoformat()}'")
+    if end is not None:
+        prune.append(f"date <= DATE '{end.date().isoformat()}'")
+    prune_sql = ("WHERE " + " AND ".join(prune)) if prune else ""
+    glob = _sql_path(stream_dir(market, symbol) / "date=*" / "data.parquet")
+    return f'''(
+        SELECT {TICK_READ_SQL} FROM "{table}"
+        UNION ALL
+        SELECT {TICK_COLUMNS_SQL}
+        FROM read_parquet('{glob}', hive_partitioning = true)
+        ANTI JOIN (
+            SELECT id FROM "{table}" WHERE time < TIMESTAMP '{hot_from.isoformat()}'
+        ) AS late USING (id)
+        {prune_sql}
+    )'''
+
+
+def archived_row_count(market: Market, symbol: str) -> int:
+    """Row count of the archive from Parquet footers, without reading data."""
+    if not has_archive(market, symbol):
+        return 0
+    glob = _sql_path(stream_dir(market, symbol) / "date=*" / "data.parquet")
+    row = get_db().execute(
+        f"SELECT SUM(num_rows) FROM parquet_file_metadata('{glob}')"
+    ).fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def compact_day(market: Market, symbol: str, day: date) -> int:
+    """
+    Move one closed day from the hot table into its archive partition,
+    merging with (and de-duplicating against) rows archived earlier. Returns
+    the number of rows moved out of the hot table.
+    """
+    table = table_name(market, symbol)
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+
+    target = partition_file(market, symbol, day)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".parquet.tmp")
+
+    rows_sql = f'SELECT {TICK_READ_SQL} FROM "{table}" WHERE time >= ? AND time < ?'
+    merging = target.exists()
+    if merging:
+        rows_sql = f'''
+            SELECT {TICK_COLUMNS_SQL} FROM ({rows_sql}
+                UNION ALL
+                SELECT {TICK_COLUMNS_SQL} FROM read_parquet('{_sql_path(target)}'))
+            QUALIFY row_number() OVER (PARTITION BY id ORDER BY time) = 1
+        '''
+
+    # Held across copy and delete so no trade for the day lands in between
+    with writer() as db:
+        first_ms = db.execute(
+            f'SELECT epoch_ms(min(time)) FROM "{table}" WHERE time >= ? AND time < ?', [start, end]
+        ).fetchone()[0]
+        db.execute(f'''
+            COPY ({rows_sql} ORDER BY time, id)
+            TO '{_sql_path(tmp)}' (FORMAT parquet, COMPRESSION zstd)
+        ''', [start, end])
+        os.replace(tmp, target)
+
+        row = db.execute(
+            f'DELETE FROM "{table}" WHERE time >= ? AND time < ?', [start, end]
+        ).fetchone()
+        if merging and first_ms is not None:
+            # Late trades merged into an archived day: recompute what was
+            # derived from that day on
+            rewind_derived(db, table, int(first_ms))
+    note_write(table)
+    return int(row[0]) if row else 0
+
+
+def compact_closed_days(market: Market, symbol: str, hot_days: int) -> int:
+    """Archive every day older than `hot_days` days still in the hot table."""
+    table = table_name(market, symbol)
+    today = datetime.now(timezone.utc).date()
+    cutoff = datetime.combine(today - timedelta(days=hot_days), datetime.min.time())
+    days = [
+        row[0] for row in get_db().execute(f'''
+            SELECT DISTINCT CAST(time AS DATE) AS day FROM "{table}"
+            WHERE time < ?
+            ORDER BY day
+        ''', [cutoff]).fetchall()
+    ]
+    moved = 0
+    for day in days:
+        count = compact_day(market, symbol, day)
+        moved += count
+        current_app.logger.info(f"Archived {market} {symbol} {day}: {count} trades")
+    return moved
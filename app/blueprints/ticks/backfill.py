@@ -0,0 +1,321 @@
+# app/blueprints/ticks/backfill.py
+import calendar
+import functools
+import shutil
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from app.extensions import get_db, writer
+from .storage import Market
+from .binance.downloader import OnBytes, Period, archive_url, fetch_archive, load_csv
+
+# One row per (market, symbol, day):
+#   pending -> downloading -> loaded
+#                          -> failed (retried until MAX_ATTEMPTS)
+# A calendar month whose days are all pending and never attempted is
+# fetched as one monthly archive (2 requests with its checksum instead of
+# 60); if that fails, its days are retried from daily archives. Days are
+# claimed (pending -> downloading) one download at a time, so the
+# historical backfill and API ingest jobs (jobs.py) never fetch the same
+# day twice.
+JOBS_TABLE = "backfill_jobs"
+
+MAX_ATTEMPTS = 5
+DOWNLOAD_TIMEOUT = 120
+
+# Daily archives show up on data.binance.vision some time after the day
+# ends. A day this recent whose archive (or checksum) is not there yet goes
+# back to pending without counting an attempt.
+ARCHIVE_GRACE_DAYS = 3
+
+# Progress of the current run, for status reporting
+backfill_status: dict[str, Any] = {"queued": 0, "in_flight": 0, "loaded_days": 0, "loaded_rows": 0, "failed_days": 0}
+
+
+def ensure_jobs_table() -> None:
+    with writer() as db:
+        db.execute(f'''
+            CREATE TABLE IF NOT EXISTS "{JOBS_TABLE}" (
+                market      VARCHAR,
+                symbol      VARCHAR,
+                day         DATE,
+                state       VARCHAR,
+                attempts    INTEGER DEFAULT 0,
+                rows        BIGINT,
+                error       VARCHAR,
+                updated_at  TIMESTAMP,
+                PRIMARY KEY (market, symbol, day)
+            )
+        ''')
+
+
+def plan_jobs(market: Market, symbol: str, start: date, end: date) -> None:
+    """Add a pending job for every day in [start, end] not planned yet."""
+    if end < start:
+        return
+    with writer() as db:
+        db.execute(f'''
+            INSERT INTO "{JOBS_TABLE}" (market, symbol, day, state, attempts, updated_at)
+            SELECT ?, ?, CAST(d AS DATE), 'pending', 0, now()
+            FROM generate_series(CAST(? AS DATE), CAST(? AS DATE), INTERVAL 1 DAY) AS t(d)
+            ON CONFLICT DO NOTHING
+        ''', [market, symbol, start, end])
+
+
+def _set_state(market: str, symbol: str, days: list[date], state: str,
+               rows: Optional[int] = None, error: Optional[str] = None) -> None:
+    # A monthly archive's row count is recorded on its first day
+    with writer() as db:
+        db.execute(f'''
+            UPDATE "{JOBS_TABLE}"
+            SET state = ?,
+                rows = CASE WHEN day = ? THEN COALESCE(?, rows) ELSE rows END,
+                error = ?, updated_at = now()
+            WHERE market = ? AND symbol = ? AND day IN (SELECT unnest(?))
+        ''', [state, days[0], rows, error, market, symbol, days])
+
+
+def _release(market: str, symbol: str, days: list[date], error: Optional[str] = None) -> None:
+    # Back to pending, taking back the attempt counted when it was claimed
+    with writer() as db:
+        db.execute(f'''
+            UPDATE "{JOBS_TABLE}"
+            SET state = 'pending', attempts = greatest(attempts - 1, 0), error = ?, updated_at = now()
+            WHERE market = ? AND symbol = ? AND day IN (SELECT unnest(?))
+        ''', [error, market, symbol, days])
+
+
+def runnable_jobs(market: Optional[str] = None, symbol: Optional[str] = None,
+                   first: Optional[date] = None, last: Optional[date] = None) -> list[tuple[str, str, date, int]]:
+    """
+    (market, symbol, day, attempts) of the days still to load: every stream's
+    by default, or one stream's days in [first, last].
+    """
+    where, params = "", [MAX_ATTEMPTS]
+    if market is not None:
+        where = "AND market = ? AND symbol = ? AND day BETWEEN ? AND ?"
+        params += [market, symbol, first, last]
+    return [
+        (row[0], row[1], row[2], int(row[3])) for row in get_db().execute(f'''
+            SELECT market, symbol, day, attempts FROM "{JOBS_TABLE}"
+            WHERE (state = 'pending' OR (state = 'failed' AND attempts < ?)) {where}
+            ORDER BY day, market, symbol
+        ''', params).fetchall()
+    ]
+
+
+# A download: (market, symbol, period, first day, days it loads)
+Download = tuple[str, str, Period, date, list[date]]
+
+def plan_downloads(jobs: list[tuple[str, str, date, int]]) -> list[Download]:
+    """
+    Group runnable day jobs into archive downloads: a monthly archive for
+    each month whose every day is runnable and never attempted, daily
+    archives for the rest. Ordered by first day.
+    """
+    months: dict[tuple[str, str, date], list[tuple[date, int]]] = {}
+    for market, symbol, day, attempts in jobs:
+        months.setdefault((market, symbol, day.replace(day=1)), []).append((day, attempts))
+    plan: list[Download] = []
+    for (market, symbol, first), days in months.items():
+        whole = len(days) == calendar.monthrange(first.year, first.month)[1]
+        if whole and all(attempts == 0 for _, attempts in days):
+            plan.append((market, symbol, "monthly", first, [day for day, _ in days]))
+        else:
+            plan.extend((market, symbol, "daily", day, [day]) for day, _ in days)
+    plan.sort(key=lambda d: (d[3], d[0], d[1]))
+    return plan
+
+
+def _claim(download: Download) -> list[Download]:
+    """
+    Mark the download's days that are still runnable as downloading (one
+    attempt each) and return what to fetch for them: the download itself,
+    nothing if another run took its days meanwhile, or daily downloads for
+    the days left of a partly taken month.
+    """
+    market, symbol, period, first, days = download
+    with writer() as db:
+        claimed = sorted(row[0] for row in db.execute(f'''
+            UPDATE "{JOBS_TABLE}"
+            SET state = 'downloading', attempts = attempts + 1, error = NULL, updated_at = now()
+            WHERE market = ? AND symbol = ? AND day IN (SELECT unnest(?))
+              AND (state = 'pending' OR (state = 'failed' AND attempts < ?))
+            RETURNING day
+        ''', [market, symbol, days, MAX_ATTEMPTS]).fetchall())
+    if len(claimed) == len(days):
+        return [download]
+    return [(market, symbol, "daily", day, [day]) for day in claimed]
+
+
+_recovered = False
+_recover_lock = threading.Lock()
+
+def recover_interrupted() -> None:
+    """
+    Downloads cut short by a restart start over and don't count as attempts.
+    Once per process: later, "downloading" jobs belong to a run in progress.
+    """
+    global _recovered
+    with _recover_lock:
+        if _recovered:
+            return
+        ensure_jobs_table()
+        with writer() as db:
+            db.execute(f"UPDATE \"{JOBS_TABLE}\" SET state = 'pending', attempts = attempts - 1 WHERE state = 'downloading'")
+        _recovered = True
+
+
+_http = threading.local()
+
+def _session(pool_size: int) -> requests.Session:
+    # One pooled keep-alive session per download thread
+    session = getattr(_http, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http.session = session
+    return session
+
+
+def _download(url: str, job_dir: Path, pool_size: int, on_bytes: Optional[OnBytes] = None) -> Optional[Path]:
+    job_dir.mkdir(parents=True, exist_ok=True)
+    return fetch_archive(url, job_dir, _session(pool_size), DOWNLOAD_TIMEOUT, on_bytes)
+
+
+# Progress callbacks of run_downloads, both given the archive URL:
+# (url, chunk bytes, Content-Length or None) from the download threads, and
+# (url, rows loaded or None if the archive is not available, error or None)
+# from the calling thread once a download is finished
+OnDownloadBytes = Callable[[str, int, Optional[int]], None]
+OnDownloadDone = Callable[[str, Optional[int], Optional[str]], None]
+
+def run_downloads(downloads: list[Download], workers: int = 4,
+                  on_bytes: Optional[OnDownloadBytes] = None,
+                  on_done: Optional[OnDownloadDone] = None,
+                  status: Optional[dict[str, Any]] = None) -> int:
+    """
+    Fetch and load planned downloads. Each is claimed in the job table just
+    before it is submitted (see _claim), so concurrent runs never fetch the
+    same day twice. Downloads, checksum checks and extraction run on a pool
+    of `workers` threads; the calling thread is the only one touching the
+    database: it loads the extracted CSVs one at a time and records each
+    job's state. `status` (e.g. backfill_status) is kept up to date if
+    given. Returns rows loaded.
+    """
+    today = datetime.now(timezone.utc).date()
+    if status is not None:
+        status.update(queued=sum(len(d[4]) for d in downloads), in_flight=0,
+                      loaded_days=0, loaded_rows=0, failed_days=0)
+    loaded_rows = 0
+
+    def count(field: str, n: int) -> None:
+        if status is not None:
+            status[field] += n
+
+    with tempfile.TemporaryDirectory(prefix="tickrush-backfill-") as tmp, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as pool:
+        spool = Path(tmp)
+        planned = iter(downloads)
+        claimed: list[Download] = []
+        in_flight: dict[Future, tuple[Download, str, Path]] = {}
+
+        def submit_next() -> bool:
+            while not claimed:
+                download = next(planned, None)
+                if download is None:
+                    return False
+                count("queued", -len(download[4]))
+                claimed.extend(_claim(download))
+            download = claimed.pop(0)
+            market, symbol, period, first, days = download
+            job_dir = spool / f"{market}-{symbol}-{period}-{first.isoformat()}"
+            url = archive_url(market, symbol, period, first)  # type: ignore
+            chunk = functools.partial(on_bytes, url) if on_bytes is not None else None
+            in_flight[pool.submit(_download, url, job_dir, workers, chunk)] = (download, url, job_dir)
+            return True
+
+        # Keep the pool busy while bounding how many extracted CSVs sit on disk
+        while len(in_flight) < workers * 2 and submit_next():
+            pass
+
+        while in_flight:
+            if status is not None:
+                status["in_flight"] = len(in_flight)
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                (market, symbol, period, first, days), url, job_dir = in_flight.pop(future)
+                label = f"{market} {symbol} {period} {first.isoformat()[:7] if period == 'monthly' else first}"
+                rows: Optional[int] = None
+                error: Optional[str] = None
+                try:
+                    csv_path = future.result()
+                    if csv_path is None and period == "daily" and today - first <= timedelta(days=ARCHIVE_GRACE_DAYS):
+                        # Not published yet: retried by a later run
+                        _release(market, symbol, days, error="archive not available yet")
+                        current_app.logger.info(f"Backfill {label}: archive not available yet")
+                    elif csv_path is None:
+                        # A missing monthly archive falls back to dailies
+                        _set_state(market, symbol, days, "failed", error="archive not available")
+                        count("failed_days", len(days))
+                    else:
+                        rows = load_csv(market, symbol, csv_path, "aggTrades")  # type: ignore
+                        _set_state(market, symbol, days, "loaded", rows=rows)
+                        loaded_rows += rows
+                        count("loaded_days", len(days))
+                        count("loaded_rows", rows)
+                        current_app.logger.info(f"Backfilled {label}: {rows} trades")
+                except Exception as e:
+                    # Checksum mismatches land here too: nothing was loaded
+                    error = repr(e)[:500]
+                    _set_state(market, symbol, days, "failed", error=error)
+                    count("failed_days", len(days))
+                    current_app.logger.warning(f"Backfill {label} failed: {e!r}")
+                finally:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                if on_done is not None:
+                    on_done(url, rows, error)
+                submit_next()
+
+    if status is not None:
+        status.update(queued=0, in_flight=0)
+    return loaded_rows
+
+
+def run_backfill(symbols: dict[Market, list[str]], start: date, workers: int = 4,
+                 end: Optional[date] = None) -> int:
+    """
+    Backfill every day from `start` to `end` (default: yesterday, UTC) for
+    each stream, whole months from monthly archives (see plan_downloads),
+    with run_downloads. Progress lives in the job table, so an interrupted
+    run resumes where it stopped. Returns rows loaded.
+    """
+    end = end or datetime.now(timezone.utc).date() - timedelta(days=1)
+    recover_interrupted()
+    for market, syms in symbols.items():
+        for symbol in syms:
+            plan_jobs(market, symbol, start, end)
+    return run_downloads(plan_downloads(runnable_jobs()), workers, status=backfill_status)
+
+
+def job_counts(market: Optional[str] = None, symbol: Optional[str] = None,
+               first: Optional[date] = None, last: Optional[date] = None) -> dict[str, int]:
+    """Day jobs per state, of every stream or of one stream's days in [first, last]."""
+    ensure_jobs_table()
+    where, params = "", []
+    if market is not None:
+        where = "WHERE market = ? AND symbol = ? AND day BETWEEN ? AND ?"
+        params = [market, symbol, first, last]
+    return {
+        row[0]: int(row[1]) for row in get_db().execute(
+            f'SELECT state, COUNT(*) FROM "{JOBS_TABLE}" {where} GROUP BY state', params
+        ).fetchall()
+    }
@@ -0,0 +1,473 @@
+# app/blueprints/ticks/bars.py
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Optional
+from flask import current_app
+from app.extensions import get_db, table_exists, writer
+from .storage import Market, table_name
+from .archive import ticks_source
+from .candles import TICK_SIZE, WATERMARKS_TABLE, ensure_watermarks_table, get_watermark, newest_tick
+
+# Non-time bars: a bar closes once the trades in it reach a threshold of a
+# running measure instead of at a clock boundary. Trades are ordered by
+# (time, id) and numbered; for the cumulative kinds bar k holds the trades
+# whose running total *before* them lies in [k * threshold, (k + 1) * threshold),
+# so the trade crossing the threshold is the last of its bar and the overshoot
+# counts towards the next one. A single trade worth several thresholds skips
+# bar numbers.
+#   tick    number of trades
+#   volume  base asset quantity
+#   dollar  quote notional (price * qty)
+#   range   high - low: a bar closes with the trade that takes its range to
+#           the threshold. Path dependent, so not a window function; the bar
+#           starts are found in one pass over the new prices (_range_starts)
+#           and joined back, the rest is the same SQL as the other kinds.
+#
+# Running totals are exact DECIMALs so an incremental update assigns the
+# same bar numbers as a rebuild would.
+MEASURES = {
+    'tick': 'CAST(1 AS DECIMAL(38, 16))',
+    'volume': 'CAST(qty AS DECIMAL(38, 8))',
+    'dollar': 'CAST(price AS DECIMAL(38, 8)) * CAST(qty AS DECIMAL(38, 8))',
+}
+BAR_KINDS = (*MEASURES, 'range')
+
+# Prices pulled per chunk while looking for range bar starts
+RANGE_BATCH_ROWS = 1_000_000
+
+
+class TooManyBarTables(Exception):
+    """Creating another bars table would exceed MAX_BAR_TABLES."""
+
+
+def parse_threshold(kind: str, raw: Optional[str]) -> Decimal:
+    """Threshold of a bar kind from its query string form. Raises ValueError."""
+    if kind not in BAR_KINDS:
+        raise ValueError(f"Unsupported bar kind: {kind}. Use: {', '.join(BAR_KINDS)}")
+    if raw is None or raw == "":
+        raise ValueError("threshold is required")
+    try:
+        threshold = Decimal(raw)
+    except InvalidOperation:
+        raise ValueError("threshold must be a number")
+    if not threshold.is_finite() or threshold <= 0:
+        raise ValueError("threshold must be a positive number")
+    if kind == 'tick' and threshold != threshold.to_integral_value():
+        raise ValueError("threshold of tick bars must be a whole number of trades")
+    threshold = threshold.normalize()
+    # Positive exponents (5E+2) don't survive binding as a DuckDB parameter
+    return threshold.quantize(Decimal(1)) if threshold.as_tuple().exponent > 0 else threshold  # type: ignore
+
+
+def bars_table_name(market: Market, symbol: str, kind: str, threshold: Decimal) -> str:
+    # 1000000 -> "1000000", 0.5 -> "0_5"
+    return f"{table_name(market, symbol)}_bars_{kind}_{format(threshold, 'f').replace('.', '_')}"
+
+
+def ensure_bars_table(bars_table: str) -> None:
+    # The candle columns plus the bar's span; start_total is the running
+    # measure before its first trade, where an update resumes counting.
+    ensure_watermarks_table()
+    get_db().execute(f'''
+        CREATE TABLE IF NOT EXISTS "{bars_table}" (
+            bar         BIGINT,
+            open_time   TIMESTAMP,
+            close_time  TIMESTAMP,
+            first_id    BIGINT,
+            last_id     BIGINT,
+            trades      BIGINT,
+            open        DOUBLE,
+            high        DOUBLE,
+            low         DOUBLE,
+            close       DOUBLE,
+            volume      DOUBLE,
+            delta       DOUBLE,
+            cvd         DOUBLE,
+            clusters    DOUBLE[][],
+            start_total DECIMAL(38, 16)
+        )
+    ''')
+
+
+def _bars_select(assign_sql: str) -> str:
+    # `assign_sql` defines the CTEs up to "assigned": the new ticks with their
+    # sequence number `seq`, running total `total` and `bar`. The last
+    # parameter is the CVD carried over from the bar before the open one.
+    return f'''
+        WITH {assign_sql},
+        bar_ohlc AS (
+            SELECT
+                bar,
+                MIN(time) AS open_time,
+                MAX(time) AS close_time,
+                ARG_MIN(id, seq) AS first_id,
+                ARG_MAX(id, seq) AS last_id,
+                COUNT(*) AS trades,
+                ARG_MIN(price, seq) AS open,
+                MAX(price) AS high,
+                MIN(price) AS low,
+                ARG_MAX(price, seq) AS close,
+                SUM(qty) AS volume,
+                SUM(CASE WHEN is_buyer_maker THEN -qty ELSE qty END) AS delta,
+                MIN(total) AS start_total
+            FROM assigned
+            GROUP BY bar
+        ),
+        clusters_data AS (
+            SELECT
+                bar,
+                ROUND(price / {TICK_SIZE}) * {TICK_SIZE} AS cluster_price,
+                SUM(qty) AS volume,
+                SUM(CASE WHEN NOT is_buyer_maker THEN qty ELSE 0 END) AS ask,
+                SUM(CASE WHEN is_buyer_maker THEN qty ELSE 0 END) AS bid
+            FROM assigned
+            GROUP BY bar, cluster_price
+        ),
+        clusters_aggregated AS (
+            SELECT
+                bar,
+                LIST([cluster_price, volume, ask, bid, ask - bid] ORDER BY cluster_price DESC) AS clusters_array
+            FROM clusters_data
+            GROUP BY bar
+        )
+        SELECT
+            bo.bar,
+            bo.open_time,
+            bo.close_time,
+            bo.first_id,
+            bo.last_id,
+            bo.trades,
+            bo.open,
+            bo.high,
+            bo.low,
+            bo.close,
+            bo.volume,
+            bo.delta,
+            ? + SUM(bo.delta) OVER (ORDER BY bo.bar) AS cvd,
+            COALESCE(ca.clusters_array, []) AS clusters,
+            bo.start_total
+        FROM bar_ohlc bo
+        LEFT JOIN clusters_aggregated ca ON bo.bar = ca.bar
+        ORDER BY bo.bar
+    '''
+
+
+def _cumulative_assign(source_sql: str, since_sql: str, measure: str) -> str:
+    # Parameters: since_sql params, the running total before the first new
+    # tick, the threshold
+    return f'''
+        ticks AS (
+            SELECT *, ROW_NUMBER() OVER (ORDER BY time, id) AS seq
+            FROM {source_sql} {since_sql}
+        ),
+        totals AS (
+            SELECT *, ? + COALESCE(SUM({measure}) OVER (
+                ORDER BY seq ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ), 0) AS total
+            FROM ticks
+        ),
+        assigned AS (
+            SELECT *, CAST(floor(total / ?) AS BIGINT) AS bar FROM totals
+        )
+    '''
+
+
+def _range_assign(source_sql: str, since_sql: str) -> str:
+    # Parameters: since_sql params, the sequence numbers bars start at and
+    # their bar numbers
+    return f'''
+        ticks AS (
+            SELECT *, ROW_NUMBER() OVER (ORDER BY time, id) AS seq
+            FROM {source_sql} {since_sql}
+        ),
+        starts AS (
+            SELECT UNNEST(?::BIGINT[]) AS seq, UNNEST(?::BIGINT[]) AS bar
+        ),
+        assigned AS (
+            SELECT t.*, s.bar, CAST(0 AS DECIMAL(38, 16)) AS total
+            FROM ticks t ASOF JOIN starts s ON t.seq >= s.seq
+        )
+    '''
+
+
+def _range_starts(source_sql: str, where_sql: str, params: list,
+                  threshold: Decimal, first_bar: int) -> tuple[list[int], list[int], int]:
+    """
+    Sequence numbers (1-based, in (time, id) order) at which range bars
+    start, their bar numbers from `first_bar` on, and the number of ticks
+    read. The first tick always opens a bar.
+    """
+    # Float noise must not keep 3005.01 - 3000.01 from reaching 5
+    limit = float(threshold) * (1 - 1e-9)
+    reader = get_db().execute(
+        f'SELECT price FROM {source_sql} {where_sql} ORDER BY time, id', params
+    ).fetch_record_batch(RANGE_BATCH_ROWS)
+    starts: list[int] = []
+    seq = 0
+    high = low = 0.0
+    closed = True
+    for batch in reader:
+        for price in batch.column(0).to_pylist():
+            seq += 1
+            if closed:
+                high = low = price
+                starts.append(seq)
+                closed = False
+            elif price > high:
+                high = price
+            elif price < low:
+                low = price
+            if high - low >= limit:
+                closed = True
+    return starts, list(range(first_bar, first_bar + len(starts))), seq
+
+
+# Where an update resumes: the open bar's number, the running total before
+# it (None for a full build), the CVD before it, and the ticks source, WHERE
+# clause and parameters selecting the ticks from its first one on
+Resume = tuple[int, Optional[Decimal], float, str, str, list]
+
+def _resume_point(market: Market, symbol: str, bars_table: str, new_tick: datetime) -> Resume:
+    """
+    The open bar is the last one that opened at or before the watermark:
+    the last bar normally, an earlier one once storage.rewind_derived moved
+    the watermark back for older ticks. Without one (no watermark, or ticks
+    older than every bar) the table is rebuilt. Ticks are taken up to
+    `new_tick`, which becomes the watermark.
+    """
+    db = get_db()
+    wm_open, _ = get_watermark(bars_table)
+    open_bar = None
+    if wm_open is not None:
+        open_bar = db.execute(f'''
+            SELECT bar, open_time, first_id, start_total FROM "{bars_table}"
+            WHERE open_time <= ?
+            ORDER BY bar DESC
+            LIMIT 1
+        ''', [wm_open]).fetchone()
+    if open_bar is None:
+        return 0, None, 0.0, ticks_source(market, symbol), "WHERE time <= ?", [new_tick]
+    bar, open_time, first_id, start_total = open_bar
+    row = db.execute(f'''
+        SELECT cvd FROM "{bars_table}"
+        WHERE bar < ?
+        ORDER BY bar DESC
+        LIMIT 1
+    ''', [bar]).fetchone()
+    base_cvd = float(row[0]) if row and row[0] is not None else 0.0
+    return (bar, start_total, base_cvd, ticks_source(market, symbol, open_time),
+            "WHERE time >= ? AND NOT (time = ? AND id < ?) AND time <= ?",
+            [open_time, open_time, first_id, new_tick])
+
+
+# Range bar starts found before taking the writer: the tick cutoff, the
+# resume point's bar and parameters, the number of ticks read, the starts
+# and their bar numbers
+RangePlan = tuple[datetime, int, list, int, list[int], list[int]]
+
+def _plan_range(market: Market, symbol: str, bars_table: str, threshold: Decimal) -> Optional[RangePlan]:
+    # The pass over the new prices runs in Python and reads every tick of a
+    # first build, so it runs on a reader; the writer only checks that
+    # nothing it read changed meanwhile (see _materialize_bars).
+    wm_tick = get_watermark(bars_table)[1] if table_exists(bars_table) else None
+    new_tick = newest_tick(market, symbol, wm_tick)
+    if new_tick is None or (wm_tick is not None and new_tick <= wm_tick):
+        return None
+    if table_exists(bars_table):
+        bar, _, _, source_sql, where_sql, params = _resume_point(market, symbol, bars_table, new_tick)
+    else:
+        bar, source_sql, where_sql, params = 0, ticks_source(market, symbol), "WHERE time <= ?", [new_tick]
+    starts, numbers, count = _range_starts(source_sql, where_sql, params, threshold, bar)
+    return new_tick, bar, params, count, starts, numbers
+
+
+def _ensure_capacity(bars_table: str) -> None:
+    # Every distinct (stream, kind, threshold) is a table of its own and a
+    # full build over the stream's history: cap how many may exist
+    if table_exists(bars_table):
+        return
+    max_tables = current_app.config["MAX_BAR_TABLES"]
+    row = get_db().execute('''
+        SELECT COUNT(*) FROM duckdb_tables()
+        WHERE regexp_matches(table_name, '_bars_(tick|volume|dollar|range)_')
+    ''').fetchone()
+    if row and row[0] >= max_tables:
+        raise TooManyBarTables(f"{row[0]} bar tables exist already (MAX_BAR_TABLES = {max_tables})")
+
+
+def materialize_bars(market: Market, symbol: str, kind: str, threshold: Decimal,
+                     end: Optional[int] = None, wait: Optional[float] = None) -> int:
+    """
+    Bring "{ticks_table}_bars_{kind}_{threshold}" up to date.
+
+    Bars before the open one are closed for good. The open bar is the last
+    one, or an earlier one when older ticks were inserted since (see
+    _resume_point): it is deleted and rebuilt from its first trade together
+    with everything newer, continuing its bar number and running total.
+    With `end` (epoch ms) before the open bar nothing is touched.
+
+    Runs on the writer like materialize_candles (`wait` as there); range
+    bar starts are found before taking it. Raises TooManyBarTables instead
+    of creating a table past MAX_BAR_TABLES. Returns the number of bars
+    (re)written.
+    """
+    bars_table = bars_table_name(market, symbol, kind, threshold)
+    plan = None
+    if kind == 'range':
+        _ensure_capacity(bars_table)
+        plan = _plan_range(market, symbol, bars_table, threshold)
+    with writer(wait):
+        return _materialize_bars(market, symbol, kind, threshold, end, plan)
+
+
+def _materialize_bars(market: Market, symbol: str, kind: str, threshold: Decimal,
+                      end: Optional[int], plan: Optional[RangePlan] = None) -> int:
+    db = get_db()
+    bars_table = bars_table_name(market, symbol, kind, threshold)
+
+    _ensure_capacity(bars_table)
+    ensure_bars_table(bars_table)
+    wm_open, wm_tick = get_watermark(bars_table)
+    if (wm_open is not None and end is not None
+            and datetime.fromtimestamp(end / 1000, timezone.utc).replace(tzinfo=None) < wm_open):
+        return 0
+    # A range plan's ticks end at its cutoff; newer ones wait for the next update
+    new_tick = plan[0] if plan is not None else newest_tick(market, symbol, wm_tick)
+    if new_tick is None or (wm_tick is not None and new_tick <= wm_tick):
+        return 0
+
+    bar, start_total, base_cvd, source_sql, where_sql, where_params = _resume_point(
+        market, symbol, bars_table, new_tick
+    )
+
+    if kind == 'range':
+        starts: Optional[list[int]] = None
+        if plan is not None and plan[1:3] == (bar, where_params):
+            # Reuse the starts unless ticks arrived (or were rewound) in the
+            # range the plan read
+            row = db.execute(f'SELECT COUNT(*) FROM {source_sql} {where_sql}', where_params).fetchone()
+            if row and row[0] == plan[3]:
+                starts, numbers = plan[4], plan[5]
+        if starts is None:
+            starts, numbers, _ = _range_starts(source_sql, where_sql, where_params, threshold, bar)
+        select_sql = _bars_select(_range_assign(source_sql, where_sql))
+        params = where_params + [starts, numbers, base_cvd]
+    else:
+        select_sql = _bars_select(_cumulative_assign(source_sql, where_sql, MEASURES[kind]))
+        params = where_params + [start_total or Decimal(0), threshold, base_cvd]
+
+    db.execute("BEGIN TRANSACTION")
+    try:
+        if start_total is not None:
+            db.execute(f'DELETE FROM "{bars_table}" WHERE bar >= ?', [bar])
+        else:
+            db.execute(f'DELETE FROM "{bars_table}"')
+
+        row = db.execute(f'INSERT INTO "{bars_table}" {select_sql}', params).fetchone()
+        written = int(row[0]) if row else 0
+
+        db.execute(f'''
+            INSERT OR REPLACE INTO "{WATERMARKS_TABLE}"
+            SELECT ?, arg_max(open_time, bar), ?, now() FROM "{bars_table}"
+        ''', [bars_table, new_tick])
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+    return written
+
+
+# Column expressions for the column-oriented JSON format
+BAR_COLUMNS = {
+    'time': 'epoch_ms(open_time)',
+    'close_time': 'epoch_ms(close_time)',
+    'first_id': 'first_id',
+    'last_id': 'last_id',
+    'trades': 'trades',
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close',
+    'volume': 'volume',
+    'delta': 'delta',
+    'cvd': 'cvd',
+    'clusters': 'clusters'
+}
+
+
+def bars_query(market: Market, symbol: str, kind: str, threshold: Decimal,
+               start: Optional[int] = None, end: Optional[int] = None,
+               before: Optional[int] = None, limit: Optional[int] = None) -> tuple[str, list]:
+    """
+    SQL and parameters selecting materialized bars in ascending order. The
+    range arguments filter on open_time as in candles_query.
+    """
+    where_clauses: list[str] = []
+    params: list[int] = []
+    if start is not None:
+        where_clauses.append("open_time >= epoch_ms(?)")
+        params.append(start)
+    if end is not None:
+        where_clauses.append("open_time < epoch_ms(?)")
+        params.append(end)
+    if before is not None:
+        where_clauses.append("open_time < epoch_ms(?)")
+        params.append(before)
+
+    where_sql = ("WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = "LIMIT ?"
+        params.append(limit)
+
+    bars_table = bars_table_name(market, symbol, kind, threshold)
+    sql = f'''
+        SELECT * FROM (
+            SELECT
+                bar,
+                open_time,
+                close_time,
+                first_id,
+                last_id,
+                trades,
+                open,
+                high,
+                low,
+                close,
+                volume,
+                delta,
+                cvd,
+                clusters
+            FROM "{bars_table}"
+            {where_sql}
+            ORDER BY bar DESC
+            {limit_sql}
+        )
+        ORDER BY bar
+    '''
+    return sql, params
+
+
+def bars_payload(sql: str, params: list) -> dict[str, Any]:
+    """Bars as a list of row dicts, for the default json format."""
+    bars = []
+    for row in get_db().execute(sql, params).fetchall():
+        (_, open_time, close_time, first_id, last_id, trades,
+         open_price, high, low, close, volume, delta, cvd, clusters) = row
+        bars.append({
+            'time': open_time.isoformat(),
+            'close_time': close_time.isoformat(),
+            'first_id': first_id,
+            'last_id': last_id,
+            'trades': trades,
+            'open': float(open_price),
+            'high': float(high),
+            'low': float(low),
+            'close': float(close),
+            'volume': float(volume),
+            'delta': float(delta),
+            'cvd': float(cvd),
+            'clusters': list(clusters or []),
+        })
+    return {'bars_count': len(bars), 'bars': bars}
@@ -0,0 +1,107 @@
+# app/blueprints/ticks/batch.py
+from typing import Any, Optional
+from app.extensions import get_db
+from .candles import INTERVALS, candles_query, candles_table_name
+
+# Batch candle requests (/api/batch-candles): a list of (market, symbol,
+# interval, range) specs answered together. The specs of one stream are
+# materialized under one writer hold (candles.materialize_intervals), and
+# all of them are read by a single UNION ALL over the candle tables with
+# the spec's index as first column, serialized as one columnar payload.
+MAX_SPECS = 64
+MARKETS = ("binance_spot", "binance_futures")
+RANGE_FIELDS = ("start", "end", "before", "limit")
+
+
+def _int_or_none(value: Any, name: str) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+
+
+def parse_specs(raw_specs: list[Any], defaults: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Validate and normalize specs: dicts with market, symbol, interval and
+    optional start / end / before (epoch ms) and limit, each falling back to
+    `defaults`. Raises ValueError.
+    """
+    if not raw_specs:
+        raise ValueError("No specs given")
+    if len(raw_specs) > MAX_SPECS:
+        raise ValueError(f"At most {MAX_SPECS} specs per batch")
+    specs = []
+    for n, raw in enumerate(raw_specs):
+        if not isinstance(raw, dict):
+            raise ValueError(f"spec {n} must be an object")
+        merged = {**defaults, **{k: v for k, v in raw.items() if v is not None}}
+        market = merged.get("market", "binance_spot")
+        if market not in MARKETS:
+            raise ValueError(f"spec {n}: invalid market. Use 'binance_spot' or 'binance_futures'")
+        interval = merged.get("interval")
+        if interval not in INTERVALS:
+            raise ValueError(f"spec {n}: unsupported interval {interval}. Use: {', '.join(INTERVALS)}")
+        symbol = str(merged.get("symbol", "")).upper()
+        if not symbol.isalnum():
+            raise ValueError(f"spec {n}: invalid symbol")
+        spec = {"market": market, "symbol": symbol, "interval": interval}
+        for field in RANGE_FIELDS:
+            spec[field] = _int_or_none(merged.get(field), f"spec {n}: {field}")
+        if spec["limit"] is not None and spec["limit"] <= 0:
+            raise ValueError(f"spec {n}: limit must be positive")
+        specs.append(spec)
+    return specs
+
+
+def streams_of(specs: list[dict[str, Any]]) -> dict[tuple[str, str], tuple[list[str], Optional[int]]]:
+    """
+    (market, symbol) -> (distinct intervals, end of the range to materialize
+    in epoch ms, None if any spec of the stream is open-ended).
+    """
+    streams: dict[tuple[str, str], tuple[list[str], Optional[int]]] = {}
+    open_ended: set[tuple[str, str]] = set()
+    for spec in specs:
+        key = (spec["market"], spec["symbol"])
+        intervals, end = streams.get(key, ([], None))
+        if spec["interval"] not in intervals:
+            intervals.append(spec["interval"])
+        range_end = min((ms for ms in (spec["end"], spec["before"]) if ms is not None), default=None)
+        if range_end is None:
+            open_ended.add(key)
+        elif end is None or range_end > end:
+            end = range_end
+        streams[key] = (intervals, end)
+    return {key: (intervals, None if key in open_ended else end) for key, (intervals, end) in streams.items()}
+
+
+def batch_query(specs: list[dict[str, Any]]) -> tuple[Optional[str], list, list[int]]:
+    """
+    One SQL statement selecting every spec's candles as (spec, open_time,
+    open, ..., cvd), ordered by spec index and open_time. Returns the SQL
+    (None if no spec has a candle table), its parameters and the indices of
+    specs without a candle table.
+    """
+    tables = [candles_table_name(spec["market"], spec["symbol"], spec["interval"]) for spec in specs]
+    # One catalog lookup for all of them
+    existing = {row[0] for row in get_db().execute(
+        "SELECT table_name FROM duckdb_tables() WHERE table_name IN (SELECT unnest(?))", [tables]
+    ).fetchall()}
+    parts: list[str] = []
+    params: list = []
+    missing: list[int] = []
+    for n, spec in enumerate(specs):
+        if tables[n] not in existing:
+            missing.append(n)
+            continue
+        sql, spec_params = candles_query(
+            spec["market"], spec["symbol"], spec["interval"],
+            spec["start"], spec["end"], spec["before"], spec["limit"],
+        )
+        parts.append(f"SELECT {n} AS spec, * FROM ({sql})")
+        params.extend(spec_params)
+    if not parts:
+        return None, [], missing
+    union = "\nUNION ALL\n".join(parts)
+    return f"SELECT * FROM ({union}) ORDER BY spec, open_time", params, missing
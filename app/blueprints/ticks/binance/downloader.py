@@ -1,38 +1,183 @@
 # app/blueprints/ticks/binance/downloader.py
+import hashlib
+import os
+import shutil
+import tempfile
 import requests
 import zipfile
-from io import BytesIO
 from datetime import date
-from ..storage import insert_trades
-from typing import Literal
+from pathlib import Path
+from typing import Callable, Literal, Optional
+from flask import current_app
+from ..storage import insert_select, note_write, table_name
 
 Market = Literal["binance_spot", "binance_futures"]
+Layout = Literal["trades", "aggTrades"]
+Period = Literal["daily", "monthly"]
 
-BASE_URLS = {
-    "binance_spot": "https://data.binance.vision/data/spot/daily/trades",
-    "binance_futures": "https://data.binance.vision/data/futures/um/daily/trades",
+# Archives live under {BINANCE_DATA_URL}/{MARKET_PATHS[market]}/{period}/aggTrades/{SYMBOL}/.
+# aggTrades ids are the websocket's aggTrade ids, so backfilled days line up
+# with live data in the coverage index.
+MARKET_PATHS = {
+    "binance_spot": "data/spot",
+    "binance_futures": "data/futures/um",
 }
 
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+
+# Called per downloaded chunk with (chunk bytes, Content-Length or None)
+OnBytes = Callable[[int, Optional[int]], None]
+
+# Explicit CSV schemas of the data.binance.vision archives, so read_csv never
+# has to sniff types. Only id, price, qty, time and is_buyer_maker are kept.
+CSV_COLUMNS: dict[Layout, str] = {
+    "trades": """{
+        'id': 'BIGINT', 'price': 'DOUBLE', 'qty': 'DOUBLE', 'quote_qty': 'DOUBLE',
+        'time': 'BIGINT', 'is_buyer_maker': 'BOOLEAN', 'is_best_match': 'BOOLEAN'
+    }""",
+    "aggTrades": """{
+        'id': 'BIGINT', 'price': 'DOUBLE', 'qty': 'DOUBLE', 'first_id': 'BIGINT',
+        'last_id': 'BIGINT', 'time': 'BIGINT', 'is_buyer_maker': 'BOOLEAN',
+        'is_best_match': 'BOOLEAN'
+    }""",
+}
+
+# Archive timestamps are epoch ms, except spot files from 2025 on, which use
+# epoch µs. Anything above 1e14 can only be µs.
+ARCHIVE_TIME_SQL = "CASE WHEN time >= 100000000000000 THEN make_timestamp(time) ELSE epoch_ms(time) END"
+
+
+class ChecksumMismatch(Exception):
+    """A downloaded archive does not match its published .CHECKSUM."""
+
+
+def download_to_file(url: str, dest: Path, session: Optional[requests.Session] = None,
+                     timeout: int = 60, on_bytes: Optional[OnBytes] = None) -> Optional[str]:
+    """
+    Stream `url` to `dest` in chunks. Returns the SHA-256 hex digest of what
+    was written, None on a non-200 response.
+    """
+    http = session or requests
+    digest = hashlib.sha256()
+    with http.get(url, timeout=timeout, stream=True) as resp:
+        if resp.status_code != 200:
+            return None
+        length = resp.headers.get("Content-Length")
+        total = int(length) if length and length.isdigit() else None
+        with open(dest, "wb") as f:
+            for chunk in resp.iter_content(DOWNLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                f.write(chunk)
+                if on_bytes is not None:
+                    on_bytes(len(chunk), total)
+    return digest.hexdigest()
+
+
+def published_checksum(url: str, session: Optional[requests.Session] = None,
+                       timeout: int = 60) -> Optional[str]:
+    """SHA-256 of `url` from its "{url}.CHECKSUM" file ("<hex>  <name>"), None if there is none."""
+    http = session or requests
+    resp = http.get(f"{url}.CHECKSUM", timeout=timeout)
+    if resp.status_code != 200 or not resp.text.strip():
+        return None
+    return resp.text.split()[0].lower()
+
+
+def extract_csv(zip_path: Path, dest_dir: Path) -> Path:
+    """Extract the single CSV in a Binance archive, streaming it to disk."""
+    with zipfile.ZipFile(zip_path) as z:
+        member = z.namelist()[0]
+        out = dest_dir / Path(member).name
+        with z.open(member) as src, open(out, "wb") as dst:
+            shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_BYTES)
+    return out
+
+
+def _has_header(csv_path: Path) -> bool:
+    # Futures archives start with a header line, spot archives don't
+    with open(csv_path, "rb") as f:
+        first = f.read(1)
+    return bool(first) and not first.isdigit()
+
+
+def load_csv(market: Market, symbol: str, csv_path: Path, layout: Layout,
+             id_range: Optional[tuple[int, int]] = None) -> int:
+    """
+    Insert an extracted archive CSV into the ticks table entirely inside
+    DuckDB, only ids within `id_range` (inclusive) if given. Returns the
+    number of rows inserted.
+    """
+    range_sql = "WHERE id BETWEEN ? AND ?" if id_range is not None else ""
+    count = insert_select(market, symbol, f'''
+        SELECT
+            id,
+            price,
+            qty,
+            {ARCHIVE_TIME_SQL} AS time,
+            is_buyer_maker
+        FROM read_csv(?, header = {str(_has_header(csv_path)).lower()}, columns = {CSV_COLUMNS[layout]})
+        {range_sql}
+    ''', [str(csv_path), *(id_range or ())])
+    if count:
+        note_write(table_name(market, symbol))
+    return count
+
+
+def fetch_archive(url: str, spool: Path, session: Optional[requests.Session] = None,
+                  timeout: int = 60, on_bytes: Optional[OnBytes] = None) -> Optional[Path]:
+    """
+    Download a zip archive into `spool`, check it against its published
+    checksum and extract its CSV there. Returns the CSV path, or None if the
+    archive is not available; raises ChecksumMismatch for a corrupt or
+    truncated download. Touches no database state, so it is safe to run
+    from any thread.
+    """
+    # data.binance.vision publishes the checksum alongside every archive: no
+    # checksum, no archive (yet)
+    expected = published_checksum(url, session, timeout)
+    if expected is None:
+        return None
+    zip_path = spool / os.path.basename(url)
+    digest = download_to_file(url, zip_path, session, timeout, on_bytes)
+    if digest is None:
+        return None
+    if digest != expected:
+        zip_path.unlink()
+        raise ChecksumMismatch(f"{os.path.basename(url)}: sha256 {digest}, published {expected}")
+    csv_path = extract_csv(zip_path, spool)
+    zip_path.unlink()
+    return csv_path
+
+
+def load_archive(market: Market, symbol: str, url: str, layout: Layout,
+                 session: Optional[requests.Session] = None, timeout: int = 60) -> int:
+    """
+    Download a zip archive to a spool directory, extract it and bulk-load it.
+    Returns the number of rows inserted, 0 if the archive is not available.
+    """
+    with tempfile.TemporaryDirectory(prefix="tickrush-") as tmp:
+        csv_path = fetch_archive(url, Path(tmp), session, timeout)
+        if csv_path is None:
+            return 0
+        return load_csv(market, symbol, csv_path, layout)
+
+
+def archive_url(market: Market, symbol: str, period: Period, dt: date) -> str:
+    """URL of the daily or monthly aggTrades archive holding `dt`."""
+    stamp = dt.strftime("%Y-%m-%d" if period == "daily" else "%Y-%m")
+    return (
+        f"{current_app.config['BINANCE_DATA_URL'].rstrip('/')}/{MARKET_PATHS[market]}/{period}/aggTrades"
+        f"/{symbol}/{symbol}-aggTrades-{stamp}.zip"
+    )
+
+
+def day_url(market: Market, symbol: str, dt: date) -> str:
+    return archive_url(market, symbol, "daily", dt)
+
+
+def month_url(market: Market, symbol: str, dt: date) -> str:
+    return archive_url(market, symbol, "monthly", dt)
+
+
 def backfill_day(market: Market, symbol: str, dt: date) -> int:
-    url = f"{BASE_URLS[market]}/{symbol}/{symbol}-trades-{dt.strftime('%Y-%m-%d')}.zip"
-    resp = requests.get(url, timeout=30)
-    if resp.status_code != 200:
-        return 0
-
-    with zipfile.ZipFile(BytesIO(resp.content)) as z:
-        csv_file = z.namelist()[0]
-        with z.open(csv_file) as f:
-            import duckdb
-            df = duckdb.read_csv(f, header=False) # type: ignore
-            records = [
-                {
-                    "a": row[0],
-                    "p": row[1],
-                    "q": row[2],
-                    "T": row[4] * 1000,   # to ms
-                    "m": row[5]
-                }
-                for row in df.fetchall()
-            ]
-            insert_trades(market, symbol, records)
-            return len(records)
\ No newline at end of file
+    return load_archive(market, symbol, day_url(market, symbol, dt), "aggTrades")
@@ -0,0 +1,105 @@
+# app/blueprints/ticks/binance/rest.py
+import threading
+import time
+from typing import Iterator, Literal, Optional
+import requests
+
+Market = Literal["binance_spot", "binance_futures"]
+
+# aggTrades REST endpoints: ?symbol=...&fromId=...&limit=... returns up to
+# `limit` trades with id >= fromId, in the websocket payload shape
+REST_URLS = {
+    "binance_spot": "https://api.binance.com/api/v3/aggTrades",
+    "binance_futures": "https://fapi.binance.com/fapi/v1/aggTrades",
+}
+
+PAGE_LIMIT = 1000
+
+# Request weight of one aggTrades call against the IP's per-minute limit
+# (spot 6000, futures 2400)
+REQUEST_WEIGHTS = {
+    "binance_spot": 2,
+    "binance_futures": 20,
+}
+
+# After a 429 (limit hit) or 418 (IP banned for ignoring 429s) no request
+# goes to that market until its Retry-After has passed
+DEFAULT_RETRY_AFTER = {429: 60, 418: 600}
+_banned_until: dict[str, float] = {}
+_banned_lock = threading.Lock()
+
+
+class BudgetExhausted(Exception):
+    """The caller's RestBudget has no room for another request."""
+
+
+class RateLimited(Exception):
+    """The exchange asked us to back off (429/418), or still does."""
+
+
+class RestBudget:
+    """Requests and request weight a caller may still spend, e.g. per repair cycle."""
+
+    def __init__(self, max_weight: int, max_requests: int):
+        self.max_weight = max_weight
+        self.max_requests = max_requests
+        self.weight = 0
+        self.requests = 0
+
+    def spend(self, weight: int) -> None:
+        if self.requests + 1 > self.max_requests or self.weight + weight > self.max_weight:
+            raise BudgetExhausted(f"{self.requests} requests, weight {self.weight} spent")
+        self.requests += 1
+        self.weight += weight
+
+
+def banned_for(market: Market) -> float:
+    """Seconds left before requests to `market` may resume, 0 if none."""
+    with _banned_lock:
+        return max(_banned_until.get(market, 0.0) - time.monotonic(), 0.0)
+
+
+def _back_off(market: Market, resp: requests.Response) -> None:
+    try:
+        seconds = float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        seconds = DEFAULT_RETRY_AFTER[resp.status_code]
+    with _banned_lock:
+        _banned_until[market] = max(_banned_until.get(market, 0.0), time.monotonic() + seconds)
+    raise RateLimited(f"{market}: HTTP {resp.status_code}, retry after {seconds:.0f}s")
+
+
+def agg_trades_between(market: Market, symbol: str, first_id: int, last_id: int,
+                       session: Optional[requests.Session] = None,
+                       urls: Optional[dict[str, str]] = None,
+                       timeout: int = 30,
+                       budget: Optional[RestBudget] = None) -> Iterator[list[dict]]:
+    """
+    Page through aggTrades from `first_id` to `last_id` (inclusive), one
+    list of {"a", "p", "q", "T", "m", ...} payloads per request. Stops early
+    if the exchange has nothing past an id. Each request is charged to
+    `budget` (BudgetExhausted when it runs out); a 429/418, or an earlier
+    one not yet expired, raises RateLimited.
+    """
+    http = session or requests
+    url = {**REST_URLS, **(urls or {})}[market]
+    from_id = first_id
+    while from_id <= last_id:
+        wait = banned_for(market)
+        if wait:
+            raise RateLimited(f"{market}: backing off for {wait:.0f}s")
+        if budget is not None:
+            budget.spend(REQUEST_WEIGHTS[market])
+        resp = http.get(url, params={
+            "symbol": symbol.upper(),
+            "fromId": from_id,
+            "limit": min(PAGE_LIMIT, last_id - from_id + 1),
+        }, timeout=timeout)
+        if resp.status_code in DEFAULT_RETRY_AFTER:
+            _back_off(market, resp)
+        resp.raise_for_status()
+        page = [t for t in resp.json() if t["a"] <= last_id]
+        if not page:
+            return
+        yield page
+        from_id = page[-1]["a"] + 1
@@ -0,0 +1,143 @@
+# app/blueprints/ticks/binance/stream.py
+import asyncio
+import json
+import logging
+import random
+import threading
+from typing import Any, Callable, Literal, Optional
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+Market = Literal["binance_spot", "binance_futures"]
+
+# Combined-stream endpoints: /stream?streams=a@aggTrade/b@aggTrade
+STREAM_URLS = {
+    "binance_spot": "wss://stream.binance.com:9443/stream",
+    "binance_futures": "wss://fstream.binance.com/stream",
+}
+
+# Binance allows up to 1024 streams per connection; stay well below it
+MAX_STREAMS_PER_CONNECTION = 200
+
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+
+OnTrades = Callable[[Market, str, list[dict]], Any]
+
+logger = logging.getLogger(__name__)
+
+
+class StreamManager:
+    """
+    Subscribes to aggTrade for many symbols over a handful of combined-stream
+    connections, all driven by one asyncio event loop in one thread. Messages
+    are parsed on the loop and handed to `on_trades(market, symbol, trades)`,
+    which is expected to only enqueue (see ingest.TradeBuffer).
+    """
+
+    def __init__(self, symbols: dict[Market, list[str]], on_trades: OnTrades,
+                 urls: Optional[dict[str, str]] = None):
+        self.symbols = symbols
+        self.on_trades = on_trades
+        self.urls = {**STREAM_URLS, **(urls or {})}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stats: dict[str, dict[str, Any]] = {}
+
+    def connection_urls(self) -> list[tuple[Market, str]]:
+        out: list[tuple[Market, str]] = []
+        for market, symbols in self.symbols.items():
+            streams = [f"{s.lower()}@aggTrade" for s in symbols]
+            for i in range(0, len(streams), MAX_STREAMS_PER_CONNECTION):
+                chunk = streams[i:i + MAX_STREAMS_PER_CONNECTION]
+                out.append((market, f"{self.urls[market]}?streams={'/'.join(chunk)}"))
+        return out
+
+    # ------------------------------------------------------------------
+    # Event loop
+    # ------------------------------------------------------------------
+
+    def _handle(self, market: Market, message: str | bytes, stats: dict[str, Any]) -> None:
+        data = json.loads(message)
+        payload = data.get("data", data)
+        if payload.get("e") != "aggTrade":
+            return
+        stats["messages"] += 1
+        self.on_trades(market, payload["s"], [payload])
+
+    async def _connection(self, market: Market, url: str, name: str) -> None:
+        stats = self._stats[name] = {
+            "market": market, "connected": False, "messages": 0, "errors": 0,
+            "reconnects": 0, "last_error": None,
+        }
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                async with websockets.connect(url, ping_interval=30, max_size=2 ** 22) as ws:
+                    stats["connected"] = True
+                    delay = RECONNECT_MIN_DELAY
+                    async for message in ws:
+                        # A bad message or a failing consumer costs that
+                        # message only, not the connection
+                        try:
+                            self._handle(market, message, stats)
+                        except Exception as e:
+                            stats["errors"] += 1
+                            stats["last_error"] = repr(e)
+                            logger.exception("Stream %s: message dropped", name)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ConnectionClosed, asyncio.TimeoutError) as e:
+                stats["last_error"] = repr(e)
+            except Exception as e:
+                # Anything else reconnects too rather than ending this task
+                stats["last_error"] = repr(e)
+                logger.exception("Stream %s: connection failed", name)
+            stats["connected"] = False
+            stats["reconnects"] += 1
+            # Exponential backoff with jitter so connections don't reconnect in lockstep
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def run(self) -> None:
+        await asyncio.gather(*(
+            self._connection(market, url, f"{market}#{i}")
+            for i, (market, url) in enumerate(self.connection_urls())
+        ))
+
+    # ------------------------------------------------------------------
+    # Thread control
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Run the event loop in a single daemon thread."""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+
+        def target() -> None:
+            assert self._loop is not None
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.run())
+            except asyncio.CancelledError:
+                pass
+
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._loop is None or self._thread is None:
+            return
+
+        def cancel_all() -> None:
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+
+        self._loop.call_soon_threadsafe(cancel_all)
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._loop = None
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {name: dict(stats) for name, stats in self._stats.items()}
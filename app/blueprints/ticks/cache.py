@@ -0,0 +1,95 @@
+# app/blueprints/ticks/cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from flask import Response, current_app
+from app.extensions import attached_snapshot
+from .storage import Market, ingest_watermark
+
+# Serialized candle responses, keyed by request parameters plus the version
+# of the data they were built from, so new ticks make old entries
+# unreachable and they age out of the LRU.
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Watermark write counters restart with the process; mixing this into ETags
+# keeps a restarted process from reusing an ETag for different data. Not
+# used in an "api" process, whose data version (the snapshot file, named by
+# its publish time) is the same in every worker: their ETags must match for
+# If-None-Match to work whichever worker answers.
+_PROCESS_NONCE = f"{os.getpid()}-{time.time_ns()}"
+
+
+def data_version(market: Market, symbol: str) -> Hashable:
+    """
+    What a cached candle response depends on: the stream's ingestion
+    watermark, or in an "api" process the snapshot it reads.
+    """
+    if current_app.config["PROCESS_ROLE"] == "api":
+        return str(attached_snapshot())
+    return ingest_watermark(market, symbol)
+
+
+class ResponseCache:
+    """LRU of serialized responses, bounded by the total size of the bodies."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[str, bytes, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0}
+
+    @staticmethod
+    def etag(key: Hashable) -> str:
+        salt = "" if current_app.config["PROCESS_ROLE"] == "api" else _PROCESS_NONCE
+        return hashlib.sha1(f"{salt}:{key!r}".encode()).hexdigest()
+
+    def not_modified(self, etag: str) -> Response:
+        with self._lock:
+            self._stats["not_modified"] += 1
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    def get(self, key: Hashable) -> Optional[Response]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        etag, body, mimetype = entry
+        resp = Response(body, mimetype=mimetype)
+        resp.set_etag(etag)
+        return resp
+
+    def put(self, key: Hashable, resp: Response) -> Response:
+        """Store a response's body under `key` and tag the response with its ETag."""
+        etag = self.etag(key)
+        resp.set_etag(etag)
+        body = resp.get_data()
+        if len(body) > self.max_bytes:
+            return resp
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (etag, body, resp.mimetype or "application/octet-stream")
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+        return resp
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes}
+
+
+candle_cache = ResponseCache()
@@ -0,0 +1,475 @@
+# app/blueprints/ticks/candles.py
+from datetime import datetime, timezone
+from typing import Optional
+from app.extensions import get_db, writer
+from .storage import WATERMARKS_TABLE, Market, table_name
+from .archive import ticks_source
+
+# Supported intervals and their DuckDB interval syntax
+INTERVALS = {
+    '1m': '1 minute',   '3m': '3 minutes',  '5m': '5 minutes',
+    '15m': '15 minutes','30m': '30 minutes','1h': '1 hour',
+    '4h': '4 hours',    '1d': '1 day',      '1w': '1 week'
+}
+
+# Intervals built by merging the next finer materialized interval instead of
+# re-aggregating raw ticks. 1m is the only interval built from ticks.
+ROLLUP_SOURCES = {
+    '3m': '1m',   '5m': '1m',   '15m': '5m',
+    '30m': '15m', '1h': '30m',  '4h': '1h',
+    '1d': '4h',   '1w': '1d'
+}
+
+# Price step of candle clusters. Trades are first binned to the symbol's
+# footprint tick (TICK_SIZES) and candle clusters are re-binned from there;
+# with a footprint tick no coarser than the price step the first binning
+# keeps prices as they are, so clusters match binning raw prices.
+TICK_SIZE = 1
+
+# Footprint tick per symbol, filled from config FOOTPRINT_TICK_SIZES
+TICK_SIZES: dict[str, float] = {}
+DEFAULT_TICK_SIZE = 1e-8
+
+# Cluster map describing the array indices
+CLUSTER_MAP = {
+    'price': 0,
+    'volume': 1,
+    'ask': 2,
+    'bid': 3,
+    'delta': 4
+}
+
+def candles_table_name(market: Market, symbol: str, interval: str) -> str:
+    return f"{table_name(market, symbol)}_candles_{interval}"
+
+
+def footprint_table_name(market: Market, symbol: str) -> str:
+    return f"{table_name(market, symbol)}_footprint"
+
+
+def footprint_tick(symbol: str) -> float:
+    return TICK_SIZES.get(symbol.upper(), DEFAULT_TICK_SIZE)
+
+
+def ensure_watermarks_table() -> None:
+    # One row per derived table (candles, footprint or bars): the start of the
+    # last (possibly still forming) bucket or bar and the newest tick that
+    # went into it. storage.rewind_derived moves both back when older ticks
+    # are inserted.
+    get_db().execute(f'''
+        CREATE TABLE IF NOT EXISTS "{WATERMARKS_TABLE}" (
+            candles_table   VARCHAR PRIMARY KEY,
+            open_time       TIMESTAMP,
+            tick_time       TIMESTAMP,
+            updated_at      TIMESTAMP
+        )
+    ''')
+
+
+def ensure_footprint_table(footprint_table: str) -> None:
+    ensure_watermarks_table()
+    # Volume per (minute, price level) at the symbol's footprint tick
+    get_db().execute(f'''
+        CREATE TABLE IF NOT EXISTS "{footprint_table}" (
+            minute      TIMESTAMP,
+            price       DOUBLE,
+            volume      DOUBLE,
+            ask         DOUBLE,
+            bid         DOUBLE
+        )
+    ''')
+
+
+def ensure_candles_table(candles_table: str) -> None:
+    db = get_db()
+    ensure_watermarks_table()
+    db.execute(f'''
+        CREATE TABLE IF NOT EXISTS "{candles_table}" (
+            open_time   TIMESTAMP,
+            open        DOUBLE,
+            high        DOUBLE,
+            low         DOUBLE,
+            close       DOUBLE,
+            volume      DOUBLE,
+            delta       DOUBLE,
+            cvd         DOUBLE,
+            clusters    DOUBLE[][]
+        )
+    ''')
+
+
+def get_watermark(candles_table: str) -> tuple[Optional[datetime], Optional[datetime]]:
+    row = get_db().execute(
+        f'SELECT open_time, tick_time FROM "{WATERMARKS_TABLE}" WHERE candles_table = ?',
+        [candles_table],
+    ).fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def _ticks_select(source_sql: str, footprint_table: str, bucket_interval: str,
+                  since_sql: str, footprint_since_sql: str) -> str:
+    # Parameters: since_sql params, footprint_since_sql params, then the CVD
+    # carried over from the last candle before the recomputed range.
+    return f'''
+        WITH ticks AS (
+            SELECT * FROM {source_sql} {since_sql}
+        ),
+        candle_ohlc AS (
+            SELECT
+                time_bucket(interval '{bucket_interval}', time) as open_time,
+                ARG_MIN(price, time) AS open,
+                MAX(price) AS high,
+                MIN(price) AS low,
+                ARG_MAX(price, time) AS close,
+                SUM(qty) AS volume,
+                SUM(CASE WHEN is_buyer_maker THEN -qty ELSE qty END) AS delta
+            FROM ticks
+            GROUP BY open_time
+        ),
+        clusters_data AS (
+            SELECT
+                time_bucket(interval '{bucket_interval}', f.minute) as open_time,
+                ROUND(f.price / {TICK_SIZE}) * {TICK_SIZE} as cluster_price,
+                SUM(f.volume) as volume,
+                SUM(f.ask) as ask,
+                SUM(f.bid) as bid,
+                SUM(f.ask - f.bid) as delta
+            FROM "{footprint_table}" f {footprint_since_sql}
+            GROUP BY open_time, cluster_price
+        ),
+        clusters_aggregated AS (
+            SELECT
+                open_time,
+                LIST([cluster_price, volume, ask, bid, delta] ORDER BY cluster_price DESC) as clusters_array
+            FROM clusters_data
+            GROUP BY open_time
+        )
+        SELECT
+            co.open_time,
+            co.open,
+            co.high,
+            co.low,
+            co.close,
+            co.volume,
+            co.delta,
+            ? + SUM(co.delta) OVER (ORDER BY co.open_time) AS cvd,
+            COALESCE(ca.clusters_array, []) as clusters
+        FROM candle_ohlc co
+        LEFT JOIN clusters_aggregated ca ON co.open_time = ca.open_time
+        ORDER BY co.open_time
+    '''
+
+
+def _rollup_select(source_table: str, bucket_interval: str, since_sql: str) -> str:
+    # OHLCV and delta merge directly; CVD is the running total at the last
+    # finer candle; clusters are re-summed per price level.
+    return f'''
+        WITH src AS (
+            SELECT * FROM "{source_table}" {since_sql}
+        ),
+        candle_ohlc AS (
+            SELECT
+                time_bucket(interval '{bucket_interval}', open_time) as bucket,
+                ARG_MIN(open, open_time) AS open,
+                MAX(high) AS high,
+                MIN(low) AS low,
+                ARG_MAX(close, open_time) AS close,
+                SUM(volume) AS volume,
+                SUM(delta) AS delta,
+                ARG_MAX(cvd, open_time) AS cvd
+            FROM src
+            GROUP BY bucket
+        ),
+        clusters_data AS (
+            SELECT
+                time_bucket(interval '{bucket_interval}', open_time) as bucket,
+                c[1] as cluster_price,
+                SUM(c[2]) as volume,
+                SUM(c[3]) as ask,
+                SUM(c[4]) as bid,
+                SUM(c[5]) as delta
+            FROM (SELECT open_time, UNNEST(clusters) AS c FROM src)
+            GROUP BY bucket, cluster_price
+        ),
+        clusters_aggregated AS (
+            SELECT
+                bucket,
+                LIST([cluster_price, volume, ask, bid, delta] ORDER BY cluster_price DESC) as clusters_array
+            FROM clusters_data
+            GROUP BY bucket
+        )
+        SELECT
+            co.bucket,
+            co.open,
+            co.high,
+            co.low,
+            co.close,
+            co.volume,
+            co.delta,
+            co.cvd,
+            COALESCE(ca.clusters_array, []) as clusters
+        FROM candle_ohlc co
+        LEFT JOIN clusters_aggregated ca ON co.bucket = ca.bucket
+        ORDER BY co.bucket
+    '''
+
+
+def newest_tick(market: Market, symbol: str, wm_tick: Optional[datetime]) -> Optional[datetime]:
+    # Newest tick after the watermark (hot table plus archive), None if none
+    if wm_tick is not None:
+        row = get_db().execute(
+            f'SELECT MAX(time) FROM {ticks_source(market, symbol, wm_tick)} WHERE time > ?', [wm_tick]
+        ).fetchone()
+    else:
+        row = get_db().execute(f'SELECT MAX(time) FROM {ticks_source(market, symbol)}').fetchone()
+    return row[0] if row else None
+
+
+def materialize_footprint(market: Market, symbol: str, wait: Optional[float] = None) -> int:
+    """
+    Bring "{ticks_table}_footprint" up to date: volume, ask and bid per
+    minute and price level, prices rounded to the symbol's footprint tick.
+    Incremental like the 1m candles (from the last, possibly still forming,
+    minute). Returns the number of rows (re)written.
+    """
+    with writer(wait):
+        return _materialize_footprint(market, symbol)
+
+
+def _materialize_footprint(market: Market, symbol: str) -> int:
+    db = get_db()
+    footprint_table = footprint_table_name(market, symbol)
+    tick = footprint_tick(symbol)
+
+    ensure_footprint_table(footprint_table)
+    wm_minute, wm_tick = get_watermark(footprint_table)
+    if wm_minute is not None:
+        # A rewind leaves it mid-minute
+        wm_minute = wm_minute.replace(second=0, microsecond=0)
+    new_tick = newest_tick(market, symbol, wm_tick)
+    if new_tick is None or (wm_tick is not None and new_tick <= wm_tick):
+        return 0
+
+    since_sql = "WHERE time >= ?" if wm_minute is not None else ""
+    params = [wm_minute] if wm_minute is not None else []
+
+    db.execute("BEGIN TRANSACTION")
+    try:
+        if wm_minute is not None:
+            db.execute(f'DELETE FROM "{footprint_table}" WHERE minute >= ?', [wm_minute])
+        else:
+            db.execute(f'DELETE FROM "{footprint_table}"')
+
+        # Inserted in minute order so zone maps prune range scans
+        row = db.execute(f'''
+            INSERT INTO "{footprint_table}"
+            SELECT
+                time_bucket(interval '1 minute', time) AS minute,
+                ROUND(price / {tick!r}) * {tick!r} AS level,
+                SUM(qty) AS volume,
+                SUM(CASE WHEN NOT is_buyer_maker THEN qty ELSE 0 END) AS ask,
+                SUM(CASE WHEN is_buyer_maker THEN qty ELSE 0 END) AS bid
+            FROM {ticks_source(market, symbol, wm_minute)} {since_sql}
+            GROUP BY minute, level
+            ORDER BY minute, level
+        ''', params).fetchone()
+        written = int(row[0]) if row else 0
+
+        db.execute(f'''
+            INSERT OR REPLACE INTO "{WATERMARKS_TABLE}"
+            SELECT ?, MAX(minute), ?, now() FROM "{footprint_table}"
+        ''', [footprint_table, new_tick])
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+    return written
+
+
+def materialize_candles(market: Market, symbol: str, interval: str,
+                        end: Optional[int] = None, wait: Optional[float] = None) -> int:
+    """
+    Bring "{ticks_table}_candles_{interval}" up to date.
+
+    1m candles are built from ticks, their clusters from the footprint table
+    (brought up to date first); every coarser interval is rolled up from
+    its ROLLUP_SOURCES table, which is brought up to date first. Only buckets
+    at or after the watermark (the last candle, which may still have been
+    forming when it was written) are recomputed. If `end` (epoch ms) lies
+    before the watermark the requested range is already closed and nothing
+    is touched.
+
+    Runs on the writer connection; with `wait` (seconds) raises WriterBusy
+    rather than queueing behind a long write such as a backfill load.
+    Returns the number of candles (re)written.
+    """
+    with writer(wait):
+        return _materialize(market, symbol, interval, end)
+
+
+def materialize_intervals(market: Market, symbol: str, intervals: list[str],
+                          end: Optional[int] = None, wait: Optional[float] = None) -> int:
+    """
+    materialize_candles for several intervals of one stream under a single
+    hold of the writer. Each table is brought up to date at most once, so
+    the ticks are aggregated once (into 1m) and shared rollup sources (5m
+    under both 15m and 1h, ...) are not revisited.
+    """
+    with writer(wait):
+        done: set[str] = set()
+        return sum(_materialize(market, symbol, interval, end, done) for interval in intervals)
+
+
+def _materialize(market: Market, symbol: str, interval: str, end: Optional[int],
+                 done: Optional[set[str]] = None) -> int:
+    if done is not None:
+        if interval in done:
+            return 0
+        done.add(interval)
+    db = get_db()
+    candles_table = candles_table_name(market, symbol, interval)
+    bucket_interval = INTERVALS[interval]
+    source = ROLLUP_SOURCES.get(interval)
+
+    ensure_candles_table(candles_table)
+    wm_open, wm_tick = get_watermark(candles_table)
+    if wm_open is not None:
+        # A rewind (storage.rewind_derived) leaves it mid-bucket
+        wm_open = db.execute(
+            f"SELECT time_bucket(interval '{bucket_interval}', CAST(? AS TIMESTAMP))", [wm_open]
+        ).fetchone()[0]
+    if (wm_open is not None and end is not None
+            and datetime.fromtimestamp(end / 1000, timezone.utc).replace(tzinfo=None) < wm_open):
+        return 0
+
+    # A missing watermark means a first build (or a table left over from a
+    # full rebuild): start from scratch.
+    if source is not None:
+        _materialize(market, symbol, source, end, done)
+        source_table = candles_table_name(market, symbol, source)
+        _, new_tick = get_watermark(source_table)
+        since_sql = "WHERE open_time >= ?" if wm_open is not None else ""
+    else:
+        # Hot table plus any archived days the recomputed range reaches into
+        source_table = ticks_source(market, symbol, wm_open)
+        new_tick = newest_tick(market, symbol, wm_tick)
+        since_sql = "WHERE time >= ?" if wm_open is not None else ""
+    since_params = [wm_open] if wm_open is not None else []
+
+    # Nothing newer than what the last build saw -> nothing to do
+    if new_tick is None or (wm_tick is not None and new_tick <= wm_tick):
+        return 0
+
+    if source is not None:
+        select_sql = _rollup_select(source_table, bucket_interval, since_sql)
+        params = since_params
+    else:
+        base_cvd = 0.0
+        if wm_open is not None:
+            row = db.execute(f'''
+                SELECT cvd FROM "{candles_table}"
+                WHERE open_time < ?
+                ORDER BY open_time DESC
+                LIMIT 1
+            ''', [wm_open]).fetchone()
+            base_cvd = float(row[0]) if row and row[0] is not None else 0.0
+        _materialize_footprint(market, symbol)
+        select_sql = _ticks_select(
+            source_table, footprint_table_name(market, symbol), bucket_interval, since_sql,
+            "WHERE f.minute >= ?" if wm_open is not None else "",
+        )
+        params = since_params + since_params + [base_cvd]
+
+    db.execute("BEGIN TRANSACTION")
+    try:
+        if wm_open is not None:
+            db.execute(f'DELETE FROM "{candles_table}" WHERE open_time >= ?', [wm_open])
+        else:
+            db.execute(f'DELETE FROM "{candles_table}"')
+
+        db.execute(f'INSERT INTO "{candles_table}" {select_sql}', params)
+
+        row = db.execute(f'''
+            SELECT MAX(open_time), COUNT(*) FILTER (WHERE open_time >= COALESCE(?, open_time))
+            FROM "{candles_table}"
+        ''', [wm_open]).fetchone()
+        new_open, written = (row[0], int(row[1])) if row else (None, 0)
+
+        db.execute(f'''
+            INSERT OR REPLACE INTO "{WATERMARKS_TABLE}"
+            VALUES (?, ?, ?, now())
+        ''', [candles_table, new_open, new_tick])
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+    return written
+
+
+# Column expressions for the column-oriented JSON format
+CANDLE_COLUMNS = {
+    'time': 'epoch_ms(open_time)',
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close',
+    'volume': 'volume',
+    'delta': 'delta',
+    'cvd': 'cvd',
+    'clusters': 'clusters'
+}
+
+
+def candles_query(market: Market, symbol: str, interval: str,
+                  start: Optional[int] = None, end: Optional[int] = None,
+                  before: Optional[int] = None, limit: Optional[int] = None) -> tuple[str, list]:
+    """
+    SQL and parameters selecting materialized candles in ascending open_time
+    order.
+
+    `start` (inclusive), `end` and `before` (exclusive) are epoch milliseconds
+    and are pushed down into the scan; with `limit` only the newest `limit`
+    candles of the range are returned.
+    """
+    where_clauses: list[str] = []
+    params: list[int] = []
+    if start is not None:
+        where_clauses.append("open_time >= epoch_ms(?)")
+        params.append(start)
+    if end is not None:
+        where_clauses.append("open_time < epoch_ms(?)")
+        params.append(end)
+    if before is not None:
+        where_clauses.append("open_time < epoch_ms(?)")
+        params.append(before)
+
+    where_sql = ("WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = "LIMIT ?"
+        params.append(limit)
+
+    candles_table = candles_table_name(market, symbol, interval)
+    sql = f'''
+        SELECT * FROM (
+            SELECT
+                open_time,
+                open,
+                high,
+                low,
+                close,
+                volume,
+                delta,
+                clusters,
+                cvd
+            FROM "{candles_table}"
+            {where_sql}
+            ORDER BY open_time DESC
+            {limit_sql}
+        )
+        ORDER BY open_time
+    '''
+    return sql, params
+
@@ -0,0 +1,215 @@
+# app/blueprints/ticks/coverage.py
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Optional
+import requests
+from flask import current_app
+from app.extensions import get_db, table_exists, writer
+from .archive import ticks_source
+from .storage import (
+    COVERAGE_TABLE, Market, ensure_table, insert_missing_trades, record_coverage, table_name,
+)
+from .binance.downloader import day_url, fetch_archive, load_csv
+from .binance.rest import BudgetExhausted, RateLimited, RestBudget, agg_trades_between
+
+# Gaps are the holes between consecutive runs of the coverage index (see
+# storage.COVERAGE_TABLE), found from that small table alone. Tables that
+# held data before the index existed are scanned once to seed it;
+# BUILT_TABLE remembers which were.
+BUILT_TABLE = "tick_coverage_built"
+
+# Gaps looked at per stream and repair cycle, newest first
+REPAIR_BATCH = 20
+# A gap that yielded no rows this many times is left alone (reported only)
+MAX_ATTEMPTS = 5
+DOWNLOAD_TIMEOUT = 120
+
+# Outcome of the last repair cycle per table
+repair_status: dict[str, dict[str, Any]] = {}
+_attempts: dict[tuple[str, int, int], int] = {}
+
+
+def ensure_built_table() -> None:
+    with writer() as db:
+        db.execute(f'''
+            CREATE TABLE IF NOT EXISTS "{BUILT_TABLE}" (
+                ticks_table VARCHAR PRIMARY KEY,
+                runs        BIGINT,
+                built_at    TIMESTAMP
+            )
+        ''')
+
+
+def is_built(table: str) -> bool:
+    return table_exists(BUILT_TABLE) and get_db().execute(
+        f'SELECT 1 FROM "{BUILT_TABLE}" WHERE ticks_table = ?', [table]
+    ).fetchone() is not None
+
+
+def build_coverage(market: Market, symbol: str) -> Optional[int]:
+    """
+    Seed the coverage index of a stream from the rows already stored (hot
+    table and archive), once. Returns the number of runs found, None if the
+    index was built before.
+    """
+    ensure_table(market, symbol)
+    ensure_built_table()
+    table = table_name(market, symbol)
+    if is_built(table):
+        return None
+    # The scan runs on a reader; inserts meanwhile index themselves and
+    # merge with what the scan found
+    runs = [tuple(int(v) for v in row) for row in get_db().execute(f'''
+        SELECT min(id), max(id), epoch_ms(arg_min(time, id)), epoch_ms(arg_max(time, id))
+        FROM (SELECT id, time, id - dense_rank() OVER (ORDER BY id) AS run FROM {ticks_source(market, symbol)})
+        GROUP BY run
+    ''').fetchall()]
+    with writer() as db:
+        record_coverage(db, table, runs)  # type: ignore
+        db.execute(f'INSERT OR REPLACE INTO "{BUILT_TABLE}" VALUES (?, ?, now())', [table, len(runs)])
+    current_app.logger.info(f"{table}: coverage index built, {len(runs)} runs")
+    return len(runs)
+
+
+def coverage_ranges(market: Market, symbol: str, limit: Optional[int] = None) -> list[dict[str, Any]]:
+    """Stored id runs of a stream, newest first."""
+    if not table_exists(COVERAGE_TABLE):
+        return []
+    limit_sql = f"LIMIT {int(limit)}" if limit is not None else ""
+    rows = get_db().execute(f'''
+        SELECT first_id, last_id, epoch_ms(first_time), epoch_ms(last_time)
+        FROM "{COVERAGE_TABLE}" WHERE ticks_table = ?
+        ORDER BY first_id DESC
+        {limit_sql}
+    ''', [table_name(market, symbol)]).fetchall()
+    return [
+        {"first_id": a, "last_id": b, "first_time": c, "last_time": d, "trades": b - a + 1}
+        for a, b, c, d in rows
+    ]
+
+
+def find_gaps(market: Market, symbol: str, limit: Optional[int] = None) -> list[dict[str, Any]]:
+    """
+    Missing id ranges between stored runs, newest first, with the times of
+    the trades on either side (epoch ms).
+    """
+    if not table_exists(COVERAGE_TABLE):
+        return []
+    limit_sql = f"LIMIT {int(limit)}" if limit is not None else ""
+    rows = get_db().execute(f'''
+        SELECT last_id + 1, next_first - 1, epoch_ms(last_time), epoch_ms(next_time)
+        FROM (
+            SELECT last_id, last_time,
+                   lead(first_id) OVER (ORDER BY first_id) AS next_first,
+                   lead(first_time) OVER (ORDER BY first_id) AS next_time
+            FROM "{COVERAGE_TABLE}" WHERE ticks_table = ?
+        )
+        WHERE next_first IS NOT NULL
+        ORDER BY next_first DESC
+        {limit_sql}
+    ''', [table_name(market, symbol)]).fetchall()
+    return [
+        {"first_id": a, "last_id": b, "after_time": c, "before_time": d, "missing": b - a + 1}
+        for a, b, c, d in rows
+    ]
+
+
+def _utc_day(ms: int) -> date:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).date()
+
+
+def _repair_rest(market: Market, symbol: str, gap: dict[str, Any], session: requests.Session,
+                 urls: Optional[dict[str, str]], budget: Optional[RestBudget]) -> int:
+    rows = 0
+    pages = agg_trades_between(market, symbol, gap["first_id"], gap["last_id"], session, urls,
+                               budget=budget)
+    for page in pages:
+        rows += insert_missing_trades(market, symbol, page)
+    return rows
+
+
+def _repair_archives(market: Market, symbol: str, gap: dict[str, Any],
+                     session: requests.Session) -> int:
+    # Only the gap's ids are loaded from each closed day the gap spans; what
+    # remains of it today is left to REST in a later cycle
+    rows = 0
+    day = _utc_day(gap["after_time"])
+    last_day = min(_utc_day(gap["before_time"]), datetime.now(timezone.utc).date() - timedelta(days=1))
+    with tempfile.TemporaryDirectory(prefix="tickrush-repair-") as tmp:
+        while day <= last_day:
+            csv_path = fetch_archive(day_url(market, symbol, day), Path(tmp), session, DOWNLOAD_TIMEOUT)
+            if csv_path is not None:
+                rows += load_csv(market, symbol, csv_path, "aggTrades", (gap["first_id"], gap["last_id"]))
+                csv_path.unlink()
+            day += timedelta(days=1)
+    return rows
+
+
+def repair_gaps(market: Market, symbol: str, session: Optional[requests.Session] = None,
+                budget: Optional[RestBudget] = None) -> dict[str, Any]:
+    """
+    Fetch the missing ids of a stream's newest gaps: small gaps and gaps
+    within today (no daily archive yet) page through the aggTrades REST
+    endpoint, larger ones load just those ids from the daily aggTrades
+    archives of the days they span. REST requests are charged to `budget`
+    (shared by the streams of a market for one repair cycle); once it runs
+    out, or the exchange rate-limits us, the remaining REST gaps wait for a
+    later cycle without counting an attempt. A partly fetched gap shrinks
+    and resumes from its new first id.
+    """
+    table = table_name(market, symbol)
+    rest_max_ids = current_app.config["REPAIR_REST_MAX_IDS"]
+    rest_urls = current_app.config.get("BINANCE_REST_URLS")
+    session = session or requests.Session()
+    today = datetime.now(timezone.utc).date()
+    started = time.monotonic()
+
+    gaps = find_gaps(market, symbol, REPAIR_BATCH)
+    repaired = skipped = deferred = 0
+    rest_closed = False
+    for gap in gaps:
+        key = (table, gap["first_id"], gap["last_id"])
+        if _attempts.get(key, 0) >= MAX_ATTEMPTS:
+            skipped += 1
+            continue
+        use_rest = gap["missing"] <= rest_max_ids or _utc_day(gap["after_time"]) >= today
+        if use_rest and rest_closed:
+            deferred += 1
+            continue
+        try:
+            if use_rest:
+                rows = _repair_rest(market, symbol, gap, session, rest_urls, budget)
+            else:
+                rows = _repair_archives(market, symbol, gap, session)
+        except (BudgetExhausted, RateLimited) as e:
+            # Not the gap's fault: rows inserted so far stay, no attempt counted
+            current_app.logger.info(f"{table}: REST repair paused until a later cycle: {e}")
+            rest_closed = True
+            deferred += 1
+            continue
+        except Exception:
+            current_app.logger.exception(f"{table}: repairing ids {gap['first_id']}-{gap['last_id']} failed")
+            rows = 0
+        if rows:
+            repaired += rows
+            _attempts.pop(key, None)
+        else:
+            _attempts[key] = _attempts.get(key, 0) + 1
+
+    remaining = find_gaps(market, symbol)
+    result = {
+        "checked_at": time.time(),
+        "seconds": time.monotonic() - started,
+        "gaps": len(remaining),
+        "missing_ids": sum(g["missing"] for g in remaining),
+        "skipped_gaps": skipped,
+        "deferred_gaps": deferred,
+        "repaired_rows": repaired,
+        "repaired_rows_total": repair_status.get(table, {}).get("repaired_rows_total", 0) + repaired,
+    }
+    repair_status[table] = result
+    if repaired:
+        current_app.logger.info(f"{table}: repaired {repaired} trades, {len(remaining)} gaps left")
+    return result
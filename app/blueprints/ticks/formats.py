@@ -0,0 +1,151 @@
+# app/blueprints/ticks/formats.py
+import io
+import json
+from typing import Any, Iterator, Optional
+from flask import Response, request
+from app.extensions import get_db
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+NDJSON = "application/x-ndjson"
+
+# Rows pulled from the DuckDB cursor per streamed chunk
+STREAM_BATCH_ROWS = 10_000
+
+# json     -> {"candles": [{"time": ..., "open": ...}, ...]} (row of dicts)
+# columns  -> {"candles": {"time": [...], "open": [...]}}     (built in DuckDB)
+# arrow    -> Arrow IPC stream straight from the DuckDB result
+# ndjson   -> one JSON object per line, always streamed
+FORMATS = ("json", "columns", "arrow", "ndjson")
+
+
+def negotiate_format() -> str:
+    """
+    Pick the response format from `?format=` or, failing that, the Accept
+    header. Raises ValueError for an unknown `format`.
+    """
+    fmt = request.args.get("format")
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}. Use: {', '.join(FORMATS)}")
+        return fmt
+    best = request.accept_mimetypes.best_match(["application/json", ARROW_STREAM, NDJSON])
+    if best == ARROW_STREAM:
+        return "arrow"
+    if best == NDJSON:
+        return "ndjson"
+    return "json"
+
+
+def wants_stream() -> bool:
+    """`?stream=1` turns an arrow response into chunked record batches."""
+    return request.args.get("stream", "0").lower() in ("1", "true", "yes")
+
+
+def arrow_response(sql: str, params: list, meta: Optional[dict[str, Any]] = None) -> Response:
+    """
+    Run `sql` and serialize the result as an Arrow IPC stream. `meta` is
+    attached as JSON under the schema metadata key "meta".
+    """
+    import pyarrow as pa
+
+    data = get_db().execute(sql, params).arrow()
+    # duckdb < 1.4 returns a Table, newer versions a RecordBatchReader
+    batches = data.to_batches() if isinstance(data, pa.Table) else data
+    schema = data.schema
+    if meta is not None:
+        schema = schema.with_metadata({"meta": json.dumps(meta)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return Response(sink.getvalue().to_pybytes(), mimetype=ARROW_STREAM)
+
+
+def columns_response(sql: str, params: list, columns: dict[str, str], order_by: str,
+                     key: str, meta: dict[str, Any], count_key: Optional[str] = None) -> Response:
+    """
+    Serialize the result of `sql` as one JSON array per column, built entirely
+    inside DuckDB. `columns` maps output names to SQL expressions over the
+    result (e.g. {"time": "epoch_ms(open_time)"}); `order_by` fixes the
+    element order. The arrays go under `key` next to `meta`, and the row count
+    under `count_key` if given.
+    """
+    lists = ", ".join(
+        f"'{name}': COALESCE(LIST({expr} ORDER BY {order_by}), [])"
+        for name, expr in columns.items()
+    )
+    row = get_db().execute(
+        f"SELECT COUNT(*), to_json({{{lists}}}) FROM ({sql})", params
+    ).fetchone()
+    count, payload = (int(row[0]), row[1]) if row else (0, "{}")
+
+    meta = dict(meta)
+    if count_key is not None:
+        meta[count_key] = count
+    # Splice the DuckDB-built JSON into the metadata object without parsing it
+    head = json.dumps(meta)
+    body = f'{head[:-1]}, "{key}": {payload}}}' if meta else f'{{"{key}": {payload}}}'
+    return Response(body, mimetype="application/json")
+
+
+def ndjson_stream_response(sql: str, params: list, columns: dict[str, str],
+                           meta: Optional[dict[str, Any]] = None) -> Response:
+    """
+    Stream the result of `sql` as NDJSON: an optional {"meta": ...} line, then
+    one object per row (built by DuckDB's to_json from `columns`), pulled from
+    a dedicated cursor STREAM_BATCH_ROWS at a time.
+    """
+    fields = ", ".join(f"'{name}': {expr}" for name, expr in columns.items())
+    # A cursor of its own: the generator outlives the request handler and
+    # must not share the connection with other requests.
+    cur = get_db().cursor()
+    cur.execute(f"SELECT to_json({{{fields}}}) FROM ({sql})", params)
+
+    def generate() -> Iterator[str]:
+        try:
+            if meta is not None:
+                yield json.dumps({"meta": meta}) + "\n"
+            while True:
+                rows = cur.fetchmany(STREAM_BATCH_ROWS)
+                if not rows:
+                    break
+                yield "\n".join(row[0] for row in rows) + "\n"
+        finally:
+            cur.close()
+
+    return Response(generate(), mimetype=NDJSON)
+
+
+def arrow_stream_response(sql: str, params: list, meta: Optional[dict[str, Any]] = None) -> Response:
+    """
+    Stream the result of `sql` as an Arrow IPC stream, one record batch of up
+    to STREAM_BATCH_ROWS rows per chunk, as DuckDB produces them.
+    """
+    import pyarrow as pa
+
+    cur = get_db().cursor()
+    reader = cur.execute(sql, params).fetch_record_batch(STREAM_BATCH_ROWS)
+    schema = reader.schema
+    if meta is not None:
+        schema = schema.with_metadata({"meta": json.dumps(meta)})
+
+    def generate() -> Iterator[bytes]:
+        buf = io.BytesIO()
+
+        def drain() -> bytes:
+            data = buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            return data
+
+        try:
+            with pa.ipc.new_stream(buf, schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+                    yield drain()
+            yield drain()  # end-of-stream marker
+        finally:
+            cur.close()
+
+    return Response(generate(), mimetype=ARROW_STREAM)
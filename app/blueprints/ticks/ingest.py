@@ -0,0 +1,186 @@
+# app/blueprints/ticks/ingest.py
+import threading
+import time
+from typing import Any, Optional
+from flask import Flask
+from app.metrics import FLUSH_ROWS
+from .storage import Market, insert_trades
+
+# A stream's buffer is flushed as one bulk insert once it holds FLUSH_ROWS
+# trades or its oldest trade has waited FLUSH_INTERVAL seconds.
+FLUSH_ROWS = 5_000
+FLUSH_INTERVAL = 0.25
+
+# Per-stream bound. A producer that would exceed it blocks for up to
+# PUT_TIMEOUT seconds (or its own timeout; 0 never blocks) and then drops
+# its trades.
+MAX_BUFFERED_ROWS = 200_000
+PUT_TIMEOUT = 1.0
+
+StreamKey = tuple[str, str]
+
+
+class TradeBuffer:
+    """
+    Per-(market, symbol) bounded buffer of aggTrade payloads, drained by a
+    single writer thread in size- or time-triggered batches.
+    """
+
+    def __init__(self, flush_rows: int = FLUSH_ROWS, flush_interval: float = FLUSH_INTERVAL,
+                 max_rows: int = MAX_BUFFERED_ROWS, put_timeout: float = PUT_TIMEOUT):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.put_timeout = put_timeout
+        self._cond = threading.Condition()
+        self._buffers: dict[StreamKey, list[dict]] = {}
+        self._first_at: dict[StreamKey, float] = {}
+        self._stats: dict[StreamKey, dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def put(self, market: Market, symbol: str, trades: list[dict],
+            timeout: Optional[float] = None) -> int:
+        """
+        Buffer trades for one stream, waiting up to `timeout` seconds
+        (default put_timeout) for room. Returns how many were accepted.
+        """
+        if not trades:
+            return 0
+        key = (market, symbol)
+        deadline = time.monotonic() + (self.put_timeout if timeout is None else timeout)
+        with self._cond:
+            stats = self._stats_for(key)
+            while len(self._buffers.get(key, ())) + len(trades) > self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    stats["dropped"] += len(trades)
+                    return 0
+                stats["blocked"] += 1
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+
+            buf = self._buffers.setdefault(key, [])
+            if not buf:
+                self._first_at[key] = time.monotonic()
+            buf.extend(trades)
+            stats["received"] += len(trades)
+            if len(buf) >= self.flush_rows:
+                self._cond.notify_all()
+        return len(trades)
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+
+    def start(self, app: Flask) -> None:
+        """Start the writer thread (once). It runs inside `app`'s context."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), daemon=True)
+        self._thread.start()
+
+    def _due(self, now: float) -> list[StreamKey]:
+        return [
+            key for key, buf in self._buffers.items()
+            if buf and (len(buf) >= self.flush_rows
+                        or now - self._first_at[key] >= self.flush_interval)
+        ]
+
+    def _take(self, wait: bool = True) -> list[tuple[StreamKey, list[dict]]]:
+        with self._cond:
+            now = time.monotonic()
+            due = self._due(now)
+            while wait and not due:
+                pending = [self._first_at[k] + self.flush_interval - now
+                           for k, buf in self._buffers.items() if buf]
+                self._cond.wait(max(min(pending), 0.001) if pending else None)
+                now = time.monotonic()
+                due = self._due(now)
+            if not wait:
+                due = [k for k, buf in self._buffers.items() if buf]
+            batches = [(key, self._buffers.pop(key)) for key in due]
+            for key in due:
+                self._first_at.pop(key, None)
+            # Room was freed: wake producers blocked on a full buffer
+            self._cond.notify_all()
+        return batches
+
+    def _write(self, batches: list[tuple[StreamKey, list[dict]]], app: Flask) -> None:
+        for (market, symbol), batch in batches:
+            started = time.monotonic()
+            try:
+                insert_trades(market, symbol, batch)  # type: ignore
+            except Exception:
+                app.logger.exception(f"Failed to flush {len(batch)} {market} {symbol} trades")
+                with self._cond:
+                    self._stats_for((market, symbol))["failed"] += len(batch)
+                continue
+            elapsed = time.monotonic() - started
+            FLUSH_ROWS.observe(len(batch), market, symbol)
+            with self._cond:
+                stats = self._stats_for((market, symbol))
+                stats["flushed"] += len(batch)
+                stats["flushes"] += 1
+                stats["last_flush_rows"] = len(batch)
+                stats["last_flush_seconds"] = elapsed
+                stats["last_trade_ms"] = max(
+                    stats["last_trade_ms"] or 0, max(int(t["T"]) for t in batch)
+                )
+
+    def flush(self, app: Flask) -> None:
+        """Write everything buffered right now, regardless of size or age."""
+        self._write(self._take(wait=False), app)
+
+    def _run(self, app: Flask) -> None:
+        with app.app_context():
+            while True:
+                self._write(self._take(), app)
+
+    # ------------------------------------------------------------------
+    # Counters
+    # ------------------------------------------------------------------
+
+    def _stats_for(self, key: StreamKey) -> dict[str, Any]:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {
+                "received": 0, "flushed": 0, "dropped": 0, "blocked": 0,
+                "failed": 0, "flushes": 0, "last_flush_rows": 0,
+                "last_flush_seconds": 0.0, "last_trade_ms": None,
+            }
+        return stats
+
+    def written_through(self, market: Market, symbol: str) -> Optional[int]:
+        """Time (epoch ms) of the newest trade of a stream written to its table."""
+        with self._cond:
+            stats = self._stats.get((market, symbol))
+            return stats["last_trade_ms"] if stats else None
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Per-stream counters plus current buffer depth, age of the oldest
+        buffered trade and lag of the newest written trade behind wall clock.
+        """
+        now = time.monotonic()
+        now_ms = int(time.time() * 1000)
+        with self._cond:
+            out = {}
+            for (market, symbol), stats in self._stats.items():
+                key = (market, symbol)
+                buffered = len(self._buffers.get(key, ()))
+                out[f"{market}:{symbol}"] = {
+                    **stats,
+                    "buffered": buffered,
+                    "oldest_buffered_seconds": now - self._first_at[key] if buffered else 0.0,
+                    "ingest_lag_ms": (now_ms - stats["last_trade_ms"])
+                                     if stats["last_trade_ms"] is not None else None,
+                }
+            return out
+
+
+trade_buffer = TradeBuffer()
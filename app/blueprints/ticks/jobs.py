@@ -0,0 +1,274 @@
+# app/blueprints/ticks/jobs.py
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional
+from flask import Flask
+from .storage import Market
+from .binance.downloader import Period
+from .backfill import (
+    job_counts, plan_downloads, plan_jobs, recover_interrupted, run_downloads, runnable_jobs,
+)
+
+# Ingestion requested over the API (/api/update-ticks-data) runs as jobs on a
+# small pool of background threads: the request returns the job at once and
+# /api/jobs/<id> reports its progress. A job loads one period of one stream,
+# a month ("2025-10") or a day ("2025-10-14"), through the backfill job
+# table and planner (backfill.py): days loaded already are skipped, a month
+# comes from its monthly archive (the daily archives of its closed days if
+# there is none), and the historical backfill won't fetch them again.
+#   queued -> running -> done
+#                     -> failed
+# Jobs themselves are kept in memory only.
+
+# Finished jobs kept for status requests
+KEEP_FINISHED = 100
+# Download threads per job
+DOWNLOAD_WORKERS = 4
+# How long a job waits for days of its period that another run (the
+# historical backfill) is downloading, polling every WAIT_POLL_SECONDS
+WAIT_FOR_OTHERS_SECONDS = 600
+WAIT_POLL_SECONDS = 1.0
+# Share of a file's work counted as download in the ETA (the rest is the load)
+DOWNLOAD_SHARE = 0.5
+
+SYMBOL_RE = re.compile(r"^[A-Z0-9]{2,30}$")
+PERIOD_RE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+
+JobKey = tuple[str, str, str]
+
+
+class QueueFull(Exception):
+    """Too many ingest jobs are waiting already."""
+
+
+def parse_period(period: str) -> tuple[Period, date]:
+    """"YYYY-MM" or "YYYY-MM-DD" -> ("monthly" | "daily", first day). Must have started before today."""
+    if not PERIOD_RE.match(period):
+        raise ValueError("period must be YYYY-MM or YYYY-MM-DD")
+    kind: Period = "daily" if len(period) == 10 else "monthly"
+    first = date.fromisoformat(period if kind == "daily" else f"{period}-01")
+    if first >= datetime.now(timezone.utc).date():
+        raise ValueError("period has no published archive yet")
+    return kind, first
+
+
+class IngestJob:
+    def __init__(self, market: Market, symbol: str, period: str):
+        self.id = uuid.uuid4().hex
+        self.market = market
+        self.symbol = symbol
+        self.period = period
+        self.state = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files_total = 0
+        self.files_done = 0
+        self.files_missing = 0
+        self.files_failed = 0
+        self.errors: list[str] = []
+        self.bytes_downloaded = 0
+        self.rows_loaded = 0
+        # Files downloading: url -> (bytes so far, Content-Length)
+        self._in_flight: dict[str, tuple[int, Optional[int]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def key(self) -> JobKey:
+        return (self.market, self.symbol, self.period)
+
+    def begin_files(self, count: int) -> None:
+        with self._lock:
+            self.files_total, self.files_done, self.files_missing, self.files_failed = count, 0, 0, 0
+            self.errors = []
+
+    def on_bytes(self, url: str, n: int, total: Optional[int]) -> None:
+        # Called from the download threads, several files at a time
+        with self._lock:
+            self.bytes_downloaded += n
+            done, _ = self._in_flight.get(url, (0, None))
+            self._in_flight[url] = (done + n, total)
+
+    def file_done(self, url: str, rows: Optional[int], error: Optional[str] = None) -> None:
+        """Count a finished file: `rows` loaded, None if unavailable, or an error."""
+        with self._lock:
+            self.files_done += 1
+            if error is not None:
+                self.files_failed += 1
+                self.errors.append(f"{os.path.basename(url)}: {error}")
+            elif rows is None:
+                self.files_missing += 1
+            else:
+                self.rows_loaded += rows
+            self._in_flight.pop(url, None)
+
+    def _fraction(self) -> Optional[float]:
+        if not self.files_total:
+            return None
+        current = sum(
+            min(1.0, done / total) * DOWNLOAD_SHARE
+            for done, total in self._in_flight.values() if total
+        )
+        return (self.files_done + current) / self.files_total
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            fraction = self._fraction()
+            eta = None
+            if self.state == "running" and fraction:
+                eta = elapsed * (1 - fraction) / fraction
+            elif self.state in ("done", "failed"):
+                eta = 0.0
+            return {
+                "id": self.id,
+                "market": self.market,
+                "symbol": self.symbol,
+                "period": self.period,
+                "state": self.state,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": elapsed,
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "files_missing": self.files_missing,
+                "files_failed": self.files_failed,
+                "bytes_downloaded": self.bytes_downloaded,
+                "files_downloading": len(self._in_flight),
+                "rows_loaded": self.rows_loaded,
+                "rows_per_s": self.rows_loaded / elapsed if elapsed > 0 else None,
+                "progress": fraction,
+                "eta_seconds": eta,
+            }
+
+
+class IngestJobs:
+    """
+    Bounded pool of ingest job threads. Submitting a (market, symbol, period)
+    that is queued or running already returns that job instead of a new one.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 16):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, IngestJob] = OrderedDict()
+        self._active: dict[JobKey, IngestJob] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._app: Optional[Flask] = None
+
+    def start(self, app: Flask) -> None:
+        """Create the worker pool (once). Jobs run inside `app`'s context."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._app = app
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest-job")
+
+    def submit(self, market: Market, symbol: str, period: str) -> tuple[IngestJob, bool]:
+        """Enqueue a job. Returns it and whether it is new; raises QueueFull."""
+        with self._lock:
+            if self._pool is None:
+                raise RuntimeError("IngestJobs.start() was not called")
+            existing = self._active.get((market, symbol, period))
+            if existing is not None:
+                return existing, False
+            if sum(job.state == "queued" for job in self._active.values()) >= self.max_queued:
+                raise QueueFull()
+            job = IngestJob(market, symbol, period)
+            self._jobs[job.id] = job
+            self._active[job.key] = job
+            self._prune()
+            self._pool.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[IngestJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def stats(self) -> dict[str, int]:
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.state] += 1
+        return counts
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._jobs[job_id]
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def _days(self, job: IngestJob) -> tuple[date, date]:
+        """First and last day of the job's period, the last closed day at most."""
+        kind, first = parse_period(job.period)
+        if kind == "daily":
+            return first, first
+        month_end = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+        return first, min(month_end, yesterday)
+
+    def _run(self, job: IngestJob) -> None:
+        assert self._app is not None
+        with self._app.app_context():
+            job.started_at = time.time()
+            job.state = "running"
+            try:
+                first, last = self._days(job)
+                recover_interrupted()
+                plan_jobs(job.market, job.symbol, first, last)
+                # A failed monthly archive leaves its days to daily archives,
+                # planned in a second round (a month still open has none)
+                for n in range(2):
+                    downloads = plan_downloads(runnable_jobs(job.market, job.symbol, first, last))
+                    if n and not downloads:
+                        break
+                    job.begin_files(len(downloads))
+                    run_downloads(downloads, DOWNLOAD_WORKERS, job.on_bytes, job.file_done)
+                    if not any(period == "monthly" for _, _, period, _, _ in downloads):
+                        break
+                # Days another run is loading right now are not failures:
+                # wait for them, then count only what is failed or missing
+                counts = job_counts(job.market, job.symbol, first, last)
+                deadline = time.monotonic() + WAIT_FOR_OTHERS_SECONDS
+                while counts.get("downloading") and time.monotonic() < deadline:
+                    time.sleep(WAIT_POLL_SECONDS)
+                    counts = job_counts(job.market, job.symbol, first, last)
+                missing = counts.get("failed", 0) + counts.get("pending", 0)
+                if missing:
+                    detail = "; ".join(job.errors) or "archive not available"
+                    job.error = f"{missing} of {(last - first).days + 1} days not loaded: {detail}"[:500]
+                    job.state = "failed"
+                else:
+                    job.state = "done"
+            except Exception as e:
+                job.error = repr(e)[:500]
+                job.state = "failed"
+                self._app.logger.warning(f"Ingest job {job.id} {job.key} failed: {e!r}")
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._active.pop(job.key, None)
+            self._app.logger.info(
+                f"Ingest job {job.id} {job.key} {job.state}: {job.rows_loaded} trades"
+            )
+
+
+ingest_jobs = IngestJobs()
@@ -0,0 +1,193 @@
+# app/blueprints/ticks/layout.py
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+from app.extensions import get_db, table_exists, writer
+from .storage import (
+    Market, compact_types, create_ticks_table, is_append_only, read_layout, table_name,
+)
+
+# Physical layout of the hot ticks tables. Live and backfill rows arrive
+# interleaved, so a row group can span days and zone maps on `time` prune
+# little. Closed days are rewritten in (time, id) order once their row count
+# stops changing; SORTED_DAYS_TABLE remembers which days were and at what
+# row count, so a day is sorted again only after late rows landed in it.
+SORTED_DAYS_TABLE = "sorted_tick_days"
+
+# DuckDB's default block size; storage_info lists the blocks a table uses
+BLOCK_BYTES = 256 * 1024
+
+
+def ensure_sorted_days_table() -> None:
+    with writer() as db:
+        db.execute(f'''
+            CREATE TABLE IF NOT EXISTS "{SORTED_DAYS_TABLE}" (
+                ticks_table VARCHAR,
+                day         DATE,
+                rows        BIGINT,
+                PRIMARY KEY (ticks_table, day)
+            )
+        ''')
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def sort_day(market: Market, symbol: str, day: date) -> int:
+    """Rewrite one day of the hot table in (time, id) order. Returns its row count."""
+    table = table_name(market, symbol)
+    start, end = _day_bounds(day)
+    with writer() as db:
+        db.execute("BEGIN TRANSACTION")
+        try:
+            db.execute(f'''
+                CREATE OR REPLACE TEMP TABLE "_sorting_ticks" AS
+                SELECT * FROM "{table}" WHERE time >= ? AND time < ? ORDER BY time, id
+            ''', [start, end])
+            db.execute(f'DELETE FROM "{table}" WHERE time >= ? AND time < ?', [start, end])
+            row = db.execute(f'INSERT INTO "{table}" SELECT * FROM "_sorting_ticks" ORDER BY time, id').fetchone()
+            rows = int(row[0]) if row else 0
+            db.execute('DROP TABLE "_sorting_ticks"')
+            db.execute(f'''
+                INSERT OR REPLACE INTO "{SORTED_DAYS_TABLE}" (ticks_table, day, rows) VALUES (?, ?, ?)
+            ''', [table, day, rows])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+    return rows
+
+
+def sort_closed_days(market: Market, symbol: str) -> int:
+    """Sort every closed day of the hot table whose row count changed since it was last sorted."""
+    ensure_sorted_days_table()
+    table = table_name(market, symbol)
+    today = datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time())
+    db = get_db()
+    counts = db.execute(f'''
+        SELECT CAST(time AS DATE) AS day, COUNT(*) FROM "{table}"
+        WHERE time < ?
+        GROUP BY day
+        ORDER BY day
+    ''', [today]).fetchall()
+    done = dict(db.execute(
+        f'SELECT day, rows FROM "{SORTED_DAYS_TABLE}" WHERE ticks_table = ?', [table]
+    ).fetchall())
+    sorted_days = 0
+    for day, rows in counts:
+        if done.get(day) != rows:
+            sort_day(market, symbol, day)
+            sorted_days += 1
+    if sorted_days:
+        with writer() as w:
+            # Compression is chosen per column segment at checkpoint
+            w.execute("CHECKPOINT")
+    return sorted_days
+
+
+# ----------------------------------------------------------------------
+# Migration and comparison
+# ----------------------------------------------------------------------
+
+def table_bytes(table: str) -> int:
+    """On-disk size of a table: distinct blocks of its persisted segments."""
+    row = get_db().execute(
+        "SELECT COUNT(DISTINCT block_id) FROM pragma_storage_info(?) WHERE persistent", [table]
+    ).fetchone()
+    return int(row[0]) * BLOCK_BYTES if row else 0
+
+
+def scan_timings(table: str, repeat: int = 3) -> dict[str, float]:
+    """
+    Best-of-`repeat` seconds for the scans queries run most: a one-hour
+    and a one-day time range aggregated like a candle, and every row.
+    """
+    db = get_db()
+    newest = db.execute(f'SELECT MAX(time) FROM "{table}"').fetchone()[0]
+    if newest is None:
+        return {}
+    scans = {
+        "last_hour": newest - timedelta(hours=1),
+        "last_day": newest - timedelta(days=1),
+        "all": datetime.min,
+    }
+    out = {}
+    for name, since in scans.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            db.execute(f'''
+                SELECT COUNT(*), MIN(price), MAX(price), SUM(qty),
+                       SUM(CASE WHEN is_buyer_maker THEN 0 ELSE qty END)
+                FROM "{table}" WHERE time >= ?
+            ''', [since]).fetchall()
+            best = min(best, time.perf_counter() - started)
+        out[f"{name}_seconds"] = best
+    return out
+
+
+def lossy_rows(table: str, types: tuple[str, str]) -> int:
+    """Rows whose price or qty would change when cast to `types`."""
+    row = get_db().execute(f'''
+        SELECT COUNT(*) FROM "{table}"
+        WHERE CAST(CAST(price AS {types[0]}) AS DOUBLE) <> CAST(price AS DOUBLE)
+           OR CAST(CAST(qty AS {types[1]}) AS DOUBLE) <> CAST(qty AS DOUBLE)
+    ''').fetchone()
+    return int(row[0]) if row else 0
+
+
+def migrate_table(market: Market, symbol: str, force: bool = False) -> dict[str, Any]:
+    """
+    Rewrite a ticks table in the compact layout: DECIMAL price / qty and
+    rows in (time, id) order. Keeps the table's key (PRIMARY KEY or
+    append-only). Refuses if the symbol's scales would round stored values,
+    unless `force`. Returns sizes and scan timings before and after.
+    """
+    table = table_name(market, symbol)
+    if not table_exists(table):
+        return {"table": table, "status": "missing"}
+    append_only = is_append_only(market, symbol)
+    types = compact_types(symbol)
+    result: dict[str, Any] = {"table": table, "types": list(types)}
+
+    lossy = lossy_rows(table, types)
+    if lossy and not force:
+        return {**result, "status": "skipped", "lossy_rows": lossy}
+
+    with writer() as db:
+        db.execute("CHECKPOINT")
+    result["before"] = {"bytes": table_bytes(table), **scan_timings(table)}
+
+    staging = f"{table}__compact"
+    started = time.perf_counter()
+    with writer() as db:
+        db.execute("BEGIN TRANSACTION")
+        try:
+            db.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            create_ticks_table(db, staging, append_only, types)
+            db.execute(f'INSERT INTO "{staging}" SELECT * FROM "{table}" ORDER BY time, id')
+            db.execute(f'DROP TABLE "{table}"')
+            db.execute(f'ALTER TABLE "{staging}" RENAME TO "{table}"')
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        read_layout(db, table)
+        db.execute("CHECKPOINT")
+    result["migrate_seconds"] = time.perf_counter() - started
+
+    # Everything is in order now: record the closed days as sorted
+    ensure_sorted_days_table()
+    today = datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time())
+    with writer() as db:
+        db.execute(f'DELETE FROM "{SORTED_DAYS_TABLE}" WHERE ticks_table = ?', [table])
+        db.execute(f'''
+            INSERT INTO "{SORTED_DAYS_TABLE}"
+            SELECT ?, CAST(time AS DATE) AS day, COUNT(*) FROM "{table}"
+            WHERE time < ? GROUP BY day
+        ''', [table, today])
+
+    result["after"] = {"bytes": table_bytes(table), **scan_timings(table)}
+    return {**result, "status": "migrated", "lossy_rows": lossy}
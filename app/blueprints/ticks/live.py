@@ -0,0 +1,237 @@
+# app/blueprints/ticks/live.py
+import json
+import math
+import queue
+import threading
+import time
+from array import array
+from typing import Any, Optional
+from flask import Flask
+from app.extensions import get_db, table_exists
+from .candles import (
+    CLUSTER_MAP, TICK_SIZE, candles_table_name, materialize_candles,
+)
+from .ingest import trade_buffer
+from .storage import Market, table_name
+
+# Interval lengths in ms. Buckets are aligned like DuckDB's time_bucket,
+# whose default origin is Monday 2000-01-03 00:00 UTC.
+INTERVAL_MS = {
+    '1m': 60_000,      '3m': 180_000,     '5m': 300_000,
+    '15m': 900_000,    '30m': 1_800_000,  '1h': 3_600_000,
+    '4h': 14_400_000,  '1d': 86_400_000,  '1w': 604_800_000,
+}
+BUCKET_ORIGIN_MS = 946_857_600_000
+
+# How long a closed candle waits for its trades to reach the ticks table
+# before it is materialized anyway
+FLUSH_WAIT_SECONDS = 5.0
+
+StreamKey = tuple[str, str, str]
+
+
+class LiveCandle:
+    """
+    The forming candle of one (market, symbol, interval). Cluster volumes
+    live in flat arrays indexed by price level (price / TICK_SIZE) minus
+    `lo`, grown at either end as new levels trade.
+    """
+
+    __slots__ = ("open_time", "open", "high", "low", "close", "volume", "delta",
+                 "base_cvd", "last_trade", "partial", "lo", "ask_at", "bid_at")
+
+    def __init__(self, open_time: int, base_cvd: float, partial: bool):
+        self.open_time = open_time
+        self.open = self.high = self.low = self.close = math.nan
+        self.volume = 0.0
+        self.delta = 0.0
+        self.base_cvd = base_cvd
+        self.last_trade = 0
+        # Started mid-candle (process start): trades before it are missing
+        self.partial = partial
+        self.lo = 0
+        self.ask_at = array('d')
+        self.bid_at = array('d')
+
+    def add(self, price: float, qty: float, is_buyer_maker: bool, t: int) -> None:
+        if not self.ask_at:
+            self.open = self.high = self.low = price
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.close = price
+        self.volume += qty
+        self.delta += -qty if is_buyer_maker else qty
+        self.last_trade = max(self.last_trade, t)
+
+        # Binned like the stored clusters (the footprint tick is no coarser
+        # than the price step, so they come out as binning raw prices).
+        # ROUND() in DuckDB rounds half away from zero; prices are positive.
+        level = math.floor(price / TICK_SIZE + 0.5)
+        if not self.ask_at:
+            self.lo = level
+            self.ask_at.append(0.0)
+            self.bid_at.append(0.0)
+        elif level < self.lo:
+            pad = array('d', bytes(8 * (self.lo - level)))
+            self.ask_at[0:0] = pad
+            self.bid_at[0:0] = pad
+            self.lo = level
+        elif level - self.lo >= len(self.ask_at):
+            pad = array('d', bytes(8 * (level - self.lo - len(self.ask_at) + 1)))
+            self.ask_at.extend(pad)
+            self.bid_at.extend(pad)
+        if is_buyer_maker:
+            self.bid_at[level - self.lo] += qty
+        else:
+            self.ask_at[level - self.lo] += qty
+
+    def to_dict(self) -> dict[str, Any]:
+        # Same shape as a materialized candle: clusters ordered by price desc,
+        # each [price, volume, ask, bid, delta] (see CLUSTER_MAP)
+        clusters = []
+        for i in range(len(self.ask_at) - 1, -1, -1):
+            ask, bid = self.ask_at[i], self.bid_at[i]
+            if ask or bid:
+                clusters.append([(self.lo + i) * TICK_SIZE, ask + bid, ask, bid, ask - bid])
+        return {
+            'time': self.open_time,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'delta': self.delta,
+            'cvd': self.base_cvd + self.delta,
+            'clusters': clusters,
+            'partial': self.partial,
+        }
+
+
+class LiveCandles:
+    """
+    Forming candles for every streamed symbol and each of `intervals`, fed
+    straight from the websocket thread. When a trade opens a new bucket the
+    flusher thread materializes the closed candle from the ticks table once
+    its trades are written, and re-bases the new candle's CVD on the stored
+    value.
+    """
+
+    def __init__(self, intervals: tuple[str, ...] = ('1m',)):
+        self.intervals = intervals
+        self._lock = threading.Lock()
+        self._candles: dict[StreamKey, LiveCandle] = {}
+        self._versions: dict[StreamKey, int] = {}
+        self._encoded: dict[StreamKey, tuple[int, str]] = {}
+        self._closed: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Producer side (websocket thread)
+    # ------------------------------------------------------------------
+
+    def add(self, market: Market, symbol: str, trades: list[dict]) -> None:
+        with self._lock:
+            for t in trades:
+                ts = int(t["T"])
+                price, qty, maker = float(t["p"]), float(t["q"]), bool(t["m"])
+                for interval in self.intervals:
+                    width = INTERVAL_MS[interval]
+                    open_time = ts - (ts - BUCKET_ORIGIN_MS) % width
+                    key = (market, symbol, interval)
+                    candle = self._candles.get(key)
+                    if candle is None:
+                        candle = self._candles[key] = LiveCandle(open_time, 0.0, partial=True)
+                        # CVD carried in from the stored candles
+                        self._closed.put((key, open_time, 0))
+                    elif open_time > candle.open_time:
+                        self._closed.put((key, open_time, candle.last_trade))
+                        candle = self._candles[key] = LiveCandle(
+                            open_time, candle.base_cvd + candle.delta, partial=False)
+                    elif open_time < candle.open_time:
+                        # Late trade for a closed candle: the materializer has it
+                        continue
+                    candle.add(price, qty, maker, ts)
+                    self._versions[key] = self._versions.get(key, 0) + 1
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+
+    def version(self, market: str, symbol: str, interval: str) -> int:
+        return self._versions.get((market, symbol, interval), 0)
+
+    def encoded(self, market: str, symbol: str, interval: str) -> tuple[int, Optional[str]]:
+        """(version, JSON) of the forming candle; serialized once per version."""
+        key = (market, symbol, interval)
+        with self._lock:
+            version = self._versions.get(key, 0)
+            cached = self._encoded.get(key)
+            if cached is not None and cached[0] == version:
+                return cached
+            candle = self._candles.get(key)
+            if candle is None:
+                return version, None
+            payload = json.dumps({
+                'market': market, 'symbol': symbol, 'interval': interval,
+                'cluster_map': CLUSTER_MAP, 'candle': candle.to_dict(),
+            })
+            self._encoded[key] = (version, payload)
+            return version, payload
+
+    # ------------------------------------------------------------------
+    # Flusher
+    # ------------------------------------------------------------------
+
+    def start(self, app: Flask) -> None:
+        """Start the flusher thread (once). It runs inside `app`'s context."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), daemon=True)
+        self._thread.start()
+
+    def _flush(self, key: StreamKey, open_time: int, last_trade: int) -> None:
+        """
+        Materialize everything before the live candle opening at `open_time`
+        (epoch ms), whose predecessor's last trade was at `last_trade`, and
+        take that candle's base CVD from the stored candles.
+        """
+        market, symbol, interval = key
+        # Trades reach the ticks table through the ingest buffer a moment later
+        deadline = time.monotonic() + FLUSH_WAIT_SECONDS
+        while ((trade_buffer.written_through(market, symbol) or 0) < last_trade
+               and time.monotonic() < deadline):
+            time.sleep(0.05)
+        if not table_exists(table_name(market, symbol)):  # type: ignore
+            return
+        materialize_candles(market, symbol, interval)  # type: ignore
+
+        candles_table = candles_table_name(market, symbol, interval)  # type: ignore
+        if not table_exists(candles_table):
+            return
+        row = get_db().execute(f'''
+            SELECT cvd FROM "{candles_table}"
+            WHERE open_time < epoch_ms(?)
+            ORDER BY open_time DESC
+            LIMIT 1
+        ''', [open_time]).fetchone()
+        if row is None or row[0] is None:
+            return
+        with self._lock:
+            candle = self._candles.get(key)
+            # Meanwhile another candle may have opened; it gets its own flush
+            if candle is not None and candle.open_time == open_time:
+                candle.base_cvd = float(row[0])
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _run(self, app: Flask) -> None:
+        with app.app_context():
+            while True:
+                key, open_time, last_trade = self._closed.get()
+                try:
+                    self._flush(key, open_time, last_trade)
+                except Exception:
+                    app.logger.exception(f"Flushing live candle {key} {open_time} failed")
+
+
+live_candles = LiveCandles()
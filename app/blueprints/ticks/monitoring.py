@@ -0,0 +1,93 @@
+# app/blueprints/ticks/monitoring.py
+from typing import Any, Iterator
+from .backfill import backfill_status
+from .cache import candle_cache
+from .coverage import repair_status
+from .ingest import trade_buffer
+from .jobs import ingest_jobs
+from .storage import duplicate_checks
+
+Family = tuple[str, str, str, list[tuple[dict[str, Any], Any]]]
+
+
+def collect_ticks_metrics() -> Iterator[Family]:
+    """
+    /metrics collector over the ingest buffer, websocket connection,
+    backfill and candle cache counters (the same numbers as /ingest-stats).
+    Rates such as rows/sec are left to PromQL: rate(tickrush_ingest_rows_total[1m]).
+    """
+    from .tasks import stream_manager
+
+    streams = [
+        ({"market": key.split(":")[0], "symbol": key.split(":")[1]}, stats)
+        for key, stats in trade_buffer.stats().items()
+    ]
+
+    def per_stream(field: str, scale: float = 1.0) -> list[tuple[dict[str, Any], Any]]:
+        return [(labels, None if s[field] is None else s[field] * scale) for labels, s in streams]
+
+    yield ("tickrush_ingest_received_total", "counter",
+           "Trades accepted into the ingest buffer", per_stream("received"))
+    yield ("tickrush_ingest_rows_total", "counter",
+           "Trades written to DuckDB by the ingest buffer", per_stream("flushed"))
+    yield ("tickrush_ingest_dropped_total", "counter",
+           "Trades dropped because the stream's buffer stayed full", per_stream("dropped"))
+    yield ("tickrush_ingest_failed_total", "counter",
+           "Trades lost to failed inserts", per_stream("failed"))
+    yield ("tickrush_ingest_flushes_total", "counter",
+           "Bulk inserts by the ingest buffer", per_stream("flushes"))
+    yield ("tickrush_ingest_buffered_rows", "gauge",
+           "Trades waiting in the ingest buffer", per_stream("buffered"))
+    yield ("tickrush_ingest_lag_seconds", "gauge",
+           "Wall clock minus exchange time of the newest written trade",
+           per_stream("ingest_lag_ms", 0.001))
+
+    connections = stream_manager.stats() if stream_manager is not None else {}
+    conn_labels = [({"connection": name, "market": s["market"]}, s) for name, s in connections.items()]
+    yield ("tickrush_ws_connected", "gauge", "1 while the websocket connection is open",
+           [(labels, int(s["connected"])) for labels, s in conn_labels])
+    yield ("tickrush_ws_messages_total", "counter", "aggTrade messages received",
+           [(labels, s["messages"]) for labels, s in conn_labels])
+    yield ("tickrush_ws_reconnects_total", "counter", "Websocket reconnects",
+           [(labels, s["reconnects"]) for labels, s in conn_labels])
+
+    yield ("tickrush_backfill_queued_days", "gauge",
+           "Archive days of the current backfill run not started yet",
+           [({}, backfill_status["queued"])])
+    yield ("tickrush_backfill_in_flight_days", "gauge",
+           "Archive days downloading or waiting to be loaded", [({}, backfill_status["in_flight"])])
+    yield ("tickrush_backfill_failed_days", "gauge",
+           "Archive days that failed in the current backfill run", [({}, backfill_status["failed_days"])])
+
+    yield ("tickrush_ingest_jobs", "gauge", "API-triggered ingest jobs kept in memory, by state",
+           [({"state": state}, n) for state, n in ingest_jobs.stats().items()])
+
+    checks = [({"table": table}, c) for table, c in duplicate_checks.items()]
+    yield ("tickrush_ticks_duplicate_ids", "gauge",
+           "Ids stored more than once at the last check of an append-only table",
+           [(labels, c["duplicate_ids"]) for labels, c in checks])
+    yield ("tickrush_ticks_duplicate_rows_removed_total", "counter",
+           "Extra copies of ids deleted by the duplicate check",
+           [(labels, c["removed_rows_total"]) for labels, c in checks])
+
+    repairs = [({"table": table}, r) for table, r in repair_status.items()]
+    yield ("tickrush_ticks_gaps", "gauge",
+           "Holes in the aggTrade id coverage after the last repair cycle",
+           [(labels, r["gaps"]) for labels, r in repairs])
+    yield ("tickrush_ticks_missing_ids", "gauge",
+           "aggTrade ids missing between stored runs after the last repair cycle",
+           [(labels, r["missing_ids"]) for labels, r in repairs])
+    yield ("tickrush_ticks_repaired_rows_total", "counter",
+           "Trades inserted by the gap repair",
+           [(labels, r["repaired_rows_total"]) for labels, r in repairs])
+
+    cache = candle_cache.stats()
+    yield ("tickrush_candle_cache_requests_total", "counter", "Candle cache lookups by result", [
+        ({"result": "hit"}, cache["hits"]),
+        ({"result": "miss"}, cache["misses"]),
+        ({"result": "not_modified"}, cache["not_modified"]),
+    ])
+    yield ("tickrush_candle_cache_evictions_total", "counter",
+           "Candle responses evicted from the cache", [({}, cache["evictions"])])
+    yield ("tickrush_candle_cache_bytes", "gauge", "Bytes of cached candle responses", [({}, cache["bytes"])])
+    yield ("tickrush_candle_cache_entries", "gauge", "Cached candle responses", [({}, cache["entries"])])
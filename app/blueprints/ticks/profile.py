@@ -0,0 +1,89 @@
+# app/blueprints/ticks/profile.py
+from typing import Any, Optional
+from app.extensions import get_db
+from .candles import CLUSTER_MAP, footprint_table_name
+from .storage import Market
+
+# Share of the range's volume inside the value area
+VALUE_AREA_SHARE = 0.70
+
+
+def value_area(volumes: list[float], poc: int, share: float = VALUE_AREA_SHARE) -> tuple[int, int]:
+    """
+    Indices (low, high) of the value area around `poc` in price-ascending
+    `volumes`: grow one level at a time towards the busier neighbour until
+    `share` of the total volume is covered.
+    """
+    target = sum(volumes) * share
+    low = high = poc
+    covered = volumes[poc]
+    while covered < target and (low > 0 or high < len(volumes) - 1):
+        below = volumes[low - 1] if low > 0 else -1.0
+        above = volumes[high + 1] if high < len(volumes) - 1 else -1.0
+        if above >= below:
+            high += 1
+            covered += above
+        else:
+            low -= 1
+            covered += below
+    return low, high
+
+
+def volume_profile(market: Market, symbol: str, start: Optional[int], end: Optional[int],
+                   bin_size: float) -> dict[str, Any]:
+    """
+    Volume profile of [start, end) (epoch ms, minute resolution) re-binned
+    from the footprint table to `bin_size`: every level as
+    [price, volume, ask, bid, delta] by descending price (like candle
+    clusters), plus the point of control and the 70% value area.
+    """
+    where_clauses: list[str] = []
+    params: list[Any] = [bin_size, bin_size]
+    if start is not None:
+        where_clauses.append("minute >= epoch_ms(?)")
+        params.append(start)
+    if end is not None:
+        where_clauses.append("minute < epoch_ms(?)")
+        params.append(end)
+    where_sql = ("WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
+
+    rows = get_db().execute(f'''
+        SELECT
+            ROUND(price / CAST(? AS DOUBLE)) * CAST(? AS DOUBLE) AS level,
+            SUM(volume),
+            SUM(ask),
+            SUM(bid)
+        FROM "{footprint_table_name(market, symbol)}"
+        {where_sql}
+        GROUP BY level
+        ORDER BY level
+    ''', params).fetchall()
+
+    profile: dict[str, Any] = {
+        'cluster_map': CLUSTER_MAP,
+        'total_volume': 0.0,
+        'poc': None,
+        'value_area': None,
+        'levels': [],
+    }
+    if not rows:
+        return profile
+
+    volumes = [float(r[1]) for r in rows]
+    poc = max(range(len(volumes)), key=volumes.__getitem__)
+    low, high = value_area(volumes, poc)
+    profile.update({
+        'total_volume': sum(volumes),
+        'poc': float(rows[poc][0]),
+        'value_area': {
+            'low': float(rows[low][0]),
+            'high': float(rows[high][0]),
+            'volume': sum(volumes[low:high + 1]),
+            'share': VALUE_AREA_SHARE,
+        },
+        'levels': [
+            [float(price), float(volume), float(ask), float(bid), float(ask - bid)]
+            for price, volume, ask, bid in reversed(rows)
+        ],
+    })
+    return profile
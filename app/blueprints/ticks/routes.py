@@ -1,8 +1,17 @@
+import base64
+import json
+from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify, url_for
-from flask_paginate import Pagination
-from app.extensions import get_db
+from app.extensions import get_db, table_exists, uses_reader
 from .storage import table_name
-from typing import Any, Literal, cast, Union, Tuple
+from .archive import archived_row_count, ticks_source
+from .ingest import trade_buffer
+from .coverage import coverage_ranges, find_gaps, is_built, repair_status
+from .formats import (
+    negotiate_format, wants_stream, arrow_response, arrow_stream_response,
+    columns_response, ndjson_stream_response,
+)
+from typing import Any, Literal, Optional, cast, Union, Tuple
 from flask import Response
 
 # Blueprint
@@ -11,6 +20,15 @@ ticks_bp = Blueprint("ticks_data", __name__)
 
 PER_PAGE = 100
 
+# Column expressions for the column-oriented JSON format
+TICK_COLUMNS = {
+    "id": "id",
+    "price": "price",
+    "qty": "qty",
+    "time": "epoch_ms(time)",
+    "is_buyer_maker": "is_buyer_maker",
+}
+
 # --------------------------------------------------------------
 # Validate market type
 # --------------------------------------------------------------
@@ -25,41 +43,76 @@ def validate_market(market: str) -> Literal["binance_spot", "binance_futures"]:
     return cast(Literal["binance_spot", "binance_futures"], market)
 
 
+# --------------------------------------------------------------
+# Keyset cursors
+# --------------------------------------------------------------
+# A cursor is the (time, id) key of the row a page starts after, plus the
+# direction to walk: "next" goes to older trades, "prev" to newer ones.
+# Encoded as urlsafe base64 JSON so clients treat it as opaque.
+
+Cursor = Tuple[Literal["next", "prev"], int, int]
+
+def encode_cursor(direction: Literal["next", "prev"], time_us: int, trade_id: int) -> str:
+    raw = json.dumps([direction, time_us, trade_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(value: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        direction, time_us, trade_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if direction not in ("next", "prev") or not isinstance(time_us, int) or not isinstance(trade_id, int):
+        raise ValueError("Invalid cursor")
+    return cast(Cursor, (direction, time_us, trade_id))
+
+
+def approximate_count(table: str) -> int:
+    """Row count estimate from the catalog — O(1), no table scan."""
+    row = get_db().execute(
+        "SELECT estimated_size FROM duckdb_tables() WHERE table_name = ?", [table]
+    ).fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
 # --------------------------------------------------------------
 # Route
 # --------------------------------------------------------------
 
 @ticks_bp.route("/<market>/<symbol>")
-def get_ticks(market: str, symbol: str) -> Union[dict[str, Any], Tuple[Response, int]]:
+@uses_reader
+def get_ticks(market: str, symbol: str) -> Union[dict[str, Any], Response, Tuple[Response, int]]:
     try:
         market_valid = validate_market(market)
     except ValueError:
         return jsonify(error="Invalid market. Use 'binance_spot' or 'binance_futures'"), 400
 
+    try:
+        fmt = negotiate_format()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    cursor: Optional[Cursor] = None
+    if request.args.get("cursor"):
+        try:
+            cursor = decode_cursor(request.args["cursor"])
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
     symbol_upper = symbol.upper()
     table = table_name(market_valid, symbol_upper)
 
-    # Check if table exists
-    exists = (
-        get_db()
-        .execute("SELECT 1 FROM duckdb_tables() WHERE name = ?", [table])
-        .fetchone()
-        is not None
-    )
-
-    if not exists:
+    if not table_exists(table):
         return {
             "market": market_valid,
             "symbol": symbol_upper,
             "total_trades": 0,
-            "page": 1,
             "per_page": PER_PAGE,
             "data": [],
             "pagination": {},
         }
 
-    # Pagination and filters
-    page = max(request.args.get("page", 1, type=int), 1)
+    # Filters (start / end are epoch seconds)
     start_ts = request.args.get("start", type=int)
     end_ts = request.args.get("end", type=int)
 
@@ -67,75 +120,169 @@ def get_ticks(market: str, symbol: str) -> Union[dict[str, Any], Tuple[Response,
     params: list[int] = []
 
     if start_ts is not None:
-        where_clauses.append("event_time >= make_timestamp(?)")
-        params.append(start_ts * 1000)
+        where_clauses.append("time >= make_timestamp(?)")
+        params.append(start_ts * 1_000_000)
     if end_ts is not None:
-        where_clauses.append("event_time <= make_timestamp(?)")
-        params.append(end_ts * 1000)
+        where_clauses.append("time <= make_timestamp(?)")
+        params.append(end_ts * 1_000_000)
 
     where_sql = (" AND " + " AND ".join(where_clauses)) if where_clauses else ""
 
-    # Total count
-    count_row = get_db().execute(
-        f'SELECT COUNT(*) FROM "{table}" WHERE 1=1 {where_sql}', params
-    ).fetchone()
-    total: int = int(count_row[0]) if count_row and count_row[0] is not None else 0
-
-    # Page data
-    offset = (page - 1) * PER_PAGE
-    query = f'''
-        SELECT trade_id, price, qty, quote_qty, event_time, is_buyer_maker
-        FROM "{table}"
-        WHERE 1=1 {where_sql}
-        ORDER BY event_time DESC
-        LIMIT ? OFFSET ?
-    '''
-    df = get_db().execute(query, params + [PER_PAGE, offset]).df()
-
-    # Pagination metadata
-    pagination = Pagination(
-        page=page,
-        per_page=PER_PAGE,
-        total=total,
-        record_name="trades",
-        css_framework="bootstrap5",
-        show_single_page=False,
-    )
+    # Hot table plus the archive partitions the range (narrowed by the
+    # cursor, if any) can touch
+    def to_dt(seconds: float) -> datetime:
+        return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+    prune_start = to_dt(start_ts) if start_ts is not None else None
+    prune_end = to_dt(end_ts) if end_ts is not None else None
+    if cursor is not None and fmt != "ndjson" and not (fmt == "arrow" and wants_stream()):
+        cursor_time = to_dt(cursor[1] / 1_000_000)
+        if cursor[0] == "next":
+            prune_end = min(prune_end, cursor_time) if prune_end else cursor_time
+        else:
+            prune_start = max(prune_start, cursor_time) if prune_start else cursor_time
+    source = ticks_source(market_valid, symbol_upper, prune_start, prune_end)
+
+    # Streamed export: every trade in the range, oldest first, no paging
+    if fmt == "ndjson" or (fmt == "arrow" and wants_stream()):
+        export_query = f'''
+            SELECT id, price, qty, time, is_buyer_maker
+            FROM {source}
+            WHERE 1=1 {where_sql}
+            ORDER BY time, id
+        '''
+        meta = {"market": market_valid, "symbol": symbol_upper}
+        if fmt == "ndjson":
+            return ndjson_stream_response(export_query, params, TICK_COLUMNS, meta)
+        return arrow_stream_response(export_query, params, meta)
+
+    # Keyset condition. The time bound is kept as its own conjunct so DuckDB
+    # can prune row groups on it; only rows sharing the cursor's timestamp are
+    # disambiguated by id.
+    key_sql = ""
+    key_params: list[int] = []
+    inner_order = "DESC"
+    if cursor is not None:
+        direction, time_us, trade_id = cursor
+        op = "<" if direction == "next" else ">"
+        key_sql = (
+            f" AND time {op}= make_timestamp(?)"
+            f" AND (time {op} make_timestamp(?) OR id {op} ?)"
+        )
+        key_params = [time_us, time_us, trade_id]
+        inner_order = "DESC" if direction == "next" else "ASC"
 
-    base_args: dict[str, Any] = {k: v for k, v in request.args.items(multi=True) if k != "page"}
+    def page_query(select: str, limit: int) -> str:
+        # Walk away from the cursor, then present newest first
+        return f'''
+            SELECT {select} FROM (
+                SELECT id, price, qty, time, is_buyer_maker
+                FROM {source}
+                WHERE 1=1 {where_sql} {key_sql}
+                ORDER BY time {inner_order}, id {inner_order}
+                LIMIT {limit}
+            )
+            ORDER BY time DESC, id DESC
+        '''
 
-    def make_url(page_num: int) -> str:
+    # Page keys, with one extra row to learn whether there is more beyond it
+    keys = get_db().execute(
+        page_query("epoch_us(time), id", PER_PAGE + 1), params + key_params
+    ).fetchall()
+    more = len(keys) > PER_PAGE
+    if more:
+        keys = keys[:-1] if inner_order == "DESC" else keys[1:]
+
+    if cursor is None:
+        has_prev, has_next = False, more
+    elif cursor[0] == "next":
+        has_prev, has_next = True, more
+    else:
+        has_prev, has_next = more, True
+
+    base_args: dict[str, Any] = {
+        k: v for k, v in request.args.items(multi=True) if k not in ("cursor", "page")
+    }
+
+    def make_url(cursor_value: Optional[str]) -> str:
+        args = dict(base_args)
+        if cursor_value is not None:
+            args["cursor"] = cursor_value
         return url_for(
-            "ticks_data.get_ticks",
+            ".get_ticks",
             market=market_valid,
             symbol=symbol_upper.lower(),
-            page=page_num,
-            **base_args,
+            **args,
         )
 
     pag_dict: dict[str, Any] = {
-        "page": page,
         "per_page": PER_PAGE,
-        "total": total,
-        "pages": pagination.pages or 1,
-        "has_prev": pagination.has_prev,
-        "has_next": pagination.has_next,
+        "has_prev": has_prev and bool(keys),
+        "has_next": has_next and bool(keys),
+        "first": make_url(None),
+    }
+    if pag_dict["has_prev"]:
+        pag_dict["prev_cursor"] = encode_cursor("prev", keys[0][0], keys[0][1])
+        pag_dict["prev"] = make_url(pag_dict["prev_cursor"])
+    if pag_dict["has_next"]:
+        pag_dict["next_cursor"] = encode_cursor("next", keys[-1][0], keys[-1][1])
+        pag_dict["next"] = make_url(pag_dict["next_cursor"])
+
+    meta: dict[str, Any] = {
+        "market": market_valid,
+        "symbol": symbol_upper,
+        # Catalog estimate for the whole table; counting per request would
+        # cost a full scan.
+        "total_trades": approximate_count(table) + archived_row_count(market_valid, symbol_upper),
+        "total_is_estimate": True,
+        "per_page": PER_PAGE,
+        "pagination": pag_dict,
     }
 
-    if pagination.has_prev:
-        pag_dict["prev"] = make_url(page - 1)
-    if pagination.has_next:
-        pag_dict["next"] = make_url(page + 1)
+    query = page_query("*", PER_PAGE)
+    page_params = params + key_params
+    if fmt == "arrow":
+        return arrow_response(query, page_params, meta)
+    if fmt == "columns":
+        return columns_response(query, page_params, TICK_COLUMNS,
+                                "time DESC, id DESC", "data", meta)
+
+    df = get_db().execute(query, page_params).df()
+    return {**meta, "data": df.to_dict(orient="records")}
 
-    pag_dict["first"] = make_url(1)
-    pag_dict["last"] = make_url(pagination.pages or 1) # type: ignore
 
+@ticks_bp.route("/ingest-stats")
+def ingest_stats() -> dict[str, Any]:
+    """Websocket connection and ingest buffer counters."""
+    from .tasks import stream_manager
+    return {
+        "connections": stream_manager.stats() if stream_manager is not None else {},
+        "streams": trade_buffer.stats(),
+    }
+
+
+@ticks_bp.route("/<market>/<symbol>/coverage")
+@uses_reader
+def get_coverage(market: str, symbol: str) -> Union[dict[str, Any], Tuple[Response, int]]:
+    """
+    Stored aggTrade id runs and the gaps between them, newest first (times
+    in epoch ms), from the coverage index.
+    """
+    try:
+        market_valid = validate_market(market)
+    except ValueError:
+        return jsonify(error="Invalid market. Use 'binance_spot' or 'binance_futures'"), 400
+    symbol_upper = symbol.upper()
+    limit = request.args.get("limit", default=PER_PAGE, type=int)
+    table = table_name(market_valid, symbol_upper)
+    gaps = find_gaps(market_valid, symbol_upper)
     return {
         "market": market_valid,
         "symbol": symbol_upper,
-        "total_trades": total,
-        "page": page,
-        "per_page": PER_PAGE,
-        "data": df.to_dict(orient="records"),
-        "pagination": pag_dict,
+        "built": is_built(table),
+        "missing_ids": sum(g["missing"] for g in gaps),
+        "gap_count": len(gaps),
+        "gaps": gaps[:limit],
+        "ranges": coverage_ranges(market_valid, symbol_upper, limit),
+        "repair": repair_status.get(table),
     }
@@ -0,0 +1,90 @@
+# app/blueprints/ticks/snapshot.py
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from flask import current_app
+from app.extensions import get_db, table_exists
+from .candles import INTERVALS, materialize_candles
+from .storage import Market, table_name
+
+# The ingest process owns app.duckdb. Every SNAPSHOT_SECONDS it brings all
+# candle tables up to date and copies the database to
+#   {SNAPSHOT_DIR}/snapshot-{epoch_ms}.duckdb
+# then points {SNAPSHOT_DIR}/CURRENT at it. API workers open the file named
+# in CURRENT read-only and switch to a newer one once they notice it.
+# Parquet archive partitions are shared directly through ARCHIVE_PATH.
+
+POINTER_FILE = "CURRENT"
+
+# Published snapshots kept on disk; older ones are deleted (workers that
+# still have one open keep reading it until they switch)
+KEEP_SNAPSHOTS = 2
+
+
+def snapshot_dir() -> Path:
+    return Path(current_app.config["SNAPSHOT_DIR"])
+
+
+def current_snapshot() -> Optional[Path]:
+    """Path of the newest published snapshot, None before the first one."""
+    try:
+        name = (snapshot_dir() / POINTER_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+    return snapshot_dir() / name if name else None
+
+
+def publish_snapshot() -> Path:
+    """
+    Copy the whole database into a new snapshot file and make it current.
+    The copy reads one consistent transaction on this thread's cursor, so
+    ingestion keeps writing meanwhile.
+    """
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"snapshot-{int(time.time() * 1000)}.duckdb"
+    sql_path = str(target).replace("'", "''")
+
+    db = get_db()
+    database = db.execute("SELECT current_database()").fetchone()[0]  # type: ignore
+    db.execute(f"ATTACH '{sql_path}' AS snapshot")
+    try:
+        db.execute(f'COPY FROM DATABASE "{database}" TO snapshot')
+    finally:
+        db.execute("DETACH snapshot")
+
+    pointer = directory / POINTER_FILE
+    tmp = pointer.with_suffix(".tmp")
+    tmp.write_text(target.name)
+    os.replace(tmp, pointer)
+
+    for old in sorted(directory.glob("snapshot-*.duckdb"))[:-KEEP_SNAPSHOTS]:
+        old.unlink(missing_ok=True)
+        Path(f"{old}.wal").unlink(missing_ok=True)
+    return target
+
+
+def refresh_candles(symbols: dict[Market, list[str]]) -> None:
+    """Materialize every interval so API workers never have to."""
+    for market, syms in symbols.items():
+        for symbol in syms:
+            if not table_exists(table_name(market, symbol)):
+                continue
+            for interval in INTERVALS:
+                materialize_candles(market, symbol, interval)
+
+
+def snapshot_worker(app, symbols: dict[Market, list[str]]) -> None:
+    # Data seen by the API is at most SNAPSHOT_SECONDS + the time one
+    # refresh-and-copy takes + SNAPSHOT_POLL_SECONDS old.
+    with app.app_context():
+        while True:
+            started = time.time()
+            try:
+                refresh_candles(symbols)
+                path = publish_snapshot()
+                app.logger.info(f"Published snapshot {path.name} in {time.time() - started:.1f}s")
+            except Exception:
+                app.logger.exception("Publishing snapshot failed")
+            time.sleep(max(0.0, app.config["SNAPSHOT_SECONDS"] - (time.time() - started)))
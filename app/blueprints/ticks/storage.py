@@ -1,38 +1,364 @@
 # app/blueprints/ticks/storage.py
-from app.extensions import get_db
-from typing import Literal
+import threading
+import time
+from flask import current_app
+from app.extensions import get_db, table_exists, writer
+from typing import Any, Literal, Optional
 
 Market = Literal["binance_spot", "binance_futures"]
 
+# Tables already created by this process; insert_trades skips the DDL for them
+_ensured: set[str] = set()
+
+# Append-only tables (created while TICKS_APPEND_ONLY is on) have no PRIMARY
+# KEY, so DuckDB keeps no unique index on id. Live inserts drop trades at or
+# below the stream's high-water id instead, bulk loads skip ids already in
+# the range they cover, and verify_unique_ids() checks the result
+# periodically. Tables created with the key keep it and keep ON CONFLICT.
+_append_only: dict[str, bool] = {}
+_high_water: dict[str, int] = {}
+
+# (price, qty) column types per table: DOUBLE, or in the compact layout
+# (TICKS_COMPACT, layout.migrate_table) DECIMAL(18, scale) with per-symbol
+# scales from TICK_DECIMALS, which DuckDB stores as bit-packed integers.
+# Readers go through archive.ticks_source, which hands out DOUBLE either way.
+_column_types: dict[str, tuple[str, str]] = {}
+DOUBLE_TYPES = ("DOUBLE", "DOUBLE")
+DEFAULT_DECIMALS = (8, 8)
+
+# Outcome of the last verify_unique_ids() per table
+duplicate_checks: dict[str, dict[str, Any]] = {}
+
+# Coverage index: the contiguous aggTrade id runs stored per ticks table,
+# with the time of their first and last trade. aggTrade ids are sequential
+# within a stream, so a hole between two runs is a gap in the data. Every
+# insert merges the runs of its own rows in, touching only the few
+# neighbouring index rows; coverage.py finds and repairs the gaps.
+COVERAGE_TABLE = "tick_coverage"
+
+# Per-table ingestion watermark: (highest trade id, highest trade time in
+# epoch ms, number of writes) as seen by this process. The write count also
+# moves for bulk loads of past days, which leave id and time alone. Caches of
+# data derived from a table compare against it.
+_watermarks: dict[str, tuple[int, int, int]] = {}
+_watermarks_lock = threading.Lock()
+
+# Watermarks of the tables derived from ticks (candles, footprint, bars),
+# one row per derived table, named "{ticks_table}_...". candles.py keeps
+# them; inserts of trades older than a watermark move it back (see
+# rewind_derived), so backfills and repairs are aggregated too.
+WATERMARKS_TABLE = "candle_watermarks"
+
 def table_name(market: Market, symbol: str) -> str:
     return f"{market}_{symbol.lower()}"
 
+def compact_types(symbol: str) -> tuple[str, str]:
+    price_scale, qty_scale = current_app.config["TICK_DECIMALS"].get(symbol.upper(), DEFAULT_DECIMALS)
+    return f"DECIMAL(18,{price_scale})", f"DECIMAL(18,{qty_scale})"
+
+def create_ticks_table(db, table: str, append_only: bool, types: tuple[str, str]) -> None:
+    key_sql = "" if append_only else " PRIMARY KEY"
+    db.execute(f'''
+    CREATE TABLE IF NOT EXISTS "{table}" (
+        id  BIGINT{key_sql},
+        price           {types[0]},
+        qty             {types[1]},
+        time         TIMESTAMP,
+        is_buyer_maker  BOOLEAN
+    )
+    ''')
+
+def read_layout(db, table: str) -> None:
+    """Load an existing table's key and column types into the layout caches."""
+    _append_only[table] = db.execute('''
+        SELECT 1 FROM duckdb_constraints()
+        WHERE table_name = ? AND constraint_type = 'PRIMARY KEY'
+    ''', [table]).fetchone() is None
+    types = dict(db.execute('''
+        SELECT column_name, data_type FROM duckdb_columns()
+        WHERE table_name = ? AND column_name IN ('price', 'qty')
+    ''', [table]).fetchall())
+    _column_types[table] = (types["price"], types["qty"])
+
+def ensure_coverage_table(db) -> None:
+    db.execute(f'''
+    CREATE TABLE IF NOT EXISTS "{COVERAGE_TABLE}" (
+        ticks_table VARCHAR,
+        first_id    BIGINT,
+        last_id     BIGINT,
+        first_time  TIMESTAMP,
+        last_time   TIMESTAMP
+    )
+    ''')
+
 def ensure_table(market: Market, symbol: str) -> None:
     table = table_name(market, symbol)
-    get_db().execute(f'''
-        CREATE TABLE IF NOT EXISTS "{table}" (
-            id  BIGINT PRIMARY KEY,
-            price           DOUBLE,
-            qty             DOUBLE,
-            time         TIMESTAMP,
-            is_buyer_maker  BOOLEAN
+    with writer() as db:
+        ensure_coverage_table(db)
+        if table not in _append_only:
+            if table_exists(table):
+                read_layout(db, table)
+            else:
+                _append_only[table] = bool(current_app.config["TICKS_APPEND_ONLY"])
+                _column_types[table] = (
+                    compact_types(symbol) if current_app.config["TICKS_COMPACT"] else DOUBLE_TYPES
+                )
+        create_ticks_table(db, table, _append_only[table], _column_types[table])
+
+def is_append_only(market: Market, symbol: str) -> bool:
+    ensure_table(market, symbol)
+    return _append_only[table_name(market, symbol)]
+
+def is_compact(market: Market, symbol: str) -> bool:
+    ensure_table(market, symbol)
+    return _column_types[table_name(market, symbol)] != DOUBLE_TYPES
+
+def _stored_high_water(db, table: str) -> int:
+    """Highest id in an append-only table, read once and then tracked in memory."""
+    if table not in _high_water:
+        row = db.execute(f'SELECT max(id) FROM "{table}"').fetchone()
+        _high_water[table] = int(row[0]) if row and row[0] is not None else -1
+    return _high_water[table]
+
+def note_write(table: str, max_id: Optional[int] = None, max_time_ms: Optional[int] = None) -> None:
+    """Advance a table's ingestion watermark after rows were written to it."""
+    with _watermarks_lock:
+        last_id, last_time, writes = _watermarks.get(table, (-1, -1, 0))
+        _watermarks[table] = (
+            max(last_id, max_id if max_id is not None else -1),
+            max(last_time, max_time_ms if max_time_ms is not None else -1),
+            writes + 1,
         )
-    ''')
+
+def ingest_watermark(market: Market, symbol: str) -> tuple[int, int, int]:
+    with _watermarks_lock:
+        return _watermarks.get(table_name(market, symbol), (-1, -1, 0))
+
+def rewind_derived(db, table: str, first_ms: int) -> None:
+    """
+    After trades from `first_ms` (epoch ms) on were inserted into `table`,
+    move the watermarks of its derived tables to just before them, so the
+    next materialization recomputes from there. Watermarks already earlier
+    stay. Call with the writer held.
+    """
+    if not table_exists(WATERMARKS_TABLE):
+        return
+    db.execute(f'''
+        UPDATE "{WATERMARKS_TABLE}"
+        SET open_time = LEAST(open_time, r.t), tick_time = LEAST(tick_time, r.t), updated_at = now()
+        FROM (SELECT epoch_ms(CAST(? AS BIGINT)) - INTERVAL 1 MILLISECOND AS t) AS r
+        WHERE starts_with(candles_table, ?) AND (open_time > r.t OR tick_time > r.t)
+    ''', [first_ms, f"{table}_"])
+
+# ----------------------------------------------------------------------
+# Coverage index
+# ----------------------------------------------------------------------
+
+# A run: (first_id, last_id, first_time_ms, last_time_ms)
+Run = tuple[int, int, int, int]
+
+def merge_runs(runs: list[Run]) -> list[Run]:
+    """Merge overlapping or adjacent id runs."""
+    merged: list[list[int]] = []
+    for first, last, first_ms, last_ms in sorted(runs):
+        if merged and first <= merged[-1][1] + 1:
+            top = merged[-1]
+            if last > top[1]:
+                top[1], top[3] = last, last_ms
+        else:
+            merged.append([first, last, first_ms, last_ms])
+    return [(a, b, c, d) for a, b, c, d in merged]
+
+def trade_runs(trades: list[dict]) -> list[Run]:
+    """Contiguous id runs of aggTrade payloads."""
+    runs: list[Run] = []
+    for t in sorted(trades, key=lambda t: t["a"]):
+        if runs and t["a"] <= runs[-1][1] + 1:
+            if t["a"] > runs[-1][1]:
+                runs[-1] = (runs[-1][0], t["a"], runs[-1][2], t["T"])
+        else:
+            runs.append((t["a"], t["a"], t["T"], t["T"]))
+    return runs
+
+def record_coverage(db, table: str, runs: list[Run]) -> None:
+    """Merge id runs into a table's coverage index. Call with the writer held."""
+    if not runs:
+        return
+    lo = min(r[0] for r in runs)
+    hi = max(r[1] for r in runs)
+    # Only index rows overlapping or adjacent to [lo, hi] can merge
+    touching = db.execute(f'''
+        SELECT first_id, last_id, epoch_ms(first_time), epoch_ms(last_time)
+        FROM "{COVERAGE_TABLE}"
+        WHERE ticks_table = ? AND last_id >= ? AND first_id <= ?
+    ''', [table, lo - 1, hi + 1]).fetchall()
+    merged = merge_runs(runs + [tuple(row) for row in touching])
+    if touching:
+        db.execute(f'''
+            DELETE FROM "{COVERAGE_TABLE}"
+            WHERE ticks_table = ? AND last_id >= ? AND first_id <= ?
+        ''', [table, lo - 1, hi + 1])
+    db.execute(f'''
+        INSERT INTO "{COVERAGE_TABLE}"
+        SELECT ?, r.first_id, r.last_id, epoch_ms(r.first_ms), epoch_ms(r.last_ms)
+        FROM unnest(?) AS t(r)
+    ''', [table, [
+        {"first_id": a, "last_id": b, "first_ms": c, "last_ms": d} for a, b, c, d in merged
+    ]])
+
+def _staged_runs(db) -> list[Run]:
+    # Runs of "_incoming_trades": id - rank is constant along a contiguous run
+    return [tuple(int(v) for v in row) for row in db.execute('''
+        SELECT min(id), max(id), epoch_ms(arg_min(time, id)), epoch_ms(arg_max(time, id))
+        FROM (SELECT id, time, id - dense_rank() OVER (ORDER BY id) AS run FROM "_incoming_trades")
+        GROUP BY run
+    ''').fetchall()]
 
 def insert_trades(market: Market, symbol: str, trades: list[dict]) -> None:
+    """Insert aggTrade payloads ({"a", "p", "q", "T" (epoch ms), "m"})."""
     if not trades:
         return
-    ensure_table(market, symbol)
     table = table_name(market, symbol)
+    if table not in _ensured:
+        ensure_table(market, symbol)
+        _ensured.add(table)
 
-    get_db().execute(f'''
+    with writer() as db:
+        # The index is updated only once the insert succeeded: a failed
+        # batch stays a gap for the repair. A crash between the two only
+        # makes the repair fetch these ids again; inserts skip stored ids.
+        runs = trade_runs(trades)
+        append_only = _append_only[table]
+        if append_only:
+            # aggTrade ids only grow within a stream: anything at or below
+            # the high-water id was written already
+            high = _stored_high_water(db, table)
+            fresh = []
+            for t in trades:
+                if t["a"] > high:
+                    fresh.append(t)
+                    high = t["a"]
+            if not fresh:
+                record_coverage(db, table, runs)
+                return
+            trades = fresh
+        price_type, qty_type = _column_types[table]
+        db.execute(f'''
         INSERT INTO "{table}"
         SELECT
-            a AS id,
-            CAST(p AS DOUBLE) AS price,
-            CAST(q AS DOUBLE) AS qty,
-            T AS time,
-            m AS is_buyer_maker
-        FROM unnest(?)
-        ON CONFLICT (id) DO NOTHING
-    ''', [trades])
\ No newline at end of file
+            rec.a AS id,
+            CAST(rec.p AS {price_type}) AS price,
+            CAST(rec.q AS {qty_type}) AS qty,
+            epoch_ms(rec.T) AS time,
+            rec.m AS is_buyer_maker
+        FROM unnest(?) AS t(rec)
+        {"" if append_only else "ON CONFLICT (id) DO NOTHING"}
+        ''', [trades])
+        if append_only:
+            _high_water[table] = high
+        record_coverage(db, table, runs)
+        rewind_derived(db, table, min(t["T"] for t in trades))
+    note_write(table, max(t["a"] for t in trades), max(t["T"] for t in trades))
+
+def insert_select(market: Market, symbol: str, select_sql: str, params: list) -> int:
+    """
+    Insert the rows of a SELECT of (id, price, qty, time, is_buyer_maker),
+    skipping ids already stored, for bulk loads that may cover any range.
+    Returns the number of rows inserted.
+    """
+    ensure_table(market, symbol)
+    table = table_name(market, symbol)
+    with writer() as db:
+        # Stage the rows: their id runs go into the coverage index
+        db.execute(f'CREATE OR REPLACE TEMP TABLE "_incoming_trades" AS {select_sql}', params)
+        try:
+            lo, hi, first_ms = db.execute(
+                'SELECT min(id), max(id), epoch_ms(min(time)) FROM "_incoming_trades"'
+            ).fetchone()
+            if lo is None:
+                return 0
+            if not _append_only[table]:
+                row = db.execute(f'''
+                    INSERT INTO "{table}" SELECT * FROM "_incoming_trades"
+                    ON CONFLICT (id) DO NOTHING
+                ''').fetchone()
+            else:
+                # Anti-join against the stored ids of the staged range only
+                # (zone maps skip the rest of the table)
+                row = db.execute(f'''
+                    INSERT INTO "{table}"
+                    SELECT i.* FROM "_incoming_trades" AS i
+                    ANTI JOIN (SELECT id FROM "{table}" WHERE id BETWEEN ? AND ?) AS s USING (id)
+                ''', [lo, hi]).fetchone()
+                if table in _high_water:
+                    _high_water[table] = max(_high_water[table], int(hi))
+            record_coverage(db, table, _staged_runs(db))
+            if row and row[0]:
+                rewind_derived(db, table, int(first_ms))
+        finally:
+            db.execute('DROP TABLE IF EXISTS "_incoming_trades"')
+    return int(row[0]) if row else 0
+
+def insert_missing_trades(market: Market, symbol: str, trades: list[dict]) -> int:
+    """
+    Insert aggTrade payloads that may lie below the live high-water id (gap
+    repair from REST). Returns the number of rows inserted.
+    """
+    if not trades:
+        return 0
+    ensure_table(market, symbol)
+    price_type, qty_type = _column_types[table_name(market, symbol)]
+    count = insert_select(market, symbol, f'''
+        SELECT
+            rec.a AS id,
+            CAST(rec.p AS {price_type}) AS price,
+            CAST(rec.q AS {qty_type}) AS qty,
+            epoch_ms(rec.T) AS time,
+            rec.m AS is_buyer_maker
+        FROM unnest(?) AS t(rec)
+    ''', [trades])
+    if count:
+        note_write(table_name(market, symbol))
+    return count
+
+def verify_unique_ids(market: Market, symbol: str, repair: bool = True) -> dict[str, Any]:
+    """
+    Look for ids stored more than once in an append-only table and, with
+    `repair`, delete the extra copies. Scans the hot table only: archived
+    days were copied out of it (see archive.compact_day).
+    """
+    table = table_name(market, symbol)
+    started = time.monotonic()
+    # The scan runs on a reader; only a repair takes the writer
+    duplicates = [row[0] for row in get_db().execute(f'''
+        SELECT id FROM "{table}" GROUP BY id HAVING COUNT(*) > 1
+    ''').fetchall()]
+    removed = 0
+    if duplicates and repair:
+        with writer() as db:
+            row = db.execute(f'''
+                DELETE FROM "{table}" WHERE rowid IN (
+                    SELECT rid FROM (
+                        SELECT rowid AS rid, row_number() OVER (PARTITION BY id ORDER BY rowid) AS n
+                        FROM "{table}"
+                        WHERE id IN (SELECT unnest(?))
+                    )
+                    WHERE n > 1
+                )
+            ''', [duplicates]).fetchone()
+            removed = int(row[0]) if row else 0
+    result = {
+        "checked_at": time.time(),
+        "seconds": time.monotonic() - started,
+        "duplicate_ids": len(duplicates),
+        "removed_rows": removed,
+        "removed_rows_total": duplicate_checks.get(table, {}).get("removed_rows_total", 0) + removed,
+    }
+    duplicate_checks[table] = result
+    if duplicates:
+        current_app.logger.warning(
+            f"{table}: {len(duplicates)} duplicated ids (e.g. {duplicates[:5]}), removed {removed} rows"
+        )
+    if removed:
+        note_write(table)
+    return result
@@ -1,58 +1,140 @@
 # app/blueprints/ticks/tasks.py
 import threading
 import time
-import json
-import websocket
+from typing import Optional
+import requests
 from flask import current_app
-from app.extensions import get_db
-from .storage import table_name, insert_trades
-from .binance.downloader import backfill_day
-from datetime import date, timedelta
+from werkzeug.exceptions import NotFound
+from werkzeug.serving import make_server
+from .ingest import trade_buffer
+from .live import live_candles
+from .backfill import run_backfill
+from .archive import compact_closed_days
+from .storage import is_append_only, is_compact, table_name, verify_unique_ids
+from .layout import sort_closed_days
+from .coverage import build_coverage, repair_gaps
+from app.extensions import table_exists
+from .binance.stream import StreamManager
+from .binance.rest import RestBudget
+from .snapshot import snapshot_worker
+from datetime import date
 
 SYMBOLS = {
     "binance_spot": ["BTCUSDT", "ETHUSDT"],
     "binance_futures": ["BTCUSDT", "ETHUSDT"],
 }
 
+_sync_started = False
+
 def start_background_sync():
-    threading.Thread(target=historical_worker, daemon=True).start()
-    threading.Thread(target=websocket_worker, daemon=True).start()
+    # Once per process, whichever of the blueprint and `manage.py ingest` asks first
+    global _sync_started
+    if _sync_started:
+        return
+    _sync_started = True
+    trade_buffer.start(current_app._get_current_object()) # type: ignore
+    live_candles.start(current_app._get_current_object()) # type: ignore
+    threading.Thread(
+        target=historical_worker, args=(current_app._get_current_object(),), daemon=True # type: ignore
+    ).start()
+    threading.Thread(
+        target=repair_worker, args=(current_app._get_current_object(),), daemon=True # type: ignore
+    ).start()
+    websocket_worker()
+    if current_app.config["PROCESS_ROLE"] == "ingest":
+        # Read-only API workers attach to the snapshots this publishes
+        threading.Thread(
+            target=snapshot_worker, args=(current_app._get_current_object(), SYMBOLS), daemon=True # type: ignore
+        ).start()
+        # ... and can't see the forming candles, which live here
+        if current_app.config["LIVE_HTTP_PORT"]:
+            threading.Thread(
+                target=live_http_worker, args=(current_app._get_current_object(),), daemon=True # type: ignore
+            ).start()
     current_app.logger.info("Ticks background sync started")
 
-def historical_worker():
-    while True:
-        for market, symbols in SYMBOLS.items():
-            for symbol in symbols:
-                table = table_name(market, symbol) # type: ignore
-                result = get_db().execute(f'SELECT MAX(time) FROM "{table}"').fetchone()
-                last_ts = result[0] if result and result[0] else None
-                start_date = date(2024, 1, 1) if not last_ts else last_ts.date() + timedelta(days=1)
-                today = date.today()
-
-                current = start_date
-                while current < today:
-                    count = backfill_day(market, symbol, current) # type: ignore
-                    if count:
-                        current_app.logger.info(f"Backfilled {market} {symbol} {current}: {count} trades")
-                    current += timedelta(days=1)
-                    time.sleep(0.05)
-        time.sleep(3600)  # run once per hour
-
-def on_ws_message(ws, message, market: str, symbol: str):
-    data = json.loads(message)
-    if "data" in data:
-        insert_trades(market, symbol, [data["data"]]) # type: ignore
+def historical_worker(app):
+    # Day-by-day archive backfill; progress lives in the backfill_jobs table,
+    # so a restart resumes with the first day not yet loaded.
+    with app.app_context():
+        start = date.fromisoformat(app.config["BACKFILL_START_DATE"])
+        while True:
+            try:
+                run_backfill(SYMBOLS, start, workers=app.config["BACKFILL_WORKERS"]) # type: ignore
+            except Exception:
+                app.logger.exception("Backfill run failed")
+            # Move closed days out of the hot tables
+            for market, symbols in SYMBOLS.items():
+                for symbol in symbols:
+                    if not table_exists(table_name(market, symbol)): # type: ignore
+                        continue
+                    try:
+                        compact_closed_days(market, symbol, app.config["HOT_DAYS"]) # type: ignore
+                    except Exception:
+                        app.logger.exception(f"Archiving {market} {symbol} failed")
+                    # No unique index guards append-only tables: check for duplicates
+                    if is_append_only(market, symbol): # type: ignore
+                        try:
+                            verify_unique_ids(market, symbol) # type: ignore
+                        except Exception:
+                            app.logger.exception(f"Duplicate check of {market} {symbol} failed")
+                    # Keep the compact layout's row groups in time order
+                    if is_compact(market, symbol): # type: ignore
+                        try:
+                            sort_closed_days(market, symbol) # type: ignore
+                        except Exception:
+                            app.logger.exception(f"Sorting {market} {symbol} failed")
+            time.sleep(3600)  # run once per hour
+
+def repair_worker(app):
+    # Fills holes left by websocket disconnects and failed archive days. Each
+    # cycle reads only the coverage index, after a one-time scan per table
+    # that held data before the index existed.
+    with app.app_context():
+        session = requests.Session()
+        while True:
+            for market, symbols in SYMBOLS.items():
+                # The streams of a market share one REST budget per cycle
+                budget = RestBudget(app.config["REPAIR_REST_WEIGHT"], app.config["REPAIR_REST_MAX_REQUESTS"])
+                for symbol in symbols:
+                    if not table_exists(table_name(market, symbol)): # type: ignore
+                        continue
+                    try:
+                        build_coverage(market, symbol) # type: ignore
+                        repair_gaps(market, symbol, session, budget) # type: ignore
+                    except Exception:
+                        app.logger.exception(f"Gap repair of {market} {symbol} failed")
+            time.sleep(app.config["REPAIR_INTERVAL_SECONDS"])
+
+def live_http_worker(app):
+    # The ingest process serves no API, only the live candle stream (SSE):
+    # one thread per connected client
+    def live_only(environ, start_response):
+        if environ.get("PATH_INFO", "").startswith("/api/live-candles/"):
+            return app(environ, start_response)
+        return NotFound()(environ, start_response)
+
+    host, port = app.config["LIVE_HTTP_HOST"], app.config["LIVE_HTTP_PORT"]
+    server = make_server(host, port, live_only, threaded=True)
+    app.logger.info(f"Serving live candles on http://{host}:{port}/api/live-candles/")
+    server.serve_forever()
+
+stream_manager: Optional[StreamManager] = None
+
+def on_trades(market, symbol, trades):
+    # Runs on the event loop: both consumers only buffer / update memory.
+    # The put never blocks the loop: trades dropped by a full buffer become
+    # a coverage gap that repair_worker fetches again.
+    trade_buffer.put(market, symbol, trades, timeout=0)
+    live_candles.add(market, symbol, trades)
 
 def websocket_worker():
-    def connect_one(market: str, symbol: str):
-        stream = f"{symbol.lower()}@aggTrade"
-        base = "wss://stream.binance.com:9443/ws" if market == "binance_spot" else "wss://fstream.binance.com/ws"
-        url = f"{base}/{stream}"
-
-        def on_msg(ws, msg): on_ws_message(ws, msg, market, symbol)
-        ws = websocket.WebSocketApp(url, on_message=on_msg)
-        ws.run_forever(ping_interval=30)
-
-    for market, symbols in SYMBOLS.items():
-        for sym in symbols:
-            threading.Thread(target=connect_one, args=(market, sym), daemon=True).start()
\ No newline at end of file
+    # One event loop thread multiplexes every (market, symbol) over combined
+    # streams; trades go to the ingest buffer's single writer and to the
+    # live candle aggregator.
+    global stream_manager
+    if stream_manager is None:
+        stream_manager = StreamManager(
+            SYMBOLS, on_trades, current_app.config.get("BINANCE_WS_URLS") # type: ignore
+        )
+    stream_manager.start()
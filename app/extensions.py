@@ -1,23 +1,225 @@
 # app/extensions.py
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterator, Optional
 import duckdb
-from flask import current_app
+from flask import current_app, g, has_app_context
+from app.metrics import observe_query
 
+# One DuckDB database instance per process. Nobody queries `_db_con` itself:
+# every thread works on a cursor of its own (a separate connection to the
+# same database), API reads go through a bounded pool of reader cursors and
+# all writes go through the single writer cursor.
+#
+# PROCESS_ROLE "all" and "ingest" open app.duckdb read-write. "api" opens
+# the latest snapshot published by the ingest process read-only, has no
+# writer, and re-checks for a newer snapshot every SNAPSHOT_POLL_SECONDS.
+#
+# Every cursor handed out is a TimedCursor, so statement timings reach
+# /metrics without call sites doing anything.
 _db_con = None
+_init_lock = threading.Lock()
+_local = threading.local()
+_writer_con = None
+_writer_lock = threading.RLock()
+_readers: Optional[queue.Queue] = None
+_snapshot_path = None
+_snapshot_checked = 0.0
 
-def get_db():
-    global _db_con
+
+class WriterBusy(Exception):
+    """The writer stayed busy longer than the caller was willing to wait."""
+
+
+class TimedCursor:
+    """
+    A DuckDB cursor whose execute() / executemany() calls are timed into
+    the query metrics (see app.metrics). Everything else is passed through.
+    """
+
+    __slots__ = ("_con",)
+
+    def __init__(self, con: duckdb.DuckDBPyConnection):
+        self._con = con
+
+    def execute(self, query, parameters=None):
+        started = time.perf_counter()
+        self._con.execute(query, parameters)
+        observe_query(query, parameters, time.perf_counter() - started)
+        return self
+
+    def executemany(self, query, parameters=None):
+        started = time.perf_counter()
+        self._con.executemany(query, parameters)
+        observe_query(query, parameters, time.perf_counter() - started)
+        return self
+
+    def cursor(self) -> "TimedCursor":
+        return TimedCursor(self._con.cursor())
+
+    def release(self) -> None:
+        """
+        Replace the pending result. A result left half-read (e.g. after
+        fetchone()) pins the versions its query saw, and CHECKPOINT refuses
+        to run after DDL such as a table swap while any is pinned.
+        """
+        self._con.execute("SELECT 1")
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+
+def _connect():
+    global _db_con, _writer_con, _readers
+    if current_app.config["PROCESS_ROLE"] == "api":
+        return _attach_snapshot()
     if _db_con is None:
-        path = current_app.config["DUCKDB_PATH"]
-        _db_con = duckdb.connect(database=path, read_only=False)
-        # Optional: nice defaults
-        _db_con.execute("PRAGMA enable_object_cache")
-        _db_con.execute("PRAGMA threads=8")
+        with _init_lock:
+            if _db_con is None:
+                cfg = current_app.config
+                # threads / memory_limit are per database instance in DuckDB;
+                # this process hosts the writer, so it gets the writer settings
+                settings = cfg["DUCKDB_ROLE_SETTINGS"]["writer"]
+                con = duckdb.connect(
+                    database=cfg["DUCKDB_PATH"],
+                    read_only=False,
+                    config={k: str(v) for k, v in settings.items()},
+                )
+                con.execute("PRAGMA enable_object_cache")
+                _writer_con = TimedCursor(con.cursor())
+                _readers = queue.Queue()
+                for _ in range(cfg["DUCKDB_READERS"]):
+                    _readers.put(TimedCursor(con.cursor()))
+                _db_con = con
+    return _db_con
+
+
+def _attach_snapshot():
+    global _db_con, _readers, _snapshot_path, _snapshot_checked
+    cfg = current_app.config
+    now = time.monotonic()
+    if _db_con is not None and now - _snapshot_checked < cfg["SNAPSHOT_POLL_SECONDS"]:
+        return _db_con
+    from app.blueprints.ticks.snapshot import current_snapshot
+    with _init_lock:
+        _snapshot_checked = now
+        path = current_snapshot()
+        if path is None:
+            if _db_con is None:
+                raise RuntimeError("No snapshot published yet; is the ingest process running?")
+            return _db_con
+        if path != _snapshot_path:
+            settings = cfg["DUCKDB_ROLE_SETTINGS"]["reader"]
+            con = duckdb.connect(
+                database=str(path),
+                read_only=True,
+                config={k: str(v) for k, v in settings.items()},
+            )
+            readers: queue.Queue = queue.Queue()
+            for _ in range(cfg["DUCKDB_READERS"]):
+                readers.put(TimedCursor(con.cursor()))
+            # Cursors checked out from the previous snapshot finish their
+            # queries on it and are dropped when returned
+            _db_con, _readers, _snapshot_path = con, readers, path
     return _db_con
 
+
+def attached_snapshot():
+    """The snapshot file an "api" process currently reads (None in other roles)."""
+    _connect()
+    return _snapshot_path
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def get_db():
+    """
+    The cursor this thread should use: the one checked out by an enclosing
+    reader() / writer() block, else one bound to the current app context
+    (closed on teardown), else a thread-local one.
+    """
+    stack = _stack()
+    if stack:
+        return stack[-1]
+    if has_app_context():
+        con = g.get("_duckdb")
+        if con is None:
+            con = g._duckdb = TimedCursor(_connect().cursor())
+        return con
+    root = _connect()
+    owner, con = getattr(_local, "con", (None, None))
+    if owner is not root:
+        con = TimedCursor(root.cursor())
+        _local.con = (root, con)
+    return con
+
+
+@contextmanager
+def reader() -> Iterator[duckdb.DuckDBPyConnection]:
+    """Check a cursor out of the reader pool, blocking while all are busy."""
+    _connect()
+    stack = _stack()
+    if stack:
+        # Already inside reader() / writer() on this thread: reuse it
+        yield stack[-1]
+        return
+    pool = _readers
+    assert pool is not None
+    con = pool.get()
+    stack.append(con)
+    try:
+        yield con
+    finally:
+        stack.pop()
+        con.release()
+        pool.put(con)
+
+
+@contextmanager
+def writer(timeout: Optional[float] = None) -> Iterator[duckdb.DuckDBPyConnection]:
+    """
+    Hold the single writer cursor. Re-entrant within a thread. With a
+    `timeout`, raises WriterBusy instead of waiting longer than that.
+    """
+    _connect()
+    if _writer_con is None:
+        raise RuntimeError("This process serves a read-only snapshot and cannot write")
+    if not _writer_lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise WriterBusy()
+    stack = _stack()
+    stack.append(_writer_con)
+    try:
+        yield _writer_con
+    finally:
+        stack.pop()
+        if _writer_con not in stack:
+            _writer_con.release()
+        _writer_lock.release()
+
+
+def uses_reader(view):
+    """Run a view with a pooled reader cursor as its get_db()."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        with reader():
+            return view(*args, **kwargs)
+    return wrapped
+
+
 def init_extensions(app):
-    # DuckDB is lazy — nothing to do here
-    # But you can add Redis, Cache, etc. later
-    pass
+    @app.teardown_appcontext
+    def close_db(exc):
+        con = g.pop("_duckdb", None)
+        if con is not None:
+            con.close()
 
 def table_exists(table_name: str) -> bool:
     """
@@ -25,6 +227,8 @@ def table_exists(table_name: str) -> bool:
     Uses the official system catalog — this is the recommended way.
     """
     return (
-        get_db().table(table_name).fetchone()
+        get_db()
+        .execute("SELECT 1 FROM duckdb_tables() WHERE table_name = ?", [table_name])
+        .fetchone()
         is not None
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,284 @@
+# app/metrics.py
+import bisect
+import queue
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, Optional
+from flask import Flask, Response, g, jsonify, request
+
+# A small Prometheus text-format (0.0.4) implementation: counters, gauges
+# and histograms updated on the hot paths, plus collector callbacks that
+# turn existing in-memory counters into samples when /metrics is scraped.
+# Values are per process; in the split deployment scrape every process.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROWS_BUCKETS = (1, 10, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 1_000_000)
+
+# (labels, value) pairs of one metric family, as yielded by collectors
+Samples = Iterable[tuple[dict[str, Any], float]]
+Collector = Callable[[], Iterable[tuple[str, str, str, Samples]]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Iterable[tuple[str, Any]]) -> str:
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return f"{{{body}}}" if body else ""
+
+
+def _value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple, Any] = {}
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(zip(self.labelnames, k))} {_value(v)}" for k, v in items]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: Any) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: Any) -> None:
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [per-bucket counts (non-cumulative), sum, count]
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        out = []
+        for key, (counts, total, count) in items:
+            base = list(zip(self.labelnames, key))
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                out.append(f"{self.name}_bucket{_labels(base + [('le', _value(bound))])} {running}")
+            out.append(f"{self.name}_bucket{_labels(base + [('le', '+Inf')])} {count}")
+            out.append(f"{self.name}_sum{_labels(base)} {_value(total)}")
+            out.append(f"{self.name}_count{_labels(base)} {count}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._collectors: list[Collector] = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        metric = Gauge(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func: Collector) -> Collector:
+        """Register a callable yielding (name, type, help, samples) at scrape time."""
+        if func not in self._collectors:
+            self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines += metric.header() + metric.lines()
+        for func in self._collectors:
+            for name, kind, help, samples in func():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                lines += [
+                    f"{name}{_labels(labels.items())} {_value(value)}"
+                    for labels, value in samples if value is not None
+                ]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_SECONDS = registry.histogram(
+    "tickrush_http_request_duration_seconds", "Time to produce a response, by route",
+    ("endpoint", "method", "status"),
+)
+QUERY_SECONDS = registry.histogram(
+    "tickrush_duckdb_query_duration_seconds", "DuckDB execute() time, by statement type",
+    ("statement",),
+)
+FLUSH_ROWS = registry.histogram(
+    "tickrush_ingest_flush_rows", "Trades per bulk insert of the ingest buffer",
+    ("market", "symbol"), buckets=ROWS_BUCKETS,
+)
+SLOW_QUERIES = registry.counter(
+    "tickrush_duckdb_slow_queries_total", "Statements slower than SLOW_QUERY_MS",
+    ("statement",),
+)
+
+_STATEMENT = re.compile(r"^[\s(]*(\w+)")
+# Statements safe to run a second time under EXPLAIN ANALYZE
+_READ_ONLY = {"SELECT", "WITH", "FROM", "SUMMARIZE", "DESCRIBE"}
+
+
+def statement_type(sql: str) -> str:
+    match = _STATEMENT.match(sql)
+    return match.group(1).upper() if match else "OTHER"
+
+
+# ----------------------------------------------------------------------
+# Slow query profiles
+# ----------------------------------------------------------------------
+
+class SlowQueryProfiler:
+    """
+    Opt-in (SLOW_QUERY_MS > 0): statements slower than the threshold are
+    logged and kept in a ring of recent entries. Read-only ones are re-run
+    under EXPLAIN ANALYZE on a background thread with a cursor of its own, so
+    the profile costs the request nothing; the same statement is profiled at
+    most once per COOLDOWN_SECONDS.
+    """
+
+    COOLDOWN_SECONDS = 60.0
+
+    def __init__(self, keep: int = 50):
+        self.threshold = 0.0
+        self.profiles: deque[dict[str, Any]] = deque(maxlen=keep)
+        self._queue: queue.Queue = queue.Queue(maxsize=16)
+        self._last: dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, app: Flask, threshold_ms: float) -> None:
+        self.threshold = threshold_ms / 1000
+        if self.threshold > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app,), daemon=True)
+            self._thread.start()
+
+    def consider(self, sql: str, params: Any, seconds: float, statement: str) -> None:
+        if not self.threshold or seconds < self.threshold or statement == "EXPLAIN":
+            return
+        SLOW_QUERIES.inc(statement)
+        now = time.monotonic()
+        if now - self._last.get(sql, -self.COOLDOWN_SECONDS) < self.COOLDOWN_SECONDS:
+            return
+        self._last[sql] = now
+        try:
+            self._queue.put_nowait((sql, params, seconds, statement))
+        except queue.Full:
+            pass
+
+    def _run(self, app: Flask) -> None:
+        from app.extensions import get_db
+        while True:
+            sql, params, seconds, statement = self._queue.get()
+            plan = None
+            if statement in _READ_ONLY:
+                try:
+                    with app.app_context():
+                        rows = get_db().execute(f"EXPLAIN ANALYZE {sql}", params).fetchall()
+                    plan = "\n".join(str(row[-1]) for row in rows)
+                except Exception as e:
+                    plan = f"profiling failed: {e!r}"
+            self.profiles.appendleft({
+                "at": time.time(),
+                "duration_ms": seconds * 1000,
+                "statement": " ".join(sql.split()),
+                "params": repr(params)[:500],
+                "plan": plan,
+            })
+            app.logger.warning(
+                f"Slow {statement} ({seconds * 1000:.0f} ms): {' '.join(sql.split())[:300]}"
+                + (f"\n{plan}" if plan else "")
+            )
+
+
+slow_queries = SlowQueryProfiler()
+
+
+def observe_query(sql: str, params: Any, seconds: float) -> None:
+    statement = statement_type(sql)
+    QUERY_SECONDS.observe(seconds, statement)
+    slow_queries.consider(sql, params, seconds, statement)
+
+
+# ----------------------------------------------------------------------
+# Flask wiring
+# ----------------------------------------------------------------------
+
+def init_metrics(app: Flask) -> None:
+    @app.before_request
+    def start_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def record_latency(resp):
+        started = g.pop("_request_started", None)
+        if started is not None:
+            HTTP_SECONDS.observe(time.perf_counter() - started,
+                                 request.endpoint or "unmatched", request.method, resp.status_code)
+        return resp
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/metrics/slow-queries")
+    def slow_query_profiles():
+        """Recent statements over SLOW_QUERY_MS, newest first, with EXPLAIN ANALYZE plans."""
+        return jsonify({
+            "threshold_ms": slow_queries.threshold * 1000,
+            "queries": list(slow_queries.profiles),
+        })
+
+    slow_queries.start(app, app.config["SLOW_QUERY_MS"])
@@ -0,0 +1,14 @@
+# benchmarks/__init__.py
+"""
+Synthetic-data benchmarks for tickrush.
+
+    python -m benchmarks.run --rows 10M --out before.json
+    python -m benchmarks.run --rows 10M --compare before.json
+
+Trades are generated deterministically from --seed (benchmarks.data) and
+served by local stand-ins for data.binance.vision and the Binance
+websocket (benchmarks.servers), so runs need no network access. Each
+scenario runs in its own process against its own database copy under
+--workdir; the report is JSON with p50/p99 latencies, throughput and peak
+RSS per scenario.
+"""
@@ -0,0 +1,101 @@
+# benchmarks/data.py
+import hashlib
+import zipfile
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+import duckdb
+
+# Row counts selectable by name on the command line
+SIZES = {"1M": 1_000_000, "10M": 10_000_000, "100M": 100_000_000}
+
+MARKET = "binance_spot"
+SYMBOL = "ETHUSDT"
+
+# Synthetic trades start here, one every STEP_MS on average
+# (1,728,000 per day, about a busy ETHUSDT day of aggTrades)
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+START_MS = int(START.timestamp() * 1000)
+STEP_MS = 50
+ROWS_PER_DAY = 86_400_000 // STEP_MS
+
+
+def parse_rows(value: str) -> int:
+    return SIZES.get(value.upper(), None) or int(value.replace("_", ""))
+
+
+def trades_sql(lo: int, hi: int, seed: int = 42) -> str:
+    """
+    SELECT of aggTrade-shaped rows lo <= i < hi as (id, price, qty, time,
+    is_buyer_maker), `time` in epoch ms. Every column is a hash of (i, seed),
+    so any slice is reproducible on its own and generation runs in parallel.
+    Trade i lands on day i // ROWS_PER_DAY.
+    """
+    def noise(salt: int, modulo: int) -> str:
+        return f"CAST(hash(i, {seed + salt}) % {modulo} AS BIGINT)"
+
+    return f'''
+        SELECT
+            i + 1 AS id,
+            ROUND(3000 + 300 * sin(i / 7.0e6) + 25 * sin(i / 9.1e4)
+                  + ({noise(0, 2001)} - 1000) / 200.0, 2) AS price,
+            ROUND(0.0001 + {noise(1, 50000)} / 10000.0, 4) AS qty,
+            {START_MS} + i * {STEP_MS} + {noise(2, STEP_MS)} AS time,
+            {noise(3, 2)} = 0 AS is_buyer_maker
+        FROM range({lo}, {hi}) AS t(i)
+    '''
+
+
+def days_for(rows: int) -> list[date]:
+    count = -(-rows // ROWS_PER_DAY)
+    return [START.date() + timedelta(days=d) for d in range(count)]
+
+
+def load_ticks(db: duckdb.DuckDBPyConnection, table: str, rows: int, seed: int = 42) -> None:
+    """Insert `rows` synthetic trades into an existing ticks table."""
+    db.execute(f'''
+        INSERT INTO "{table}"
+        SELECT id, price, qty, epoch_ms(time), is_buyer_maker
+        FROM ({trades_sql(0, rows, seed)})
+        ORDER BY time
+    ''')
+
+
+def write_daily_archives(root: Path, rows: int, seed: int = 42) -> list[Path]:
+    """
+    Write `rows` trades as data.binance.vision daily "aggTrades" archives
+    under root/data/spot/daily/aggTrades/{SYMBOL}/, one zipped header-less
+    CSV per day, each with its .CHECKSUM file.
+    """
+    out_dir = root / "data" / "spot" / "daily" / "aggTrades" / SYMBOL
+    out_dir.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect()
+    paths = []
+    for n, day in enumerate(days_for(rows)):
+        lo, hi = n * ROWS_PER_DAY, min((n + 1) * ROWS_PER_DAY, rows)
+        name = f"{SYMBOL}-aggTrades-{day.isoformat()}"
+        csv_path = out_dir / f"{name}.csv"
+        # id, price, qty, first_id, last_id, time, is_buyer_maker, is_best_match
+        con.execute(f'''
+            COPY (
+                SELECT id, price, qty, id, id, time, is_buyer_maker, true
+                FROM ({trades_sql(lo, hi, seed)})
+                ORDER BY id
+            ) TO '{csv_path}' (HEADER false)
+        ''')
+        zip_path = out_dir / f"{name}.zip"
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+            z.write(csv_path, csv_path.name)
+        csv_path.unlink()
+        digest = hashlib.sha256(zip_path.read_bytes()).hexdigest()
+        Path(f"{zip_path}.CHECKSUM").write_text(f"{digest}  {zip_path.name}\n")
+        paths.append(zip_path)
+    con.close()
+    return paths
+
+
+def replay_rows(count: int, seed: int = 42) -> list[tuple]:
+    """(price, qty, is_buyer_maker) tuples cycled through by the replay server."""
+    con = duckdb.connect()
+    rows = con.execute(f"SELECT price, qty, is_buyer_maker FROM ({trades_sql(0, count, seed)})").fetchall()
+    con.close()
+    return rows
@@ -0,0 +1,132 @@
+# benchmarks/run.py
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from .data import parse_rows
+from .scenarios import PREPARE, SCENARIOS, peak_rss_mb
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Run tickrush benchmarks against synthetic data and local Binance stand-ins.",
+    )
+    parser.add_argument("--rows", default="1M", type=parse_rows, help="1M, 10M, 100M or a number")
+    parser.add_argument("--seed", default=42, type=int)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--workdir", default=".bench", help="generated data and scratch databases")
+    parser.add_argument("--out", help="write the JSON report here as well")
+    parser.add_argument("--compare", help="earlier JSON report to diff against")
+    parser.add_argument("--rate", default=5_000, type=int, help="live_ingest: replayed trades per second")
+    parser.add_argument("--duration", default=10.0, type=float, help="live_ingest / readers: seconds")
+    parser.add_argument("--threads", default=8, type=int, help="readers: concurrent clients")
+    parser.add_argument("--requests", default=50, type=int, help="candles: requests per interval")
+    parser.add_argument("--batch-intervals", default="1m,15m,1h",
+                        help="batch_candles: intervals of the dashboard")
+    parser.add_argument("--bars", default="tick:1000,volume:2500,dollar:7500000,range:20",
+                        help="bars: kind:threshold specs")
+    parser.add_argument("--pages", default=200, type=int, help="pagination: pages to follow")
+    parser.add_argument("--format", default="columns", help="response format requested")
+    parser.add_argument("--limit", default=1000, type=int, help="candles per request")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_child(name: str, argv: list[str]) -> dict[str, Any]:
+    """Run one scenario (or preparation step) in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", *argv, "--child", name],
+        capture_output=True, text=True,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": proc.stderr.strip().splitlines()[-1:] or [f"exit {proc.returncode}"]}
+    return json.loads(lines[-1])
+
+
+def flatten(data: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    out: dict[str, float] = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            out.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[f"{prefix}{key}"] = value
+    return out
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any]) -> None:
+    old, new = flatten(baseline["scenarios"]), flatten(current["scenarios"])
+    print(f"{'metric':60} {'baseline':>14} {'current':>14} {'change':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        change = f"{(new[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else ""
+        print(f"{key:60} {old[key]:14.2f} {new[key]:14.2f} {change:>8}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    opts = parse_args(argv)
+    os.makedirs(opts.workdir, exist_ok=True)
+
+    if opts.child:
+        func = PREPARE.get(opts.child) or SCENARIOS[opts.child][0]
+        result = func(opts)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return
+
+    import duckdb
+
+    names = [n for n in opts.scenarios.split(",") if n]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    report: dict[str, Any] = {
+        "meta": {
+            "revision": git_revision(),
+            "rows": opts.rows,
+            "seed": opts.seed,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "prepare": {},
+        "scenarios": {},
+    }
+    for name in names:
+        prepare = SCENARIOS[name][1]
+        if prepare is not None and prepare.__name__ not in report["prepare"]:
+            started = time.perf_counter()
+            report["prepare"][prepare.__name__] = {
+                **run_child(prepare.__name__, argv), "seconds": time.perf_counter() - started,
+            }
+        print(f"running {name}...", file=sys.stderr)
+        report["scenarios"][name] = run_child(name, argv)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if opts.out:
+        Path(opts.out).write_text(text)
+    if opts.compare:
+        compare(json.loads(Path(opts.compare).read_text()), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# benchmarks/scenarios.py
+import os
+import resource
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .data import (
+    MARKET, ROWS_PER_DAY, SYMBOL, START_MS, STEP_MS, days_for, load_ticks, write_daily_archives,
+)
+from .servers import ArchiveServer, ReplayServer
+
+# Every scenario runs in a process of its own (see run.py), so peak RSS is
+# the scenario's alone. Latencies are reported in ms, throughputs per second.
+
+
+def percentiles(samples: list[float]) -> dict[str, Any]:
+    """p50 / p99 / max in ms of latencies given in seconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"count": len(ordered), "p50_ms": at(0.50), "p99_ms": at(0.99), "max_ms": ordered[-1] * 1000}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_app(workdir: Path, db_path: Path):
+    os.environ.setdefault("FLASK_CONFIG", "production")
+    # Scenarios start the workers they measure themselves
+    os.environ.setdefault("BACKGROUND_SYNC", "0")
+    from app import create_app
+
+    app = create_app()
+    app.config.update(
+        DUCKDB_PATH=str(db_path),
+        ARCHIVE_PATH=str(workdir / "archive"),
+        SNAPSHOT_DIR=str(workdir / "snapshots"),
+        PROCESS_ROLE="all",
+    )
+    return app
+
+
+def _fresh(path: Path) -> Path:
+    for stale in (path, Path(f"{path}.wal")):
+        stale.unlink(missing_ok=True)
+    return path
+
+
+# ----------------------------------------------------------------------
+# Prepared inputs (cached in the work directory per rows and seed)
+# ----------------------------------------------------------------------
+
+def archives_dir(opts) -> Path:
+    return Path(opts.workdir) / f"aggtrades-checksummed-{opts.rows}-{opts.seed}"
+
+
+def base_db(opts) -> Path:
+    return Path(opts.workdir) / f"ticks-{opts.rows}-{opts.seed}.duckdb"
+
+
+def prepare_archives(opts) -> dict[str, Any]:
+    root = archives_dir(opts)
+    if not (root / ".done").exists():
+        shutil.rmtree(root, ignore_errors=True)
+        write_daily_archives(root, opts.rows, opts.seed)
+        (root / ".done").touch()
+    return {"path": str(root)}
+
+
+def prepare_db(opts) -> dict[str, Any]:
+    path = base_db(opts)
+    if not Path(f"{path}.done").exists():
+        app = make_app(Path(opts.workdir), _fresh(path))
+        from app.extensions import writer
+        from app.blueprints.ticks.storage import ensure_table, table_name
+
+        with app.app_context():
+            ensure_table(MARKET, SYMBOL)
+            with writer() as db:
+                load_ticks(db, table_name(MARKET, SYMBOL), opts.rows, opts.seed)
+                db.execute("CHECKPOINT")
+        Path(f"{path}.done").touch()
+    return {"path": str(path)}
+
+
+def _copy_of_base(opts, name: str) -> Path:
+    target = _fresh(Path(opts.workdir) / f"run-{name}.duckdb")
+    shutil.copyfile(base_db(opts), target)
+    return target
+
+
+# ----------------------------------------------------------------------
+# Scenarios
+# ----------------------------------------------------------------------
+
+def bulk_load(opts) -> dict[str, Any]:
+    """backfill_day over every day of the local archives, one at a time."""
+    workdir = Path(opts.workdir)
+    app = make_app(workdir, _fresh(workdir / "run-bulk_load.duckdb"))
+    from app.blueprints.ticks.binance import downloader
+
+    latencies: list[float] = []
+    rows = 0
+    with ArchiveServer(archives_dir(opts)) as server, app.app_context():
+        app.config["BINANCE_DATA_URL"] = server.url
+        started = time.perf_counter()
+        for day in days_for(opts.rows):
+            t = time.perf_counter()
+            rows += downloader.backfill_day(MARKET, SYMBOL, day)
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - started
+    return {"rows": rows, "seconds": elapsed, "rows_per_s": rows / elapsed, "per_day": percentiles(latencies)}
+
+
+def live_ingest(opts) -> dict[str, Any]:
+    """Replay websocket trades at --rate through StreamManager and TradeBuffer."""
+    workdir = Path(opts.workdir)
+    app = make_app(workdir, _fresh(workdir / "run-live_ingest.duckdb"))
+    from app.blueprints.ticks.binance.stream import StreamManager
+    from app.blueprints.ticks.ingest import trade_buffer
+
+    # Lag of the newest written trade behind wall clock, sampled every 50 ms
+    lags: list[float] = []
+    with ReplayServer(opts.rate, seed=opts.seed) as server, app.app_context():
+        trade_buffer.start(app)
+        manager = StreamManager({MARKET: [SYMBOL]}, trade_buffer.put, {MARKET: server.url})
+        manager.start()
+        deadline = time.monotonic() + opts.duration
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            written = trade_buffer.written_through(MARKET, SYMBOL)
+            if written is not None:
+                lags.append(max(0.0, time.time() - written / 1000))
+        manager.stop()
+        sent = server.sent
+    stats = trade_buffer.stats().get(f"{MARKET}:{SYMBOL}", {})
+    return {
+        "rate": opts.rate,
+        "seconds": opts.duration,
+        "sent": sent,
+        "received": stats.get("received", 0),
+        "written": stats.get("flushed", 0),
+        "dropped": stats.get("dropped", 0),
+        "rows_per_s": stats.get("flushed", 0) / opts.duration,
+        "ingest_lag": percentiles(lags),
+    }
+
+
+def candles(opts) -> dict[str, Any]:
+    """Cold materialization, then repeated requests (cache off), per interval."""
+    app = make_app(Path(opts.workdir), _copy_of_base(opts, "candles"))
+    from app.blueprints.ticks.cache import candle_cache
+    from app.blueprints.ticks.candles import INTERVALS
+
+    candle_cache.max_bytes = 0
+    client = app.test_client()
+    out: dict[str, Any] = {}
+    for interval in INTERVALS:
+        url = f"/api/build-candles/{interval}?format={opts.format}&limit={opts.limit}"
+        t = time.perf_counter()
+        client.get(url)
+        cold = time.perf_counter() - t
+        latencies = []
+        for _ in range(opts.requests):
+            t = time.perf_counter()
+            resp = client.get(url)
+            latencies.append(time.perf_counter() - t)
+        out[interval] = {"cold_ms": cold * 1000, "bytes": len(resp.data), **percentiles(latencies)}
+    return out
+
+
+def batch_candles(opts) -> dict[str, Any]:
+    """A dashboard of --batch-intervals: one /api/batch-candles request vs one request per interval."""
+    app = make_app(Path(opts.workdir), _copy_of_base(opts, "batch_candles"))
+    from app.blueprints.ticks.cache import candle_cache
+
+    candle_cache.max_bytes = 0
+    client = app.test_client()
+    intervals = opts.batch_intervals.split(",")
+    batch_url = f"/api/batch-candles?symbols={SYMBOL}&intervals={','.join(intervals)}&limit={opts.limit}"
+    single_urls = [f"/api/build-candles/{i}?symbol={SYMBOL}&format=columns&limit={opts.limit}" for i in intervals]
+
+    t = time.perf_counter()
+    client.get(batch_url)
+    cold = time.perf_counter() - t
+    batched, separate = [], []
+    for _ in range(opts.requests):
+        t = time.perf_counter()
+        client.get(batch_url)
+        batched.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        for url in single_urls:
+            client.get(url)
+        separate.append(time.perf_counter() - t)
+    return {
+        "intervals": len(intervals),
+        "cold_ms": cold * 1000,
+        "batch": percentiles(batched),
+        "separate": percentiles(separate),
+    }
+
+
+def bars(opts) -> dict[str, Any]:
+    """Per --bars spec: cold build, repeated requests (cache off), then extending by new trades."""
+    app = make_app(Path(opts.workdir), _copy_of_base(opts, "bars"))
+    from app.blueprints.ticks.bars import materialize_bars, parse_threshold
+    from app.blueprints.ticks.cache import candle_cache
+    from app.blueprints.ticks.storage import insert_trades
+
+    candle_cache.max_bytes = 0
+    client = app.test_client()
+    next_id = opts.rows + 1
+    out: dict[str, Any] = {}
+    for spec in opts.bars.split(","):
+        kind, threshold = spec.split(":")
+        url = f"/api/build-bars/{kind}?threshold={threshold}&format={opts.format}&limit={opts.limit}"
+        t = time.perf_counter()
+        client.get(url)
+        cold = time.perf_counter() - t
+        latencies = []
+        for _ in range(opts.requests):
+            t = time.perf_counter()
+            resp = client.get(url)
+            latencies.append(time.perf_counter() - t)
+        # Live-like batches after the preloaded trades, each followed by an update
+        updates = []
+        with app.app_context():
+            for _ in range(10):
+                now_ms = START_MS + next_id * STEP_MS
+                batch = [
+                    {"a": next_id + k, "p": "3000.00", "q": "0.5", "T": now_ms + k, "m": k % 2 == 0}
+                    for k in range(1_000)
+                ]
+                insert_trades(MARKET, SYMBOL, batch)  # type: ignore
+                next_id += len(batch)
+                t = time.perf_counter()
+                materialize_bars(MARKET, SYMBOL, kind, parse_threshold(kind, threshold))
+                updates.append(time.perf_counter() - t)
+        out[spec] = {
+            "cold_ms": cold * 1000, "bytes": len(resp.data), **percentiles(latencies),
+            "update": percentiles(updates),
+        }
+    return out
+
+
+def pagination(opts) -> dict[str, Any]:
+    """Follow next-page cursors --pages deep from the newest trade."""
+    app = make_app(Path(opts.workdir), _copy_of_base(opts, "pagination"))
+    client = app.test_client()
+    url = f"/ticks/{MARKET}/{SYMBOL.lower()}?format={opts.format}"
+    latencies = []
+    cursor = None
+    for _ in range(opts.pages):
+        t = time.perf_counter()
+        resp = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        latencies.append(time.perf_counter() - t)
+        cursor = resp.get_json()["pagination"].get("next_cursor")
+        if cursor is None:
+            break
+    return {"pages": len(latencies), "last_page_ms": latencies[-1] * 1000, **percentiles(latencies)}
+
+
+def readers(opts) -> dict[str, Any]:
+    """--threads clients mixing candle and tick requests while trades are inserted."""
+    app = make_app(Path(opts.workdir), _copy_of_base(opts, "readers"))
+    from app.blueprints.ticks.cache import candle_cache
+    from app.blueprints.ticks.candles import materialize_candles
+    from app.blueprints.ticks.storage import insert_trades
+
+    candle_cache.max_bytes = 0
+    with app.app_context():
+        materialize_candles(MARKET, SYMBOL, "1m")
+
+    urls = [
+        f"/api/build-candles/1m?format={opts.format}&limit={opts.limit}",
+        f"/ticks/{MARKET}/{SYMBOL.lower()}?format={opts.format}",
+    ]
+    stop = threading.Event()
+    latencies: list[float] = []
+    inserted = [0]
+
+    def reader(n: int) -> None:
+        client = app.test_client()
+        i = n
+        while not stop.is_set():
+            t = time.perf_counter()
+            client.get(urls[i % len(urls)])
+            latencies.append(time.perf_counter() - t)
+            i += 1
+
+    def writer() -> None:
+        # Live-like batches continuing after the preloaded trades
+        next_id = opts.rows + 1
+        with app.app_context():
+            while not stop.is_set():
+                now_ms = max(int(time.time() * 1000), START_MS + opts.rows * STEP_MS)
+                batch = [
+                    {"a": next_id + k, "p": "3000.00", "q": "0.5", "T": now_ms + k, "m": k % 2 == 0}
+                    for k in range(2_000)
+                ]
+                insert_trades(MARKET, SYMBOL, batch)  # type: ignore
+                next_id += len(batch)
+                inserted[0] += len(batch)
+                time.sleep(0.25)
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(opts.threads)]
+    threads.append(threading.Thread(target=writer))
+    for th in threads:
+        th.start()
+    time.sleep(opts.duration)
+    stop.set()
+    for th in threads:
+        th.join()
+    return {
+        "threads": opts.threads,
+        "seconds": opts.duration,
+        "requests_per_s": len(latencies) / opts.duration,
+        "rows_inserted": inserted[0],
+        **percentiles(latencies),
+    }
+
+
+# name -> (function, prepared input it needs)
+SCENARIOS = {
+    "bulk_load": (bulk_load, prepare_archives),
+    "live_ingest": (live_ingest, None),
+    "candles": (candles, prepare_db),
+    "batch_candles": (batch_candles, prepare_db),
+    "bars": (bars, prepare_db),
+    "pagination": (pagination, prepare_db),
+    "readers": (readers, prepare_db),
+}
+PREPARE = {"prepare_archives": prepare_archives, "prepare_db": prepare_db}
@@ -0,0 +1,123 @@
+# benchmarks/servers.py
+import asyncio
+import functools
+import json
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+import websockets
+
+from .data import replay_rows
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ArchiveServer:
+    """
+    Serves a directory laid out like data.binance.vision (see
+    data.write_daily_archives) over HTTP on 127.0.0.1.
+    """
+
+    def __init__(self, root: Path, port: int = 0):
+        handler = functools.partial(_QuietHandler, directory=str(root))
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "ArchiveServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ReplayServer:
+    """
+    Binance combined-stream stand-in: every client of /stream?streams=...
+    receives aggTrade messages for its streams at `rate` messages per second
+    in total, stamped with the current time. Ids keep increasing across
+    messages so nothing is de-duplicated away.
+    """
+
+    TICK_SECONDS = 0.01
+
+    def __init__(self, rate: int, port: int = 0, seed: int = 42):
+        self.rate = rate
+        self.port = port
+        self.sent = 0
+        self._rows = replay_rows(100_000, seed)
+        self._next_id = 1
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/stream"
+
+    async def _handler(self, ws) -> None:
+        path = getattr(ws, "path", None) or ws.request.path
+        streams = parse_qs(urlparse(path).query).get("streams", [""])[0].split("/")
+        symbols = [s.split("@")[0].upper() for s in streams if s]
+        owed = 0.0
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.TICK_SECONDS)
+            now = time.monotonic()
+            owed += (now - last) * self.rate
+            last = now
+            now_ms = int(time.time() * 1000)
+            for _ in range(int(owed)):
+                price, qty, maker = self._rows[self._next_id % len(self._rows)]
+                symbol = symbols[self._next_id % len(symbols)]
+                trade_id = self._next_id
+                self._next_id += 1
+                await ws.send(json.dumps({
+                    "stream": f"{symbol.lower()}@aggTrade",
+                    "data": {
+                        "e": "aggTrade", "E": now_ms, "s": symbol, "a": trade_id,
+                        "p": f"{price:.2f}", "q": f"{qty:.4f}", "f": trade_id, "l": trade_id,
+                        "T": now_ms, "m": maker, "M": True,
+                    },
+                }))
+                self.sent += 1
+            owed -= int(owed)
+
+    async def _serve(self) -> None:
+        async with websockets.serve(self._handler, "127.0.0.1", self.port) as server:
+            self.port = next(iter(server.sockets)).getsockname()[1]
+            self._ready.set()
+            await asyncio.Future()
+
+    def __enter__(self) -> "ReplayServer":
+        self._loop = asyncio.new_event_loop()
+
+        def target() -> None:
+            assert self._loop is not None
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self._serve())
+            except RuntimeError:
+                pass  # loop stopped on exit
+
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -18,4 +18,138 @@ class BaseConfig:
         f"duckdb:///{BASE_DIR / 'instance' / 'app.duckdb'}"
     )
 
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
\ No newline at end of file
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+    # Binance combined-stream websocket endpoints (point at a local stand-in for testing)
+    BINANCE_WS_URLS = {
+        "binance_spot": os.getenv("BINANCE_SPOT_WS_URL", "wss://stream.binance.com:9443/stream"),
+        "binance_futures": os.getenv("BINANCE_FUTURES_WS_URL", "wss://fstream.binance.com/stream"),
+    }
+
+    # aggTrades REST endpoints the gap repair pages through (fromId)
+    BINANCE_REST_URLS = {
+        "binance_spot": os.getenv("BINANCE_SPOT_REST_URL", "https://api.binance.com/api/v3/aggTrades"),
+        "binance_futures": os.getenv("BINANCE_FUTURES_REST_URL", "https://fapi.binance.com/fapi/v1/aggTrades"),
+    }
+
+    # Historical archive backfill. Archives are fetched from
+    # BINANCE_DATA_URL (a mirror or a local file server with the same layout)
+    BINANCE_DATA_URL = os.getenv("BINANCE_DATA_URL", "https://data.binance.vision")
+    BACKFILL_START_DATE = os.getenv("BACKFILL_START_DATE", "2024-01-01")
+    BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+
+    # Gap repair: every REPAIR_INTERVAL_SECONDS the holes in each stream's
+    # aggTrade id coverage are fetched, up to REPAIR_REST_MAX_IDS missing ids
+    # over REST, larger ones from the daily archives
+    REPAIR_INTERVAL_SECONDS = float(os.getenv("REPAIR_INTERVAL_SECONDS", "300"))
+    REPAIR_REST_MAX_IDS = int(os.getenv("REPAIR_REST_MAX_IDS", "50000"))
+    # REST budget per market and repair cycle: request weight (aggTrades
+    # costs 2 on spot, 20 on futures; Binance allows 6000 / 2400 per minute
+    # and IP) and number of requests. 429/418 responses pause REST repair
+    # for their Retry-After.
+    REPAIR_REST_WEIGHT = int(os.getenv("REPAIR_REST_WEIGHT", "1000"))
+    REPAIR_REST_MAX_REQUESTS = int(os.getenv("REPAIR_REST_MAX_REQUESTS", "200"))
+
+    # /api/update-ticks-data jobs: threads loading archives in the background
+    # and how many jobs may wait for one before requests are turned away
+    INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+    INGEST_JOB_QUEUE = int(os.getenv("INGEST_JOB_QUEUE", "16"))
+
+    # Create new ticks tables without a PRIMARY KEY on id: live inserts are
+    # de-duplicated against a per-stream high-water id, bulk loads against
+    # the ids of the range they cover, and the hourly maintenance run checks
+    # for duplicates. Existing tables keep the schema they were created with.
+    TICKS_APPEND_ONLY = os.getenv("TICKS_APPEND_ONLY", "0").lower() in ("1", "true", "yes")
+
+    # Compact layout for new ticks tables (`python manage.py compact-ticks`
+    # converts existing ones): price / qty as DECIMAL(18, scale) with
+    # per-symbol "SYMBOL=price_scale:qty_scale" (others use 8:8), closed days
+    # re-sorted by time in the hourly maintenance run.
+    TICKS_COMPACT = os.getenv("TICKS_COMPACT", "0").lower() in ("1", "true", "yes")
+    TICK_DECIMALS = {
+        symbol: tuple(int(n) for n in scales.split(":"))
+        for symbol, scales in (
+            item.split("=") for item in
+            os.getenv("TICK_DECIMALS", "BTCUSDT=2:5,ETHUSDT=2:4").split(",") if item
+        )
+    }
+
+    # Days of ticks kept in the DuckDB table; older days live in the Parquet
+    # archive under ARCHIVE_PATH (defaults to instance/archive)
+    HOT_DAYS = int(os.getenv("HOT_DAYS", "7"))
+
+    # DuckDB. threads / memory_limit apply to a whole database instance, so
+    # they are set per process role: "writer" for the process that owns the
+    # database file (ingest, backfill, materialization), "reader" for
+    # processes that only serve queries.
+    DUCKDB_ROLE_SETTINGS = {
+        "writer": {
+            "threads": int(os.getenv("DUCKDB_WRITER_THREADS", "8")),
+            "memory_limit": os.getenv("DUCKDB_WRITER_MEMORY_LIMIT", "4GB"),
+        },
+        "reader": {
+            "threads": int(os.getenv("DUCKDB_READER_THREADS", "4")),
+            "memory_limit": os.getenv("DUCKDB_READER_MEMORY_LIMIT", "2GB"),
+        },
+    }
+    # Cursors in the API reader pool; more concurrent requests wait for one
+    DUCKDB_READERS = int(os.getenv("DUCKDB_READERS", "8"))
+    # How long a candle request waits for the writer before serving the
+    # candles materialized so far
+    MATERIALIZE_WAIT_SECONDS = float(os.getenv("MATERIALIZE_WAIT_SECONDS", "0.05"))
+    # Non-time bars: every (stream, kind, threshold) asked for is a table of
+    # its own, built over the stream's whole history. Requests that would
+    # create more get a 409.
+    MAX_BAR_TABLES = int(os.getenv("MAX_BAR_TABLES", "32"))
+
+    # Deployment role of this process:
+    #   "all"    - one process serves the API and runs ingestion (development)
+    #   "ingest" - `python manage.py ingest`: owns app.duckdb, runs the
+    #              websocket/backfill/archive workers and publishes snapshots
+    #   "api"    - gunicorn workers: read-only on the latest snapshot, no
+    #              background workers, no writes
+    PROCESS_ROLE = os.getenv("PROCESS_ROLE", "all")
+    # Whether an "all" process starts the ingestion workers when the ticks
+    # blueprint is registered. manage.py commands and the benchmarks turn it
+    # off and start what they need themselves.
+    BACKGROUND_SYNC = os.getenv("BACKGROUND_SYNC", "1").lower() in ("1", "true", "yes")
+    # Snapshots land in SNAPSHOT_DIR (defaults to instance/snapshots). Data
+    # served by "api" workers is at most
+    #   SNAPSHOT_SECONDS + one candle refresh and copy + SNAPSHOT_POLL_SECONDS
+    # old (about 35s with the defaults and a week of hot ticks).
+    SNAPSHOT_SECONDS = float(os.getenv("SNAPSHOT_SECONDS", "30"))
+    SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "2"))
+
+    # Byte budget of the in-memory cache of serialized candle responses
+    CANDLE_CACHE_BYTES = int(os.getenv("CANDLE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+    # Intervals kept as forming candles in memory and pushed over
+    # /api/live-candles/<interval> every LIVE_PUSH_SECONDS (when changed)
+    LIVE_INTERVALS = os.getenv("LIVE_INTERVALS", "1m,5m,15m,1h").split(",")
+    LIVE_PUSH_SECONDS = float(os.getenv("LIVE_PUSH_SECONDS", "0.25"))
+    # The forming candles live in the process reading the websockets: "all",
+    # or "ingest", which serves only /api/live-candles/ on
+    # LIVE_HTTP_HOST:LIVE_HTTP_PORT (0 = off). "api" workers redirect there
+    # when LIVE_CANDLES_URL (its public base URL) is set; better, route
+    # /api/live-candles/ to it in the proxy in front of them.
+    LIVE_HTTP_HOST = os.getenv("LIVE_HTTP_HOST", "127.0.0.1")
+    LIVE_HTTP_PORT = int(os.getenv("LIVE_HTTP_PORT", "5001"))
+    LIVE_CANDLES_URL = os.getenv("LIVE_CANDLES_URL", "")
+
+    # Price tick of the per-minute footprint table, per symbol (others use
+    # 1e-8, the finest Binance price step). It must be no coarser than the
+    # symbol's price step on every market: candle clusters are re-binned
+    # from the footprint, and a coarser tick rounds prices twice, unlike
+    # bars and live candles, which bin raw prices.
+    # Override with e.g. FOOTPRINT_TICK_SIZES="BTCUSDT=0.01,ETHUSDT=0.01"
+    FOOTPRINT_TICK_SIZES = {
+        symbol: float(tick)
+        for symbol, tick in (
+            item.split("=") for item in
+            os.getenv("FOOTPRINT_TICK_SIZES", "BTCUSDT=0.01,ETHUSDT=0.01").split(",") if item
+        )
+    }
+
+    # Statements slower than this (ms) are logged and listed, with EXPLAIN
+    # ANALYZE plans for read-only ones, at /metrics/slow-queries. 0 = off.
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
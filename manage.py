@@ -1,8 +1,57 @@
+import os
+
+# Commands start the workers they need themselves (see `ingest`)
+os.environ.setdefault("BACKGROUND_SYNC", "0")
+
 from app import create_app
 from flask.cli import FlaskGroup
+import click
 
 app = create_app()
 cli = FlaskGroup(create_app=create_app)
 
+
+@cli.command("ingest")
+def ingest():
+    """
+    Run ingestion as the single process owning app.duckdb: websocket
+    streams, archive backfill, compaction and snapshot publishing, plus the
+    live candle stream (/api/live-candles/) on LIVE_HTTP_PORT. Serve the
+    API separately with PROCESS_ROLE=api, e.g.
+
+        PROCESS_ROLE=api gunicorn -w 8 run:app
+    """
+    import time
+    from flask import current_app
+    from app.blueprints.ticks.tasks import start_background_sync
+
+    current_app.config["PROCESS_ROLE"] = "ingest"
+    start_background_sync()
+    while True:
+        time.sleep(3600)
+
+@cli.command("compact-ticks")
+@click.option("--market", "markets", multiple=True, help="Limit to these markets")
+@click.option("--symbol", "symbols", multiple=True, help="Limit to these symbols")
+@click.option("--force", is_flag=True, help="Convert even if the scales round stored values")
+def compact_ticks(markets, symbols, force):
+    """
+    Convert ticks tables to the compact layout (DECIMAL price / qty with
+    the TICK_DECIMALS scales, rows in time order) and print on-disk size and
+    scan times before and after. Stop the ingest process first: it holds
+    the database file.
+    """
+    import json
+    from app.blueprints.ticks.layout import migrate_table
+    from app.blueprints.ticks.tasks import SYMBOLS
+
+    for market, market_symbols in SYMBOLS.items():
+        if markets and market not in markets:
+            continue
+        for symbol in market_symbols:
+            if symbols and symbol not in (s.upper() for s in symbols):
+                continue
+            click.echo(json.dumps(migrate_table(market, symbol, force=force), indent=2, default=str))
+
 if __name__ == "__main__":
     cli()
\ No newline at end of file
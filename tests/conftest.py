@@ -0,0 +1,97 @@
+# tests/conftest.py
+import hashlib
+import io
+import os
+import zipfile
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+# Read by config at import time: no background workers in tests
+os.environ.setdefault("FLASK_CONFIG", "testing")
+os.environ["BACKGROUND_SYNC"] = "0"
+
+from app import create_app  # noqa: E402
+from app.extensions import writer  # noqa: E402
+from app.blueprints.ticks.backfill import JOBS_TABLE, ensure_jobs_table  # noqa: E402
+from benchmarks.servers import ArchiveServer  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # DuckDB is opened once per process: every test shares this database,
+    # so tests keep apart by using symbols of their own
+    workdir = tmp_path_factory.mktemp("tickrush")
+    app = create_app()
+    app.config.update(
+        DUCKDB_PATH=str(workdir / "test.duckdb"),
+        ARCHIVE_PATH=str(workdir / "archive"),
+        SNAPSHOT_DIR=str(workdir / "snapshots"),
+        PROCESS_ROLE="all",
+    )
+    return app
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def archives(app, tmp_path):
+    """A local data.binance.vision stand-in; BINANCE_DATA_URL points at it."""
+    with ArchiveServer(tmp_path) as server:
+        previous = app.config["BINANCE_DATA_URL"]
+        app.config["BINANCE_DATA_URL"] = server.url
+        with app.app_context():
+            # run_backfill retries every stream's failed days: start each
+            # test from an empty job table
+            ensure_jobs_table()
+            with writer() as db:
+                db.execute(f'DELETE FROM "{JOBS_TABLE}"')
+            yield ArchiveWriter(tmp_path)
+        app.config["BINANCE_DATA_URL"] = previous
+
+
+def day_trades(day: date, count: int = 10) -> list[tuple]:
+    """aggTrades archive rows of one day, ids unique across days."""
+    base_ms = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+    first_id = (day - date(2020, 1, 1)).days * 1000 + 1
+    # id, price, qty, first_id, last_id, time, is_buyer_maker, is_best_match
+    return [
+        (first_id + i, 100.0 + i, 1.0, first_id + i, first_id + i, base_ms + i * 1000, i % 2 == 0, True)
+        for i in range(count)
+    ]
+
+
+class ArchiveWriter:
+    """Writes spot aggTrades archives, with their .CHECKSUM, under a served root."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def write(self, symbol: str, period: str, stamp: str, rows: list[tuple],
+              checksum: Optional[str] = None) -> None:
+        out_dir = self.root / "data" / "spot" / period / "aggTrades" / symbol
+        out_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{symbol}-aggTrades-{stamp}"
+        csv = "".join(
+            ",".join(str(v).lower() if isinstance(v, bool) else str(v) for v in row) + "\n"
+            for row in rows
+        )
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as z:
+            z.writestr(f"{name}.csv", csv)
+        (out_dir / f"{name}.zip").write_bytes(buf.getvalue())
+        digest = checksum or hashlib.sha256(buf.getvalue()).hexdigest()
+        (out_dir / f"{name}.zip.CHECKSUM").write_text(f"{digest}  {name}.zip\n")
+
+    def daily(self, symbol: str, day: date, **kwargs) -> None:
+        self.write(symbol, "daily", day.isoformat(), day_trades(day), **kwargs)
+
+    def monthly(self, symbol: str, days: list[date], **kwargs) -> None:
+        rows = [row for day in days for row in day_trades(day)]
+        self.write(symbol, "monthly", days[0].strftime("%Y-%m"), rows, **kwargs)
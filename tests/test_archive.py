@@ -0,0 +1,45 @@
+# tests/test_archive.py
+from datetime import date, datetime, timezone
+
+from app.extensions import get_db
+from app.blueprints.ticks.archive import compact_day, partition_file, _sql_path
+from app.blueprints.ticks.candles import candles_table_name, materialize_candles
+from app.blueprints.ticks.storage import insert_missing_trades, insert_trades
+
+MARKET = "binance_spot"
+DAY = date(2026, 1, 1)
+DAY_MS = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def trade(trade_id: int) -> dict:
+    return {"a": trade_id, "p": "100.0", "q": "1.0", "T": DAY_MS + trade_id * 1000, "m": False}
+
+
+def day_volume(symbol: str, interval: str) -> float:
+    materialize_candles(MARKET, symbol, interval)
+    return get_db().execute(f'''
+        SELECT SUM(volume) FROM "{candles_table_name(MARKET, symbol, interval)}"
+        WHERE open_time >= ? AND open_time < ?
+    ''', [datetime(2026, 1, 1), datetime(2026, 1, 2)]).fetchone()[0]
+
+
+def test_late_trades_on_an_archived_day_reach_the_candles(ctx):
+    symbol = "LATEARCHUSDT"
+    insert_trades(MARKET, symbol, [trade(1), trade(7)])
+    compact_day(MARKET, symbol, DAY)
+    assert day_volume(symbol, "1d") == 2.0
+    assert day_volume(symbol, "1m") == 2.0
+
+    # Gap repair writes the missing ids into the day already archived
+    insert_missing_trades(MARKET, symbol, [trade(i) for i in range(2, 7)])
+    assert day_volume(symbol, "1d") == 7.0
+    assert day_volume(symbol, "1m") == 7.0
+
+    # Compacting again merges them into the partition, without counting twice
+    compact_day(MARKET, symbol, DAY)
+    archived = get_db().execute(
+        f"SELECT COUNT(*), SUM(qty) FROM read_parquet('{_sql_path(partition_file(MARKET, symbol, DAY))}')"
+    ).fetchone()
+    assert archived == (7, 7.0)
+    assert day_volume(symbol, "1d") == 7.0
+    assert day_volume(symbol, "1m") == 7.0
@@ -0,0 +1,166 @@
+# tests/test_backfill.py
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from app.extensions import get_db, table_exists, writer
+from app.blueprints.ticks import backfill, jobs
+from app.blueprints.ticks.backfill import JOBS_TABLE, plan_downloads, plan_jobs, run_backfill
+from app.blueprints.ticks.storage import table_name
+
+MARKET = "binance_spot"
+
+
+def month_days(first: date) -> list[date]:
+    last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Archive URLs run_backfill downloads, in order."""
+    urls: list[str] = []
+    download = backfill._download
+
+    def recording(url, *args):
+        urls.append(url)
+        return download(url, *args)
+
+    monkeypatch.setattr(backfill, "_download", recording)
+    return urls
+
+
+def day_states(symbol: str) -> dict[date, tuple[str, int]]:
+    return {
+        day: (state, attempts) for day, state, attempts in get_db().execute(f'''
+            SELECT day, state, attempts FROM "{JOBS_TABLE}" WHERE market = ? AND symbol = ?
+        ''', [MARKET, symbol]).fetchall()
+    }
+
+
+def set_state(symbol: str, day: date, state: str) -> None:
+    with writer() as db:
+        db.execute(f'''
+            UPDATE "{JOBS_TABLE}" SET state = ?, attempts = attempts + 1
+            WHERE market = ? AND symbol = ? AND day = ?
+        ''', [state, MARKET, symbol, day])
+
+
+def stored_rows(symbol: str) -> int:
+    table = table_name(MARKET, symbol)
+    if not table_exists(table):
+        return 0
+    return get_db().execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def test_plan_downloads_picks_monthly_only_for_whole_untried_months():
+    february = month_days(date(2024, 2, 1))
+    march = month_days(date(2024, 3, 1))
+    jobs = [(MARKET, "ETHUSDT", day, 0) for day in february]
+    # March: the 1st was tried before, so the month goes day by day
+    jobs += [(MARKET, "ETHUSDT", day, 1 if day.day == 1 else 0) for day in march]
+    # April: only part of the month is runnable
+    jobs += [(MARKET, "ETHUSDT", date(2024, 4, 10), 0)]
+
+    plan = plan_downloads(jobs)
+
+    assert plan[0] == (MARKET, "ETHUSDT", "monthly", date(2024, 2, 1), february)
+    assert [d[2] for d in plan[1:]] == ["daily"] * (len(march) + 1)
+    assert [d[4] for d in plan[1:]] == [[day] for day in march] + [[date(2024, 4, 10)]]
+
+
+def test_whole_month_loads_from_monthly_archive(archives, fetched):
+    symbol = "MONTHUSDT"
+    days = month_days(date(2024, 2, 1))
+    archives.monthly(symbol, days)
+    for day in days:
+        archives.daily(symbol, day)
+
+    run_backfill({MARKET: [symbol]}, days[0], workers=2, end=days[-1])
+
+    assert [url.rsplit("/", 1)[1] for url in fetched] == [f"{symbol}-aggTrades-2024-02.zip"]
+    assert set(day_states(symbol).values()) == {("loaded", 1)}
+    assert stored_rows(symbol) == 10 * len(days)
+
+
+def test_partial_month_loads_from_daily_archives(archives, fetched):
+    symbol = "DAILYUSDT"
+    days = [date(2024, 2, 27), date(2024, 2, 28), date(2024, 2, 29)]
+    archives.monthly(symbol, month_days(date(2024, 2, 1)))
+    for day in days:
+        archives.daily(symbol, day)
+
+    run_backfill({MARKET: [symbol]}, days[0], workers=2, end=days[-1])
+
+    assert sorted(url.rsplit("/", 1)[1] for url in fetched) == [
+        f"{symbol}-aggTrades-{day.isoformat()}.zip" for day in days
+    ]
+    assert stored_rows(symbol) == 10 * len(days)
+
+
+def test_missing_monthly_archive_falls_back_to_daily(archives, fetched):
+    symbol = "FALLBACKUSDT"
+    days = month_days(date(2024, 2, 1))
+    for day in days:
+        archives.daily(symbol, day)
+
+    run_backfill({MARKET: [symbol]}, days[0], workers=2, end=days[-1])
+
+    assert len(fetched) == 1 and "/monthly/" in fetched[0]
+    assert set(day_states(symbol).values()) == {("failed", 1)}
+    assert stored_rows(symbol) == 0
+
+    run_backfill({MARKET: [symbol]}, days[0], workers=2, end=days[-1])
+
+    assert len(fetched) == 1 + len(days)
+    assert all("/daily/" in url for url in fetched[1:])
+    assert set(day_states(symbol).values()) == {("loaded", 2)}
+    assert stored_rows(symbol) == 10 * len(days)
+
+
+def test_checksum_mismatch_loads_nothing(archives, fetched):
+    symbol = "CORRUPTUSDT"
+    good, bad = date(2024, 2, 27), date(2024, 2, 28)
+    archives.daily(symbol, good)
+    archives.daily(symbol, bad, checksum="0" * 64)
+
+    run_backfill({MARKET: [symbol]}, good, workers=2, end=bad)
+
+    states = day_states(symbol)
+    assert states[good] == ("loaded", 1)
+    assert states[bad] == ("failed", 1)
+    error = get_db().execute(f'''
+        SELECT error FROM "{JOBS_TABLE}" WHERE market = ? AND symbol = ? AND day = ?
+    ''', [MARKET, symbol, bad]).fetchone()[0]
+    assert "ChecksumMismatch" in error
+    # Only the good day's trades were stored
+    assert stored_rows(symbol) == 10
+
+
+def test_ingest_job_waits_for_days_another_run_is_loading(app, archives, monkeypatch):
+    symbol = "JOBUSDT"
+    days = month_days(date(2024, 2, 1))
+    for day in days:
+        archives.daily(symbol, day)
+    # The historical backfill holds one day of the month
+    busy = date(2024, 2, 10)
+    plan_jobs(MARKET, symbol, days[0], days[-1])
+    set_state(symbol, busy, "downloading")
+    monkeypatch.setattr(jobs, "WAIT_POLL_SECONDS", 0.05)
+
+    def other_run():
+        time.sleep(0.5)
+        with app.app_context():
+            set_state(symbol, busy, "loaded")
+
+    other = threading.Thread(target=other_run)
+    other.start()
+    job, _ = jobs.ingest_jobs.submit(MARKET, symbol, "2024-02")
+    while job.state in ("queued", "running"):
+        time.sleep(0.05)
+    other.join()
+
+    assert job.state == "done", job.error
+    assert job.rows_loaded == 10 * (len(days) - 1)
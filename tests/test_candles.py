@@ -0,0 +1,43 @@
+# tests/test_candles.py
+from datetime import datetime, timezone
+
+from app.extensions import get_db
+from app.blueprints.ticks.candles import candles_table_name, materialize_intervals
+from app.blueprints.ticks.storage import insert_trades
+
+MARKET = "binance_spot"
+HOUR_MS = int(datetime(2026, 2, 1, 10, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def trade(trade_id: int, minute: int, price: str) -> dict:
+    return {"a": trade_id, "p": price, "q": "1.0", "T": HOUR_MS + minute * 60_000, "m": False}
+
+
+def candle(symbol: str, interval: str, open_time: datetime):
+    return get_db().execute(f'''
+        SELECT low, volume FROM "{candles_table_name(MARKET, symbol, interval)}"
+        WHERE open_time = ?
+    ''', [open_time]).fetchone()
+
+
+def test_older_trade_rewinds_the_candles(ctx):
+    symbol = "REWINDUSDT"
+    intervals = ["1m", "5m", "1h"]
+    insert_trades(MARKET, symbol, [trade(1, 30, "100.0"), trade(2, 40, "101.0"), trade(3, 50, "102.0")])
+    materialize_intervals(MARKET, symbol, intervals)
+    assert candle(symbol, "1m", datetime(2026, 2, 1, 10, 2)) is None
+    assert candle(symbol, "5m", datetime(2026, 2, 1, 10, 0)) is None
+    assert candle(symbol, "1h", datetime(2026, 2, 1, 10)) == (100.0, 3.0)
+
+    # A trade older than every candle already written
+    insert_trades(MARKET, symbol, [trade(4, 2, "90.0")])
+    materialize_intervals(MARKET, symbol, intervals)
+
+    assert candle(symbol, "1m", datetime(2026, 2, 1, 10, 2)) == (90.0, 1.0)
+    assert candle(symbol, "5m", datetime(2026, 2, 1, 10, 0)) == (90.0, 1.0)
+    assert candle(symbol, "1h", datetime(2026, 2, 1, 10)) == (90.0, 4.0)
+    # Buckets after the late trade are rebuilt, not duplicated
+    assert candle(symbol, "1m", datetime(2026, 2, 1, 10, 30)) == (100.0, 1.0)
+    assert get_db().execute(f'''
+        SELECT COUNT(*), SUM(volume) FROM "{candles_table_name(MARKET, symbol, "1m")}"
+    ''').fetchone() == (4, 4.0)
@@ -0,0 +1,24 @@
+# tests/test_coverage.py
+import pytest
+
+from app.blueprints.ticks.coverage import find_gaps
+from app.blueprints.ticks.storage import insert_trades
+
+MARKET = "binance_spot"
+BASE_MS = 1_735_689_600_000  # 2025-01-01
+
+
+def trade(trade_id: int, price: str = "100.0") -> dict:
+    return {"a": trade_id, "p": price, "q": "1.0", "T": BASE_MS + trade_id * 1000, "m": False}
+
+
+def test_failed_insert_leaves_a_gap(ctx):
+    symbol = "GAPUSDT"
+    insert_trades(MARKET, symbol, [trade(1)])
+    with pytest.raises(Exception):
+        insert_trades(MARKET, symbol, [trade(2), trade(3, price="not a price"), trade(4)])
+    insert_trades(MARKET, symbol, [trade(5)])
+
+    gaps = find_gaps(MARKET, symbol)
+
+    assert [(g["first_id"], g["last_id"], g["missing"]) for g in gaps] == [(2, 4, 3)]
@@ -0,0 +1,44 @@
+# tests/test_routes.py
+from datetime import datetime, timezone
+
+from app.blueprints.ticks import routes
+from app.blueprints.ticks.storage import insert_trades
+
+MARKET = "binance_spot"
+BASE_MS = int(datetime(2026, 3, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_cursor_pages_cover_equal_timestamps_once(ctx, monkeypatch):
+    symbol = "PAGEUSDT"
+    # Two runs of four trades sharing a timestamp: with three rows a page
+    # both page boundaries fall inside a run
+    insert_trades(MARKET, symbol, [
+        {"a": i, "p": "100.0", "q": "1.0", "T": BASE_MS + (0 if i <= 4 else 1000), "m": False}
+        for i in range(1, 9)
+    ])
+    monkeypatch.setattr(routes, "PER_PAGE", 3)
+    client = ctx.test_client()
+
+    pages = []
+    url = f"/ticks/{MARKET}/{symbol.lower()}"
+    while url:
+        body = client.get(url).get_json()
+        pages.append([row["id"] for row in body["data"]])
+        url = body["pagination"].get("next")
+
+    # Every id exactly once, newest first
+    assert pages == [[8, 7, 6], [5, 4, 3], [2, 1]]
+
+    # And back again from the last page
+    previous = client.get(body["pagination"]["prev"]).get_json()
+    assert [row["id"] for row in previous["data"]] == [5, 4, 3]
+
+
+def test_malformed_cursor_is_rejected(ctx):
+    insert_trades(MARKET, "BADCURSORUSDT", [{"a": 1, "p": "1.0", "q": "1.0", "T": BASE_MS, "m": False}])
+    client = ctx.test_client()
+    for cursor in ("not-a-cursor", routes.encode_cursor("next", 1, 1)[:-2] + "!!",
+                   "WyJzaWRld2F5cyIsMSwxXQ"):
+        response = client.get(f"/ticks/{MARKET}/badcursorusdt?cursor={cursor}")
+        assert response.status_code == 400, cursor
+        assert response.get_json() == {"error": "Invalid cursor"}